@@ -0,0 +1,34 @@
+# api/endpoints.py
+"""
+外部APIのベースURL。
+負荷試験ではローカルのモックサーバー（tools/mock_riot_server.py）に向けられるよう、
+起動時に configure_endpoints() で差し替える。参照は呼び出しのたびにモジュール属性から行うこと。
+"""
+
+RIOT_AUTH = "https://auth.riotgames.com"
+RIOT_ENTITLEMENTS = "https://entitlements.auth.riotgames.com"
+# {shard} はアカウントのシャード (ap, na, eu, kr) に置き換える
+RIOT_PD = "https://pd.{shard}.a.pvp.net"
+VALORANT_API = "https://valorant-api.com"
+
+
+def configure_endpoints(
+    riot_auth: str | None = None,
+    riot_entitlements: str | None = None,
+    riot_pd: str | None = None,
+    valorant_api: str | None = None,
+):
+    """指定されたベースURLだけを差し替える"""
+    global RIOT_AUTH, RIOT_ENTITLEMENTS, RIOT_PD, VALORANT_API
+    if riot_auth:
+        RIOT_AUTH = riot_auth.rstrip("/")
+    if riot_entitlements:
+        RIOT_ENTITLEMENTS = riot_entitlements.rstrip("/")
+    if riot_pd:
+        RIOT_PD = riot_pd.rstrip("/")
+    if valorant_api:
+        VALORANT_API = valorant_api.rstrip("/")
+
+
+def pd_base(shard: str) -> str:
+    return RIOT_PD.format(shard=shard)
@@ -3,6 +3,9 @@ import aiohttp
 import base64
 import json
 
+from core.tracing import traced
+from api import endpoints
+
 # Valorantのクライアント情報をBase64エンコードしたもの (固定値)
 CLIENT_PLATFORM = base64.b64encode(
     b'{"platformType":"PC","platformOS":"Windows","platformOSVersion":"10.0.19042.1.256.64bit","platformChipset":"Unknown"}'
@@ -12,6 +15,7 @@ class RiotAPI:
     def __init__(self, session: aiohttp.ClientSession):
         self.session = session
 
+    @traced("riot.tokens_from_cookies")
     async def get_tokens_from_cookies(self, cookies_str: str) -> tuple[str, str]:
         """Cookie文字列を使用して認証トークンとEntitlementトークンを取得する"""
         headers = {
@@ -26,7 +30,7 @@ class RiotAPI:
             "scope": "account openid",
         }
         
-        async with self.session.post('https://auth.riotgames.com/api/v1/authorization', json=payload, headers=headers) as r:
+        async with self.session.post(f'{endpoints.RIOT_AUTH}/api/v1/authorization', json=payload, headers=headers) as r:
             r.raise_for_status()
             response_data = await r.json()
             
@@ -39,29 +43,31 @@ class RiotAPI:
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json',
         }
-        async with self.session.post('https://entitlements.auth.riotgames.com/api/token/v1', headers=headers, json={}) as r:
+        async with self.session.post(f'{endpoints.RIOT_ENTITLEMENTS}/api/token/v1', headers=headers, json={}) as r:
             r.raise_for_status()
             entitlements_token = (await r.json())['entitlements_token']
 
         return access_token, entitlements_token
 
+    @traced("riot.entitlements")
     async def get_entitlements_from_access_token(self, access_token: str) -> str:
         """アクセストークンからEntitlementトークンのみを取得する"""
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json',
         }
-        async with self.session.post('https://entitlements.auth.riotgames.com/api/token/v1', headers=headers, json={}) as r:
+        async with self.session.post(f'{endpoints.RIOT_ENTITLEMENTS}/api/token/v1', headers=headers, json={}) as r:
             r.raise_for_status()
             return (await r.json())['entitlements_token']
 
+    @traced("riot.userinfo")
     async def get_user_info(self, access_token: str) -> tuple[str, str]:
         """アクセストークンを使用してPUUIDとRiot IDを取得する"""
         headers = {
             'Authorization': f'Bearer {access_token}',
             'Content-Type': 'application/json',
         }
-        async with self.session.get('https://auth.riotgames.com/userinfo', headers=headers) as r:
+        async with self.session.get(f'{endpoints.RIOT_AUTH}/userinfo', headers=headers) as r:
             r.raise_for_status()
             user_info = await r.json()
             
@@ -0,0 +1,216 @@
+# benchmarks/bench_db.py
+"""
+合成データベース（既定: アカウント10万件・スケジュール10万件）に対して
+ホットクエリと並行ワークロードを計測し、チューニング前後を比較する。
+
+    python -m benchmarks.bench_db [--accounts 100000] [--concurrency 32] [--json out.json]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import shutil
+import sqlite3
+import time
+from sqlalchemy import update as sqlalchemy_update
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.database import create_sqlite_engine, _create_missing_indexes
+from database.models import Base, RiotAccount, DailyStoreSchedule
+from benchmarks.common import DATA_DIR, measure_async, summarize, print_table, write_json
+
+# チューニングで追加したインデックス（ベースラインでは削除する）
+TUNED_INDEXES = (
+    "ix_riot_accounts_user_puuid",
+    "ix_daily_store_schedules_time_account",
+    "uq_daily_store_schedules_user_guild_channel",
+)
+
+GUILD_COUNT = 5000
+SEED = 20240601
+
+
+def _time_str(minute_of_day: int) -> str:
+    # SQLAlchemyがSQLiteのTIME型に保存する形式
+    return f"{minute_of_day // 60:02d}:{minute_of_day % 60:02d}:00.000000"
+
+
+def build_synthetic_db(path: str, accounts: int) -> dict:
+    """アカウントとスケジュールを同数持つ合成DBを作成し、検索に使うサンプルキーを返す"""
+    if os.path.exists(path):
+        os.remove(path)
+
+    from sqlalchemy import create_engine
+    sync_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+
+    rng = random.Random(SEED)
+    user_count = max(1, accounts * 2 // 3)  # 一部のユーザーは複数アカウントを持つ
+    account_rows = []
+    schedule_rows = []
+    for account_id in range(1, accounts + 1):
+        user_id = 10**17 + rng.randrange(user_count)
+        puuid = f"{account_id:08x}-0000-4000-8000-{rng.getrandbits(48):012x}"
+        account_rows.append((
+            account_id, user_id, f"acct{account_id}", f"Player{account_id}#JP1",
+            "gAAAAA" + "x" * 200, "eyJ" + "a" * 900, "eyJ" + "b" * 900, puuid, "ap",
+        ))
+        guild_id = 10**18 + rng.randrange(GUILD_COUNT)
+        schedule_rows.append((
+            account_id, user_id, account_id, guild_id, 10**18 + account_id, _time_str(rng.randrange(1440)),
+        ))
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executemany(
+            "INSERT INTO riot_accounts (id, discord_user_id, account_name, riot_id, encrypted_cookies, "
+            "auth_token, entitlement_token, puuid, shard) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            account_rows,
+        )
+        conn.executemany(
+            "INSERT INTO daily_store_schedules (id, discord_user_id, riot_account_id, guild_id, channel_id, schedule_time) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            schedule_rows,
+        )
+    conn.execute("ANALYZE")
+    conn.close()
+
+    samples = rng.sample(account_rows, min(2000, len(account_rows)))
+    return {
+        "user_puuid": [(row[1], row[7]) for row in samples],
+        "user_guild": [(schedule_rows[row[0] - 1][1], schedule_rows[row[0] - 1][3]) for row in samples],
+        "account_ids": [row[0] for row in samples],
+        "users": [row[1] for row in samples],
+    }
+
+
+def _prepare_variant(source: str, path: str, tuned: bool):
+    shutil.copyfile(source, path)
+    conn = sqlite3.connect(path)
+    with conn:
+        if tuned:
+            from sqlalchemy import create_engine
+            sync_engine = create_engine(f"sqlite:///{path}")
+            with sync_engine.begin() as sync_conn:
+                _create_missing_indexes(sync_conn)
+            sync_engine.dispose()
+        else:
+            for name in TUNED_INDEXES:
+                conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+async def _run_variant(path: str, tuned: bool, keys: dict, iterations: int, concurrency: int, ops_per_worker: int) -> dict:
+    engine = create_sqlite_engine(path, tuned=tuned)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(SEED)
+    results = {}
+
+    async def schedule_by_time(i):
+        t = datetime.time(hour=rng.randrange(24), minute=rng.randrange(60))
+        async with session_factory() as session:
+            result = await session.execute(
+                select(DailyStoreSchedule, RiotAccount)
+                .join(RiotAccount, DailyStoreSchedule.riot_account_id == RiotAccount.id)
+                .where(DailyStoreSchedule.schedule_time == t)
+            )
+            result.all()
+
+    async def account_by_user_and_puuid(i):
+        user_id, puuid = keys["user_puuid"][i % len(keys["user_puuid"])]
+        async with session_factory() as session:
+            result = await session.execute(
+                select(RiotAccount).where(RiotAccount.discord_user_id == user_id, RiotAccount.puuid == puuid)
+            )
+            result.scalar_one_or_none()
+
+    async def schedule_by_user_and_guild(i):
+        user_id, guild_id = keys["user_guild"][i % len(keys["user_guild"])]
+        async with session_factory() as session:
+            result = await session.execute(
+                select(DailyStoreSchedule, RiotAccount.account_name)
+                .join(RiotAccount, DailyStoreSchedule.riot_account_id == RiotAccount.id)
+                .where(DailyStoreSchedule.discord_user_id == user_id, DailyStoreSchedule.guild_id == guild_id)
+            )
+            result.all()
+
+    async def accounts_by_users(i):
+        # ウィッシュリスト照合で、登録ユーザーのアカウントをまとめて読み込むクエリ
+        users = keys["users"][(i * 500) % len(keys["users"]):][:500]
+        async with session_factory() as session:
+            result = await session.execute(select(RiotAccount).where(RiotAccount.discord_user_id.in_(users)))
+            result.scalars().all()
+
+    results["schedule_by_time"] = await measure_async(schedule_by_time, iterations)
+    results["account_by_user_and_puuid"] = await measure_async(account_by_user_and_puuid, iterations)
+    results["schedule_by_user_and_guild"] = await measure_async(schedule_by_user_and_guild, iterations)
+    results["accounts_by_users"] = await measure_async(accounts_by_users, max(1, iterations // 10))
+
+    # /store daily 相当の並行ワークロード: アカウント一覧 -> 1件読み込み -> トークン書き戻し
+    latencies = []
+
+    async def worker(worker_id: int):
+        for n in range(ops_per_worker):
+            idx = (worker_id * ops_per_worker + n) % len(keys["account_ids"])
+            start = time.perf_counter()
+            async with session_factory() as session:
+                await session.execute(
+                    select(RiotAccount.id).where(RiotAccount.discord_user_id == keys["users"][idx])
+                )
+            async with session_factory() as session:
+                await session.get(RiotAccount, keys["account_ids"][idx])
+            async with session_factory() as session:
+                async with session.begin():
+                    await session.execute(
+                        sqlalchemy_update(RiotAccount)
+                        .where(RiotAccount.id == keys["account_ids"][idx])
+                        .values(auth_token=f"eyJ{worker_id}-{n}")
+                    )
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(w) for w in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    results["concurrent_command"] = summarize(latencies)
+    results["concurrent_command"]["ops_per_sec"] = round(len(latencies) / elapsed, 2)
+
+    await engine.dispose()
+    return results
+
+
+async def run(accounts: int = 100_000, iterations: int = 200, concurrency: int = 32, ops_per_worker: int = 20) -> dict:
+    """ベースラインとチューニング後の両方を計測して結果を返す"""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    source = os.path.join(DATA_DIR, f"synthetic_{accounts}.db")
+    keys = build_synthetic_db(source, accounts)
+
+    results = {}
+    for name, tuned in (("baseline", False), ("tuned", True)):
+        path = os.path.join(DATA_DIR, f"synthetic_{accounts}_{name}.db")
+        _prepare_variant(source, path, tuned)
+        results[name] = await _run_variant(path, tuned, keys, iterations, concurrency, ops_per_worker)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLiteストレージ設定のベンチマーク")
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--ops-per-worker", type=int, default=20)
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.accounts, args.iterations, args.concurrency, args.ops_per_worker))
+    for name, variant in results.items():
+        print_table(name, variant)
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
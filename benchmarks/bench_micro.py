@@ -0,0 +1,116 @@
+# benchmarks/bench_micro.py
+"""
+ホットパスの関数単位のベンチマーク。
+- カタログの構築（build_catalog）と検索インデックスの構築
+- ストアフロントのオファー解決（resolve_offers）
+- スキン名の前方一致検索
+- ストア画像の生成（新しいプロセスでの初回と、2回目以降）
+
+    python -m benchmarks.bench_micro [--iterations 50] [--json out.json]
+
+リポジトリのルートで実行すること（画像生成はassets/を相対パスで読み込む）。
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import summarize, print_table, write_json
+from benchmarks.fixtures import ROOT, VP_ICON, load_catalog, storefronts, offers_for_image
+from catalog import build_catalog, resolve_offers
+from skin_search import SkinSearchIndex
+
+SEARCH_QUERIES = ("v", "van", "prime", "ぷらいむ", "モック", "mock 01", "reaver vandal", "x")
+
+_COLD_RENDER_SNIPPET = (
+    "import os, sys, time\n"
+    "from benchmarks.fixtures import VP_ICON, offers_for_image\n"
+    "start = time.perf_counter()\n"
+    "from image_generator import create_daily_store_image\n"
+    "path = create_daily_store_image(offers_for_image(), VP_ICON)\n"
+    "elapsed = time.perf_counter() - start\n"
+    "if path: os.remove(path)\n"
+    "print(elapsed if path else 'failed')\n"
+)
+
+
+def _measure(fn, iterations: int) -> dict:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def bench_catalog(iterations: int) -> dict:
+    tiers, skins_en, skins_ja, source = load_catalog()
+    results = {
+        "catalog.build": {**_measure(lambda i: build_catalog(tiers, skins_en, skins_ja), iterations), "skins": len(skins_en), "source": source},
+    }
+    skin_cache, level_to_skin_map = build_catalog(tiers, skins_en, skins_ja)
+    results["catalog.search_index_build"] = _measure(lambda i: SkinSearchIndex(skin_cache), max(1, iterations // 5))
+
+    stores = storefronts(skins_en, 200)
+    results["offers.resolve"] = _measure(
+        lambda i: resolve_offers(stores[i % len(stores)], level_to_skin_map, skin_cache), iterations * 20
+    )
+
+    index = SkinSearchIndex(skin_cache)
+    results["skin_search.query"] = _measure(
+        lambda i: index.search(SEARCH_QUERIES[i % len(SEARCH_QUERIES)], limit=25), iterations * 20
+    )
+    return results
+
+
+def bench_render(iterations: int, cold_runs: int = 3) -> dict:
+    """画像生成。描画に必要なアセット（フォントなど）が無い場合はスキップする"""
+    from image_generator import create_daily_store_image
+
+    offers = offers_for_image()
+    path = create_daily_store_image(offers, VP_ICON)
+    if not path:
+        return {"render": {"skipped": "create_daily_store_image failed (missing assets?)"}}
+    os.remove(path)
+
+    def render(i):
+        result = create_daily_store_image(offers, VP_ICON)
+        if result:
+            os.remove(result)
+
+    results = {"render.warm": _measure(render, iterations)}
+
+    samples = []
+    for _ in range(cold_runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _COLD_RENDER_SNIPPET], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        if out == "failed":
+            break
+        samples.append(float(out))
+    # 新しいプロセスでのPillowの読み込みと初回描画（フォントの読み込みを含む）
+    results["render.cold"] = summarize(samples)
+    return results
+
+
+def run(iterations: int = 50) -> dict:
+    results = bench_catalog(iterations)
+    results.update(bench_render(max(1, iterations // 5)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ホットパスのマイクロベンチマーク")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    results = run(args.iterations)
+    print_table("micro", results)
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
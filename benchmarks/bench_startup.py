@@ -0,0 +1,129 @@
+# benchmarks/bench_startup.py
+"""
+起動時間を計測する。
+- main.py の import にかかる時間（毎回新しいプロセスで計測）
+- 遅延読み込みにした重いモジュール（初回使用時にかかる時間）
+- コマンドツリーのハッシュ計算と、変更がない場合の同期判定
+
+    python -m benchmarks.bench_startup [--runs 10] [--json out.json]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import summarize, print_table, write_json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 起動時には読み込まず、初回使用時に読み込むモジュール
+DEFERRED_MODULES = ("image_generator", "aiohttp.web", "sqlalchemy.dialects.postgresql")
+
+_IMPORT_SNIPPET = (
+    "import sys, time\n"
+    "start = time.perf_counter()\n"
+    "import {module}\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    # main.py は import 時に環境変数を読むため、ダミー値を入れておく
+    env.setdefault("WEBHOOK_CHANNEL_ID", "0")
+    return env
+
+
+def _time_import(module: str, preload: str | None = None) -> float:
+    code = (f"import {preload}\n" if preload else "") + _IMPORT_SNIPPET.format(module=module)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def import_breakdown(limit: int = 15) -> list[tuple[str, float]]:
+    """-X importtime で main が直接読み込むモジュールごとの累積時間 (ms)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # インデントが1段（main直下）のものだけを集計する
+        if name.startswith("   ") and not name.startswith("     "):
+            rows.append((name.strip(), int(cumulative) / 1000))
+    return sorted(rows, key=lambda row: -row[1])[:limit]
+
+
+async def _fingerprint_stats(runs: int) -> dict:
+    sys.path.insert(0, ROOT)
+    os.environ.setdefault("WEBHOOK_CHANNEL_ID", "0")
+    from cryptography.fernet import Fernet
+    import main
+    from core.command_sync import tree_fingerprint, sync_command_tree
+    from cogs.valorant_commands import setup as setup_valorant_commands
+    from cogs.admin_commands import setup as setup_admin_commands
+
+    bot = main.MyBot()
+    await setup_valorant_commands(bot, "example.com", Fernet(Fernet.generate_key()))
+    await setup_admin_commands(bot)
+    # 計測中にスケジュール処理が動かないよう止めておく
+    cog = bot.get_cog("ValorantCommands")
+    cog.daily_store_task.cancel()
+    cog.wishlist_scan_task.cancel()
+
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        tree_fingerprint(bot.tree, 1234)
+        samples.append(time.perf_counter() - start)
+    results = {"fingerprint": summarize(samples)}
+
+    # 前回と同じツリー: Discordへの同期は行われない
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tree.sha256")
+        with open(path, "w") as f:
+            f.write(tree_fingerprint(bot.tree, 1234))
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            synced = await sync_command_tree(bot.tree, 1234, mode="auto", path=path)
+            samples.append(time.perf_counter() - start)
+            assert not synced
+    results["unchanged_sync_decision"] = summarize(samples)
+    results["unchanged_sync_decision"]["commands"] = len(bot.tree.get_commands())
+    return results
+
+
+def run(runs: int = 10) -> dict:
+    results = {"import_main": summarize([_time_import("main") for _ in range(runs)])}
+    # 遅延読み込みしたモジュールの初回使用時のコスト（main を読み込んだ後の追加分）
+    for module in DEFERRED_MODULES:
+        results[f"deferred:{module}"] = summarize([_time_import(module, preload="main") for _ in range(runs)])
+    results.update(asyncio.run(_fingerprint_stats(runs)))
+    results["breakdown_ms"] = dict(import_breakdown())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時間のベンチマーク")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    results = run(args.runs)
+    breakdown = results.pop("breakdown_ms")
+    print_table("startup", results)
+    print_table("main imports (cumulative ms)", breakdown)
+    if args.json:
+        write_json(args.json, {**results, "breakdown_ms": breakdown})
+
+
+if __name__ == "__main__":
+    main()
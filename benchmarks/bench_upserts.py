@@ -0,0 +1,175 @@
+# benchmarks/bench_upserts.py
+"""
+アカウント連携とスケジュール設定の書き込みを、従来の「SELECTしてからUPDATE/INSERT」と
+1文のupsertで比較する。並行実行時のスループットとレイテンシを計測する。
+
+    python -m benchmarks.bench_upserts [--events 2000] [--concurrency 32] [--json out.json]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import time
+from sqlalchemy import update as sqlalchemy_update, exc
+from sqlalchemy.future import select
+
+from database import database
+from database.database import configure_engine, init_db, async_session
+from database.models import RiotAccount, DailyStoreSchedule
+from database.upserts import upsert_riot_account, upsert_schedule
+from benchmarks.common import DATA_DIR, summarize, print_table, write_json
+
+SEED = 1234
+USER_COUNT = 500
+GUILD_COUNT = 20
+CHANNELS_PER_GUILD = 5
+
+
+def _link_events(count: int) -> list[tuple]:
+    """(ユーザー, PUUID, Riot ID) の連携イベント。約半数は既存アカウントの再連携になる"""
+    rng = random.Random(SEED)
+    events = []
+    for _ in range(count):
+        n = rng.randrange(max(1, count // 2))
+        events.append((10**17 + n % USER_COUNT, f"puuid-{n:08d}", f"Player{n}#JP1"))
+    return events
+
+
+def _schedule_events(count: int, account_ids: dict[int, list[int]]) -> list[tuple]:
+    """(ユーザー, ギルド, チャンネル, アカウント, 時刻) のスケジュール設定イベント"""
+    rng = random.Random(SEED)
+    users = sorted(account_ids)
+    events = []
+    for _ in range(count):
+        user_id = rng.choice(users)
+        guild_index = rng.randrange(GUILD_COUNT)
+        guild = 10**18 + guild_index
+        channel = 10**18 + 10**6 + guild_index * CHANNELS_PER_GUILD + rng.randrange(CHANNELS_PER_GUILD)
+        events.append((user_id, guild, channel, rng.choice(account_ids[user_id]), datetime.time(rng.randrange(24), rng.randrange(60))))
+    return events
+
+
+async def legacy_link(user_id: int, puuid: str, riot_id: str):
+    """変更前の連携処理（SELECT → UPDATE または SELECT → INSERT）"""
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(RiotAccount).where(RiotAccount.discord_user_id == user_id, RiotAccount.puuid == puuid)
+            )
+            existing = result.scalar_one_or_none()
+            if existing:
+                await session.execute(
+                    sqlalchemy_update(RiotAccount).where(RiotAccount.id == existing.id)
+                    .values(encrypted_cookies="c", auth_token="a", entitlement_token="e", riot_id=riot_id)
+                )
+            else:
+                result = await session.execute(
+                    select(RiotAccount).where(RiotAccount.discord_user_id == user_id, RiotAccount.account_name == riot_id)
+                )
+                name = f"{riot_id}_{int(time.time()) % 1000}" if result.scalar_one_or_none() else riot_id
+                session.add(RiotAccount(
+                    discord_user_id=user_id, account_name=name, riot_id=riot_id,
+                    encrypted_cookies="c", auth_token="a", entitlement_token="e", puuid=puuid
+                ))
+
+
+async def legacy_schedule(user_id, guild_id, channel_id, account_id, schedule_time):
+    """変更前のスケジュール設定処理（SELECT → 属性変更 または INSERT）"""
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                select(DailyStoreSchedule).where(
+                    DailyStoreSchedule.discord_user_id == user_id,
+                    DailyStoreSchedule.guild_id == guild_id,
+                    DailyStoreSchedule.channel_id == channel_id
+                )
+            )
+            existing = result.scalar_one_or_none()
+            if existing:
+                existing.schedule_time = schedule_time
+                existing.riot_account_id = account_id
+            else:
+                session.add(DailyStoreSchedule(
+                    discord_user_id=user_id, riot_account_id=account_id, guild_id=guild_id,
+                    channel_id=channel_id, schedule_time=schedule_time
+                ))
+
+
+async def _drive(events: list[tuple], fn, concurrency: int) -> dict:
+    queue = list(events)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            event = queue.pop()
+            start = time.perf_counter()
+            try:
+                await fn(*event)
+            except exc.IntegrityError:
+                # 並行実行時の競合（従来方式では起こり得る）
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats = summarize(latencies)
+    stats["ops_per_sec"] = round(len(latencies) / elapsed, 2)
+    stats["integrity_errors"] = errors
+    return stats
+
+
+async def _account_ids() -> dict[int, list[int]]:
+    async with async_session() as session:
+        rows = (await session.execute(select(RiotAccount.discord_user_id, RiotAccount.id))).all()
+    account_ids: dict[int, list[int]] = {}
+    for user_id, account_id in rows:
+        account_ids.setdefault(user_id, []).append(account_id)
+    return account_ids
+
+
+async def _run_variant(name: str, link_fn, schedule_fn, events: int, concurrency: int) -> dict:
+    path = os.path.join(DATA_DIR, f"upserts_{name}.db")
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    configure_engine(f"sqlite+aiosqlite:///{path}")
+    await init_db()
+
+    async def upsert_link(user_id, puuid, riot_id):
+        await upsert_riot_account(user_id, puuid, riot_id, "c", "a", "e")
+
+    results = {"link_churn": await _drive(_link_events(events), link_fn or upsert_link, concurrency)}
+    schedule_events = _schedule_events(events, await _account_ids())
+    results["schedule_churn"] = await _drive(schedule_events, schedule_fn or upsert_schedule, concurrency)
+    await database.dispose_engine()
+    return results
+
+
+async def run(events: int = 2000, concurrency: int = 32) -> dict:
+    os.makedirs(DATA_DIR, exist_ok=True)
+    return {
+        "read_then_write": await _run_variant("legacy", legacy_link, legacy_schedule, events, concurrency),
+        "upsert": await _run_variant("upsert", None, None, events, concurrency),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="連携・スケジュール書き込みのベンチマーク")
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.events, args.concurrency))
+    for name, variant in results.items():
+        print_table(name, variant)
+    if args.json:
+        write_json(args.json, results)
+
+
+if __name__ == "__main__":
+    main()
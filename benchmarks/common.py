@@ -0,0 +1,52 @@
+# benchmarks/common.py
+import json
+import os
+import statistics
+import time
+
+# 合成データベースなどの生成物を置くディレクトリ
+DATA_DIR = os.path.join(os.path.dirname(__file__), ".data")
+
+
+def summarize(samples: list[float]) -> dict:
+    """秒単位の計測値からミリ秒単位の統計情報を作る"""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 4),
+        "p50_ms": round(pct(50), 4),
+        "p95_ms": round(pct(95), 4),
+        "p99_ms": round(pct(99), 4),
+        "max_ms": round(ordered[-1] * 1000, 4),
+    }
+
+
+async def measure_async(fn, iterations: int) -> dict:
+    """非同期関数をiterations回実行して統計情報を返す"""
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        await fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def print_table(title: str, results: dict):
+    print(f"\n== {title} ==")
+    for name, stats in results.items():
+        if isinstance(stats, dict) and "p50_ms" in stats:
+            extra = "".join(f"  {key}={value}" for key, value in stats.items() if not key.endswith("_ms") and key != "count")
+            print(f"  {name:<40} p50={stats['p50_ms']:>9.3f}ms  p95={stats['p95_ms']:>9.3f}ms  mean={stats['mean_ms']:>9.3f}ms  n={stats['count']}{extra}")
+        else:
+            print(f"  {name:<40} {stats}")
+
+
+def write_json(path: str, results: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2, sort_keys=True)
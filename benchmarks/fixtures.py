@@ -0,0 +1,90 @@
+# benchmarks/fixtures.py
+"""
+ベンチマーク用の入力データ。
+カタログは benchmarks/fixtures/ に記録したValorant-APIのレスポンスを使い、
+記録が無ければモックサーバーと同じ合成カタログで代用する。
+
+    python -m benchmarks.fixtures --record    # 現在のValorant-APIのレスポンスを記録する
+"""
+import argparse
+import asyncio
+import json
+import os
+
+import aiohttp
+
+from api import endpoints
+from tools.mock_riot_server import build_synthetic_catalog, skins_payload, storefront_payload
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 記録するレスポンス（ファイル名 → パス）
+CATALOG_FILES = {
+    "contenttiers_ja.json": "/v1/contenttiers?language=ja-JP",
+    "skins_en.json": "/v1/weapons/skins",
+    "skins_ja.json": "/v1/weapons/skins?language=ja-JP",
+}
+# 画像生成に使う同梱の画像（武器画像の代わり）
+OFFER_IMAGES = ("assets/blue.png", "assets/green.png", "assets/red.png", "assets/yellow.png")
+VP_ICON = os.path.join(ROOT, "assets", "vp_icon.png")
+SYNTHETIC_SKINS = 1500
+
+
+def load_catalog() -> tuple[list[dict], list[dict], list[dict], str]:
+    """(contenttiers, skins_en, skins_ja, 出所) を返す。出所は recorded（記録）か synthetic（合成）"""
+    paths = [os.path.join(FIXTURE_DIR, name) for name in CATALOG_FILES]
+    if all(os.path.exists(path) for path in paths):
+        data = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                data.append(json.load(f)["data"])
+        return data[0], data[1], data[2], "recorded"
+
+    catalog = build_synthetic_catalog(SYNTHETIC_SKINS, "http://127.0.0.1:8089")
+    return catalog["tiers"], skins_payload(catalog), skins_payload(catalog, japanese=True), "synthetic"
+
+
+def storefronts(skins_en: list[dict], count: int) -> list[dict]:
+    """カタログのスキンから日替わりオファーを作る（PUUIDごとに異なる決定的な内容）"""
+    catalog = {"skins": [{"levels": skin["levels"]} for skin in skins_en if skin.get("levels")]}
+    return [storefront_payload(catalog, f"bench-{i}", "2024-06-01") for i in range(count)]
+
+
+def offers_for_image() -> list[dict]:
+    """create_daily_store_image に渡す4件のオファー"""
+    rarities = ("Select", "Deluxe", "Premium", "Exclusive")
+    return [
+        {
+            "name_ja": f"ベンチマーク スキン {i}", "name_en": f"Benchmark Skin {i}",
+            "image_path": os.path.join(ROOT, path), "rarity_name": rarities[i], "price": 1775,
+        }
+        for i, path in enumerate(OFFER_IMAGES)
+    ]
+
+
+async def record():
+    """Valorant-APIのカタログのレスポンスを benchmarks/fixtures/ に保存する"""
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    async with aiohttp.ClientSession() as session:
+        for name, path in CATALOG_FILES.items():
+            async with session.get(f"{endpoints.VALORANT_API}{path}") as r:
+                r.raise_for_status()
+                body = await r.json()
+            with open(os.path.join(FIXTURE_DIR, name), "w", encoding="utf-8") as f:
+                json.dump(body, f, ensure_ascii=False)
+            print(f"recorded {name}: {len(body['data'])} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用のフィクスチャ")
+    parser.add_argument("--record", action="store_true", help="Valorant-APIのレスポンスを記録する")
+    args = parser.parse_args()
+    if args.record:
+        asyncio.run(record())
+    else:
+        tiers, skins_en, skins_ja, source = load_catalog()
+        print(f"catalog: {source}, {len(tiers)} tiers, {len(skins_en)} skins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/run.py
+"""
+ベンチマークをまとめて実行し、結果をJSONで保存・比較する。
+
+    python -m benchmarks.run --json results.json                  # 実行して保存
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json  # 基準より遅くなった項目があれば終了コード1
+
+比較は各項目の p50 で行い、--tolerance（既定 25%）を超えて遅くなったものを回帰とみなす。
+数マイクロ秒の項目は揺れが大きいので、差が --min-delta-ms 未満なら無視する。
+基準は同じマシンで取ったものと比較すること。
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+from benchmarks.common import print_table, write_json
+from benchmarks.fixtures import ROOT
+
+SUITES = ("micro", "db", "startup")
+
+
+def _run_suite(name: str, quick: bool) -> dict:
+    if name == "micro":
+        from benchmarks import bench_micro
+        return bench_micro.run(iterations=20 if quick else 50)
+    if name == "db":
+        from benchmarks import bench_db
+        # 比較にはチューニング後の構成だけを使う
+        return asyncio.run(bench_db.run(accounts=20_000 if quick else 100_000, iterations=100 if quick else 200))["tuned"]
+    if name == "startup":
+        from benchmarks import bench_startup
+        results = bench_startup.run(runs=3 if quick else 10)
+        results.pop("breakdown_ms", None)
+        return results
+    raise ValueError(f"unknown suite: {name}")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict) -> dict[str, float]:
+    """{スイート: {項目: 統計}} を {"スイート.項目": p50_ms} にする"""
+    flat = {}
+    for suite, entries in results.items():
+        for name, stats in entries.items():
+            if isinstance(stats, dict) and "p50_ms" in stats:
+                flat[f"{suite}.{name}"] = stats["p50_ms"]
+    return flat
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> tuple[list[tuple], list[str]]:
+    """(比較表の行, 回帰した項目名) を返す"""
+    now, base = flatten(current), flatten(baseline)
+    rows, regressions = [], []
+    for name in sorted(now.keys() & base.keys()):
+        ratio = now[name] / base[name] if base[name] else 1.0
+        status = "ok"
+        if abs(now[name] - base[name]) < min_delta_ms:
+            pass
+        elif ratio > 1 + tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        rows.append((name, base[name], now[name], ratio, status))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマークの一括実行と基準との比較")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"実行するスイート（カンマ区切り: {', '.join(SUITES)}）")
+    parser.add_argument("--quick", action="store_true", help="反復回数とデータ量を減らして短時間で実行する")
+    parser.add_argument("--json", help="結果を書き出すパス")
+    parser.add_argument("--baseline", help="比較する基準のJSON")
+    parser.add_argument("--save-baseline", help="結果を基準として書き出すパス")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    suites = [name.strip() for name in args.suites.split(",") if name.strip()]
+    results = {}
+    for name in suites:
+        results[name] = _run_suite(name, args.quick)
+        print_table(name, results[name])
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+        },
+        "results": results,
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            write_json(path, report)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline["results"], args.tolerance, args.min_delta_ms)
+    print(f"\n== compared with {args.baseline} (commit {baseline['meta'].get('commit')}, tolerance {args.tolerance:.0%}) ==")
+    for name, base, now, ratio, status in rows:
+        print(f"  {name:<50} {base:>10.3f}ms -> {now:>10.3f}ms  x{ratio:.2f}  {status}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+# catalog.py
+"""
+スキンカタログの構築と、ストアフロントのオファーの解決。
+HTTPやDiscordの状態に依存しない純粋な関数にしておき、Cogとベンチマークの両方から使う。
+"""
+from typing import NamedTuple
+
+import discord
+
+
+class ResolvedOffer(NamedTuple):
+    skin_level_uuid: str
+    skin_uuid: str
+    skin: dict
+    price: int
+
+
+def build_catalog(tiers_data: list[dict], skins_data: list[dict], skins_ja_data: list[dict]) -> tuple[dict, dict]:
+    """
+    Valorant-APIの contenttiers と weapons/skins（英語・日本語）のレスポンスから
+    (skin_cache, level_to_skin_map) を作る。
+    """
+    tiers = {}
+    for tier in tiers_data:
+        hex_color = tier['highlightColor'].lstrip('#')[:6]
+        if hex_color:
+            tiers[tier['uuid']] = {
+                "name": tier['devName'],
+                "color": discord.Color(int(hex_color, 16))
+            }
+
+    ja_names = {skin['uuid']: skin['displayName'] for skin in skins_ja_data}
+    skin_cache = {}
+    level_to_skin_map = {}
+    for skin in skins_data:
+        tier_info = tiers.get(skin.get('contentTierUuid'), {})
+        skin_cache[skin['uuid']] = {
+            "name_ja": ja_names.get(skin['uuid'], skin['displayName']),
+            "name_en": skin['displayName'],
+            "rarity_name": tier_info.get("name", "Select"),
+            "color": tier_info.get("color", discord.Color.default()),
+            "icon": skin['displayIcon']
+        }
+        for level in skin['levels']:
+            level_to_skin_map[level['uuid']] = skin['uuid']
+    return skin_cache, level_to_skin_map
+
+
+def resolve_offers(store_data: dict, level_to_skin_map: dict, skin_cache: dict) -> list[ResolvedOffer]:
+    """日替わりオファーをカタログのスキン情報に対応付ける（カタログに無いものは除く）"""
+    resolved = []
+    for offer in store_data['SkinsPanelLayout']['SingleItemStoreOffers']:
+        skin_level_uuid = offer['Rewards'][0]['ItemID']
+        skin_uuid = level_to_skin_map.get(skin_level_uuid)
+        skin = skin_cache.get(skin_uuid) if skin_uuid else None
+        if skin is None:
+            continue
+        resolved.append(ResolvedOffer(skin_level_uuid, skin_uuid, skin, list(offer['Cost'].values())[0]))
+    return resolved
@@ -0,0 +1,139 @@
+# cogs/admin_commands.py
+import asyncio
+import datetime
+import io
+import logging
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from core.diagnostics import Profiler, MemoryTracker, task_report
+from core.log import set_level
+from core.upload_cache import upload_cache
+from database.account_cache import account_cache
+from database.state_store import state_store
+from database.wishlist import wishlist
+
+log = logging.getLogger(__name__)
+
+# プロファイルの最大秒数
+MAX_PROFILE_SECONDS = 120
+
+
+async def _is_owner(interaction: discord.Interaction) -> bool:
+    return await interaction.client.is_owner(interaction.user)
+
+
+def _text_file(name: str, text: str) -> discord.File:
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    return discord.File(io.BytesIO(text.encode("utf-8")), filename=f"{name}_{stamp}.txt")
+
+
+class AdminCommands(commands.Cog):
+    """Botのオーナーだけが使える診断用コマンド"""
+    admin = app_commands.Group(
+        name="admin",
+        description="Bot管理者用の診断コマンド",
+        default_permissions=discord.Permissions(administrator=True),
+    )
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.profiler = Profiler()
+        self.memory = MemoryTracker()
+
+    def _cache_sizes(self) -> str:
+        """メモリ増加の原因になりやすいキャッシュの件数"""
+        lines = ["== cache sizes =="]
+        valorant = self.bot.get_cog("ValorantCommands")
+        if valorant:
+            lines.append(f"skin_cache: {len(valorant.skin_cache)}")
+            lines.append(f"level_to_skin_map: {len(valorant.level_to_skin_map)}")
+        lines.append(f"account_cache: {len(account_cache._entries)} (hits={account_cache.hits}, misses={account_cache.misses})")
+        lines.append(f"state_store: {len(state_store)}")
+        lines.append(f"wishlist: {len(wishlist)} entries, {len(wishlist.watchers)} users")
+        lines.append(f"upload_cache: {len(upload_cache)} (hits={upload_cache.hits}, misses={upload_cache.misses})")
+        webhook = self.bot.get_cog("WebhookListenerCog")
+        if webhook:
+            lines.append(f"link_queue: {len(webhook.link_queue)}")
+        return "\n".join(lines) + "\n"
+
+    @admin.command(name="profile", description="指定秒数だけcProfileでイベントループを計測します。")
+    @app_commands.describe(seconds="計測する秒数", sort="並び順（cumulative / tottime / ncalls）")
+    @app_commands.check(_is_owner)
+    async def profile(
+        self,
+        interaction: discord.Interaction,
+        seconds: app_commands.Range[int, 1, MAX_PROFILE_SECONDS] = 10,
+        sort: str = "cumulative",
+    ):
+        if self.profiler.running:
+            await interaction.response.send_message("別のプロファイルが実行中です。", ephemeral=True)
+            return
+        if sort not in ("cumulative", "tottime", "ncalls"):
+            sort = "cumulative"
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        log.info("Profiling for %d seconds", seconds, extra={"user_id": interaction.user.id})
+        text, raw = await self.profiler.run(seconds, sort=sort)
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        await interaction.followup.send(
+            f"{seconds}秒間のプロファイル結果です。`.prof` は snakeviz などで開けます。",
+            files=[_text_file("profile", text), discord.File(io.BytesIO(raw), filename=f"profile_{stamp}.prof")],
+            ephemeral=True,
+        )
+
+    @admin.command(name="memory", description="tracemallocでメモリを計測します。")
+    @app_commands.describe(action="start: 計測開始 / snapshot: 現在の状態を基準に保存 / diff: 基準からの増加 / stop: 計測終了")
+    @app_commands.choices(action=[
+        app_commands.Choice(name="start", value="start"),
+        app_commands.Choice(name="snapshot", value="snapshot"),
+        app_commands.Choice(name="diff", value="diff"),
+        app_commands.Choice(name="stop", value="stop"),
+    ])
+    @app_commands.check(_is_owner)
+    async def memory(self, interaction: discord.Interaction, action: app_commands.Choice[str]):
+        if action.value == "start":
+            self.memory.start()
+            await interaction.response.send_message("tracemallocを開始しました。しばらくしてから `snapshot` を実行してください。", ephemeral=True)
+            return
+        if action.value == "stop":
+            self.memory.stop()
+            await interaction.response.send_message("tracemallocを停止しました。", ephemeral=True)
+            return
+        if not self.memory.tracing:
+            await interaction.response.send_message("tracemallocが開始されていません。先に `start` を実行してください。", ephemeral=True)
+            return
+        if action.value == "diff" and self.memory.baseline is None:
+            await interaction.response.send_message("基準がありません。先に `snapshot` を実行してください。", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        # スナップショットの集計は重いため、イベントループの外で行う
+        report_fn = self.memory.snapshot if action.value == "snapshot" else self.memory.diff
+        text = await asyncio.to_thread(report_fn)
+        text = self._cache_sizes() + "\n" + text
+        await interaction.followup.send(file=_text_file(f"memory_{action.value}", text), ephemeral=True)
+
+    @admin.command(name="tasks", description="asyncioタスクの件数と長時間実行中のタスクを表示します。")
+    @app_commands.check(_is_owner)
+    async def tasks(self, interaction: discord.Interaction, limit: app_commands.Range[int, 1, 100] = 20):
+        text = task_report(limit)
+        monitor = getattr(self.bot, "loop_monitor", None)
+        if monitor:
+            text = f"event loop lag: {monitor.percentiles()}\n\n" + text
+        await interaction.response.send_message(file=_text_file("tasks", text), ephemeral=True)
+
+    @admin.command(name="loglevel", description="ログレベルを変更します。")
+    @app_commands.describe(logger="対象のロガー名（省略時は全体）")
+    @app_commands.choices(level=[
+        app_commands.Choice(name=name, value=name) for name in ("DEBUG", "INFO", "WARNING", "ERROR")
+    ])
+    @app_commands.check(_is_owner)
+    async def loglevel(self, interaction: discord.Interaction, level: app_commands.Choice[str], logger: str | None = None):
+        set_level(level.value, logger)
+        log.warning("Log level of %s set to %s", logger or "root", level.value, extra={"user_id": interaction.user.id})
+        await interaction.response.send_message(f"`{logger or 'root'}` のログレベルを **{level.value}** に変更しました。", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(AdminCommands(bot))
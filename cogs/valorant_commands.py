@@ -4,21 +4,58 @@ from discord import app_commands
 from discord.ext import commands, tasks
 import asyncio
 import os
+import aiohttp
 import aiofiles
 import aiofiles.os
 import uuid
 import datetime
 import base64
+import enum
+import functools
 import re
+import time
+import logging
 from cryptography.fernet import Fernet
 from sqlalchemy.future import select
 from sqlalchemy import update as sqlalchemy_update, delete, exc
 
 from database.database import async_session
-from database.models import State, RiotAccount, DailyStoreSchedule
+from database.models import RiotAccount, DailyStoreSchedule
+from database.leases import LeaseManager
+from database.account_context import AccountContext
+from database.account_cache import account_cache, CachedAccount
+from database.upserts import upsert_schedule, delete_riot_account
+from database.state_store import state_store
+from database.wishlist import wishlist
 from api.riot_api import RiotAPI
-from image_generator import create_daily_store_image
-
+from api import endpoints
+from skin_search import SkinSearchIndex
+from catalog import build_catalog, resolve_offers
+from core import jobs
+from core.admission import command_admission, interaction_deadline, Overloaded
+from core.tracing import trace, span, traced
+from core.upload_cache import upload_cache, content_hash
+from core.metrics import COMMAND_SECONDS, REAUTH_TOTAL, UPLOAD_SECONDS, CACHE_REQUESTS, SCHEDULE_LAG_SECONDS
+
+log = logging.getLogger(__name__)
+
+# コマンドがスキンカタログの準備完了を待つ最大秒数
+CATALOG_WAIT_TIMEOUT = 15
+# カタログ構築に失敗したときの再試行間隔 (秒)
+CATALOG_RETRY_DELAYS = (5, 15, 30, 60, 120)
+# /store all で同時にストアを取得するアカウント数
+ALL_ACCOUNTS_CONCURRENCY = 4
+# アップロード済み画像のURLを再利用する前の確認（HEAD）のタイムアウト
+UPLOAD_CHECK_TIMEOUT = aiohttp.ClientTimeout(total=5)
+# Discordの1メッセージあたりの添付ファイル数の上限
+MAX_ATTACHMENTS_PER_MESSAGE = 10
+# ストア更新 (0:00 UTC) の後にウィッシュリストを照合する時刻
+WISHLIST_SCAN_TIME = datetime.time(hour=0, minute=5, tzinfo=datetime.timezone.utc)
+# ウィッシュリスト照合でストアを同時に取得するアカウント数と、バッチ間の待ち時間 (秒)
+WISHLIST_SCAN_BATCH = 5
+WISHLIST_SCAN_PAUSE = 2.0
+# 照合対象のアカウントを一度に読み込むユーザー数
+WISHLIST_USER_CHUNK = 500
 
 CLIENT_PLATFORM = base64.b64encode(
     b'{"platformType":"PC","platformOS":"Windows","platformOSVersion":"10.0.19042.1.256.64bit","platformChipset":"Unknown"}'
@@ -30,7 +67,7 @@ class AccountSelectView(discord.ui.View):
     """
     複数のアカウントから一つを選択させるためのView。
     """
-    def __init__(self, accounts: list[RiotAccount], callback_coro, placeholder: str = "アカウントを選択してください..."):
+    def __init__(self, accounts: list[RiotAccount] | tuple[CachedAccount, ...], callback_coro, placeholder: str = "アカウントを選択してください..."):
         super().__init__(timeout=180)
         self.callback_coro = callback_coro
         
@@ -63,22 +100,49 @@ class AccountSelectView(discord.ui.View):
              except discord.NotFound:
                 pass # メッセージが削除されている場合は何もしない
 
+class CatalogState(enum.Enum):
+    """スキンカタログ（skin_cache / level_to_skin_map）の状態"""
+    EMPTY = "empty"        # 未構築
+    BUILDING = "building"  # 構築中（再構築中は古いカタログを使い続ける）
+    READY = "ready"
+    FAILED = "failed"      # 再試行をすべて失敗した
+
+
 class ValorantCommands(commands.Cog):
     account = app_commands.Group(name="account", description="アカウント関連のコマンド")
     store = app_commands.Group(name="store", description="ストア関連のコマンド")
     schedule = app_commands.Group(name="schedule", description="デイリーストアの自動投稿スケジュール")
+    wishlist_group = app_commands.Group(name="wishlist", description="欲しいスキンがストアに並んだときにDMで通知します")
 
-    def __init__(self, bot: commands.Bot, your_domain: str, fernet: Fernet):
+    def __init__(self, bot: commands.Bot, your_domain: str, fernet: Fernet, leases: LeaseManager | None = None):
         self.bot = bot
         self.your_domain = your_domain
         self.fernet = fernet
+        # スケジュール実行のパーティション所有権（複数インスタンス運用時）
+        self.leases = leases or LeaseManager()
         self.skin_cache = {}
         self.level_to_skin_map = {}
+        self.skin_index = SkinSearchIndex({})
         self.client_version = None
+        # カタログは一度だけ構築し、以降はクライアントバージョンが変わったときだけ作り直す
+        self.catalog_state = CatalogState.EMPTY
+        self.catalog_ready = asyncio.Event()
+        self.catalog_version = None
+        self._catalog_task: asyncio.Task | None = None
+        # ウィッシュリストを照合済みのアカウントと、照合したオファーの期限 (UTC)
+        self._wishlist_checked: dict[int, datetime.datetime] = {}
         self.daily_store_task.start()
+        self.wishlist_scan_task.start()
 
-    def cog_unload(self):
+    async def cog_unload(self):
         self.daily_store_task.cancel()
+        self.wishlist_scan_task.cancel()
+        if self._catalog_task:
+            self._catalog_task.cancel()
+        try:
+            await self.leases.release()
+        except Exception as e:
+            log.warning("Failed to release scheduler leases: %s", e)
 
     @tasks.loop(minutes=1)
     async def daily_store_task(self):
@@ -87,114 +151,296 @@ class ValorantCommands(commands.Cog):
         now_jst = datetime.datetime.now(jst)
         
         # 比較のために秒とマイクロ秒を0に設定
-        current_time = now_jst.time().replace(second=0, microsecond=0)
+        fire_at = now_jst.replace(second=0, microsecond=0)
+        current_time = fire_at.time()
+
+        # カタログが無いと投稿できないため、準備ができるまではこの分の実行権を確保しない
+        # （スケジュールごとに待つと1分のループが止まり、後続の分が実行されなくなる）
+        if not self.catalog_ready.is_set():
+            if self.catalog_state in (CatalogState.EMPTY, CatalogState.FAILED):
+                self._start_catalog_build()
+            log.warning("Skipping schedules at %s: skin catalog is not ready (state=%s)", current_time, self.catalog_state.value)
+            return
 
-        async with async_session() as session:
-            result = await session.execute(
-                select(DailyStoreSchedule, RiotAccount.riot_id)
-                .join(RiotAccount, DailyStoreSchedule.riot_account_id == RiotAccount.id)
-                .where(DailyStoreSchedule.schedule_time == current_time)
-            )
-            schedules_to_run = result.all()
+        # このインスタンスが担当するパーティションのリースを更新する
+        # 更新に失敗しても、期限内のリースでこの分の実行権は確保する
+        try:
+            await self.leases.renew()
+        except Exception as e:
+            log.error("Failed to renew scheduler leases: %s", e)
+        # 前回から実行されていない分（引き継ぎ直後や更新失敗の後）もまとめて確保する
+        try:
+            claimed = await self.leases.claim_tick(fire_at.astimezone(datetime.timezone.utc))
+        except Exception as e:
+            log.error("Failed to claim scheduled minute: %s", e)
+            return
+        # 取り分を超えたリースは、この分の実行権を確保してから他インスタンスへ譲る
+        try:
+            await self.leases.hand_over()
+        except Exception as e:
+            log.warning("Failed to hand over scheduler leases: %s", e)
+        if not claimed:
+            return
 
-        for schedule, riot_id in schedules_to_run:
+        # パーティションごとの実行する分 (JSTの時刻 -> 予定時刻)
+        due_by_partition = {
+            partition: {minute.astimezone(jst).time(): minute.astimezone(jst) for minute in minutes}
+            for partition, minutes in claimed.items()
+        }
+        due_times = {t for due in due_by_partition.values() for t in due}
+        if len(due_times) > 1:
+            log.warning("Catching up missed schedules", extra={"minutes": len(due_times)})
+
+        query = (
+            select(DailyStoreSchedule, RiotAccount)
+            .join(RiotAccount, DailyStoreSchedule.riot_account_id == RiotAccount.id)
+            .where(DailyStoreSchedule.schedule_time.in_(sorted(due_times)))
+            .order_by(DailyStoreSchedule.schedule_time, DailyStoreSchedule.id)
+        )
+        if self.leases.partition_count > 1:
+            query = query.where((DailyStoreSchedule.guild_id % self.leases.partition_count).in_(list(due_by_partition)))
+
+        async with async_session() as session:
+            result = await session.execute(query)
+            # パーティションによって実行する分が異なるため、該当しないものを除く
+            schedules_to_run = [
+                (schedule, riot_account) for schedule, riot_account in result.all()
+                if schedule.schedule_time in due_by_partition.get(self.leases.partition_of(schedule.guild_id), {})
+            ]
+
+        for schedule, riot_account in schedules_to_run:
             try:
                 channel = self.bot.get_channel(schedule.channel_id)
                 if channel:
                     # メンションするユーザーを取得
                     user = self.bot.get_user(schedule.discord_user_id) or await self.bot.fetch_user(schedule.discord_user_id)
                     user_mention = user.mention if user else f"<@{schedule.discord_user_id}>"
-                    mention = f"{user_mention} ({riot_id})"
+                    mention = f"{user_mention} ({riot_account.riot_id})"
                     
-                    print(f"Running schedule for user {schedule.discord_user_id} in channel {schedule.channel_id}")
-                    await self._send_daily_store_image(
-                        riot_account_id=schedule.riot_account_id,
-                        channel=channel,
-                        mention=mention
+                    log.debug(
+                        "Running schedule",
+                        extra={"schedule_id": schedule.id, "user_id": schedule.discord_user_id, "channel_id": schedule.channel_id},
                     )
+                    # スケジュールと一緒に読み込んだアカウントをそのまま使う
+                    # 外部APIと画像生成の実行枠は、対話的なコマンドの後に回す
+                    with (
+                        trace("schedule", schedule_id=schedule.id, user_id=schedule.discord_user_id, account_id=riot_account.id),
+                        jobs.priority(jobs.Priority.SCHEDULED),
+                    ):
+                        async with AccountContext(riot_account) as account:
+                            await self._send_daily_store_image(
+                                account=account,
+                                channel=channel,
+                                mention=mention
+                            )
+                    # 予定時刻から投稿完了までの遅れ
+                    scheduled_at = due_by_partition[self.leases.partition_of(schedule.guild_id)][schedule.schedule_time]
+                    SCHEDULE_LAG_SECONDS.observe((datetime.datetime.now(jst) - scheduled_at).total_seconds())
             except Exception as e:
-                print(f"Failed to run schedule {schedule.id}: {e}")
+                log.exception(
+                    "Failed to run schedule",
+                    extra={"schedule_id": schedule.id, "user_id": schedule.discord_user_id, "account_id": riot_account.id},
+                )
 
     @daily_store_task.before_loop
     async def before_daily_store_task(self):
         await self.bot.wait_until_ready()
-        print("Starting daily store task loop...")
+        log.info("Starting daily store task loop...")
+
+
+    @tasks.loop(time=WISHLIST_SCAN_TIME)
+    async def wishlist_scan_task(self):
+        """
+        ストア更新後、ウィッシュリストを登録しているユーザーのアカウントを照合する。
+        スケジュールやコマンドで今回のオファーを取得済みのアカウントはその時点で照合しているため、
+        まだ取得していないアカウントのストアだけを取得する。
+        """
+        if not await self._wait_for_catalog():
+            log.warning("Skipping wishlist scan: skin catalog is not ready")
+            return
+        await wishlist.load()
+        # スケジュールと同じリースで担当を分ける（ユーザーIDでパーティションを決める）
+        # 前回のスケジュール実行から時間が空いている場合があるため、先にリースを更新する
+        try:
+            await self.leases.renew()
+        except Exception as e:
+            log.error("Failed to renew scheduler leases: %s", e)
+            return
+        users = sorted(
+            user_id for user_id in wishlist.watchers
+            if self.leases.partition_of(user_id) in self.leases.owned
+        )
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._wishlist_checked = {
+            account_id: expires_at for account_id, expires_at in self._wishlist_checked.items() if expires_at > now
+        }
+        if not users:
+            return
 
+        log.info("Starting wishlist scan for %d users", len(users))
+        scanned = skipped = 0
+        for i in range(0, len(users), WISHLIST_USER_CHUNK):
+            async with async_session() as session:
+                result = await session.execute(
+                    select(RiotAccount).where(RiotAccount.discord_user_id.in_(users[i:i + WISHLIST_USER_CHUNK]))
+                )
+                accounts = result.scalars().all()
+            # 今回のオファーを照合済みのアカウントは取得し直さない
+            fetched = [account for account in accounts if self._wishlist_checked.get(account.id, now) <= now]
+            skipped += len(accounts) - len(fetched)
+
+            # Riot APIへの負荷を抑えるため、少数ずつ間隔を空けて取得する
+            for j in range(0, len(fetched), WISHLIST_SCAN_BATCH):
+                batch = fetched[j:j + WISHLIST_SCAN_BATCH]
+                with jobs.priority(jobs.Priority.BACKGROUND):
+                    await asyncio.gather(*(self._scan_wishlist_account(account) for account in batch))
+                scanned += len(batch)
+                await asyncio.sleep(WISHLIST_SCAN_PAUSE)
+        log.info("Wishlist scan finished", extra={"accounts": scanned, "skipped": skipped})
+
+    @wishlist_scan_task.before_loop
+    async def before_wishlist_scan_task(self):
+        await self.bot.wait_until_ready()
+
+    async def _scan_wishlist_account(self, riot_account: RiotAccount):
+        """1アカウントのストアを取得する（照合は _get_storefront_with_reauth の中で行う）"""
+        try:
+            with trace("wishlist_scan", account_id=riot_account.id, user_id=riot_account.discord_user_id):
+                async with AccountContext(riot_account) as account:
+                    await self._get_storefront_with_reauth(account)
+        except Exception as e:
+            log.warning("Wishlist scan failed: %s", e, extra={"account_id": riot_account.id})
+
+    async def _check_wishlist(self, riot_account: RiotAccount, store_data: dict):
+        """取得したストアの日替わりオファーをウィッシュリストと照合し、一致があればDMで通知する（オファーごとに1回）"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self._wishlist_checked.get(riot_account.id, now) > now or not self.catalog_ready.is_set():
+            return
+        await wishlist.ensure_loaded()
+        if not wishlist.ready or not wishlist.skins_of(riot_account.discord_user_id):
+            return
+        remaining = store_data['SkinsPanelLayout'].get('SingleItemOffersRemainingDurationInSeconds')
+        if remaining is None:
+            # 次のストア更新 (0:00 UTC) まで
+            next_reset = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), datetime.timezone.utc)
+            remaining = (next_reset - now).total_seconds()
+        self._wishlist_checked[riot_account.id] = now + datetime.timedelta(seconds=remaining)
+
+        offers = resolve_offers(store_data, self.level_to_skin_map, self.skin_cache)
+        matched = set(wishlist.matches(riot_account.id, [offer.skin_level_uuid for offer in offers]))
+        if not matched:
+            return
+
+        embed = discord.Embed(
+            title="ウィッシュリストのスキンがストアに並んでいます",
+            description=f"アカウント: **{riot_account.account_name}** ({riot_account.riot_id})",
+            color=discord.Color.green(),
+        )
+        offers = [offer for offer in offers if offer.skin_level_uuid in matched]
+        for offer in offers:
+            embed.add_field(name=offer.skin.get('name_ja', offer.skin_uuid), value=f"{offer.price} VP", inline=False)
+        first_icon = offers[0].skin.get('icon')
+        if first_icon:
+            embed.set_thumbnail(url=first_icon)
+
+        try:
+            user = self.bot.get_user(riot_account.discord_user_id) or await self.bot.fetch_user(riot_account.discord_user_id)
+            await user.send(embed=embed)
+        except discord.HTTPException as e:
+            # DMを受け付けていないユーザーなど
+            log.info("Could not send wishlist DM: %s", e, extra={"user_id": riot_account.discord_user_id})
 
     @commands.Cog.listener()
     async def on_ready(self):
-        await asyncio.gather(
-            self.build_caches(),
-            self.fetch_client_version()
-        )
+        # on_ready はゲートウェイの再接続のたびに呼ばれるため、構築済みならバージョンの確認だけ行う
+        if self.catalog_state in (CatalogState.EMPTY, CatalogState.FAILED):
+            self._start_catalog_build()
+            return
+        if self.catalog_state is not CatalogState.READY:
+            return
+        await self.fetch_client_version()
+        if self.client_version and self.client_version != self.catalog_version:
+            log.info("Client version changed (%s -> %s). Rebuilding skin catalog.", self.catalog_version, self.client_version)
+            self._start_catalog_build()
 
-    async def build_caches(self):
-        print("Building efficient skin caches from Valorant-API...")
+    def _start_catalog_build(self):
+        if self._catalog_task and not self._catalog_task.done():
+            return
+        self._catalog_task = asyncio.create_task(self._build_catalog(), name="skin-catalog-build")
+
+    async def _build_catalog(self):
+        """カタログを構築する。失敗した場合は間隔を空けて再試行する"""
+        self.catalog_state = CatalogState.BUILDING
+        for delay in (0, *CATALOG_RETRY_DELAYS):
+            if delay:
+                await asyncio.sleep(delay)
+            built, _ = await asyncio.gather(self.build_caches(), self.fetch_client_version())
+            if built:
+                self.catalog_version = self.client_version
+                self.catalog_state = CatalogState.READY
+                self.catalog_ready.set()
+                return
+            log.warning("Skin catalog build failed.")
+        # 以前のカタログがあればそれを使い続ける
+        self.catalog_state = CatalogState.READY if self.catalog_ready.is_set() else CatalogState.FAILED
+        log.error("Giving up building skin catalog (state=%s)", self.catalog_state.value)
+
+    async def _wait_for_catalog(self) -> bool:
+        """カタログの準備完了を待つ。タイムアウトした場合は False"""
+        if self.catalog_ready.is_set():
+            return True
+        if self.catalog_state in (CatalogState.EMPTY, CatalogState.FAILED):
+            self._start_catalog_build()
+        with span("catalog_wait", state=self.catalog_state.value):
+            try:
+                await asyncio.wait_for(self.catalog_ready.wait(), CATALOG_WAIT_TIMEOUT)
+                return True
+            except asyncio.TimeoutError:
+                return False
+
+    async def build_caches(self) -> bool:
+        """Valorant-APIからカタログを取得し、完成したものだけを差し替える"""
+        log.info("Building efficient skin caches from Valorant-API...")
         try:
-            tiers = {}
-            async with self.bot.http_session.get("https://valorant-api.com/v1/contenttiers?language=ja-JP") as r:
+            async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/contenttiers?language=ja-JP") as r:
                 r.raise_for_status()
-                for tier in (await r.json())['data']:
-                    hex_color = tier['highlightColor'].lstrip('#')[:6]
-                    if hex_color:
-                        tiers[tier['uuid']] = {
-                            "name": tier['devName'], 
-                            "color": discord.Color(int(hex_color, 16))
-                        }
-
-            async with self.bot.http_session.get("https://valorant-api.com/v1/weapons/skins") as r_skins:
+                tiers_data = (await r.json())['data']
+            async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/weapons/skins") as r_skins:
                 r_skins.raise_for_status()
                 all_skins_data = (await r_skins.json())['data']
-                
-                async with self.bot.http_session.get("https://valorant-api.com/v1/weapons/skins?language=ja-JP") as r_skins_ja:
-                    r_skins_ja.raise_for_status()
-                    all_skins_ja_data = (await r_skins_ja.json())['data']
-                    ja_names = {skin['uuid']: skin['displayName'] for skin in all_skins_ja_data}
-
-                    for skin in all_skins_data:
-                        tier_uuid = skin.get('contentTierUuid')
-                        tier_info = tiers.get(tier_uuid, {})
-
-                        self.skin_cache[skin['uuid']] = {
-                            "name_ja": ja_names.get(skin['uuid'], skin['displayName']),
-                            "name_en": skin['displayName'],
-                            "rarity_name": tier_info.get("name", "Select"),
-                            "color": tier_info.get("color", discord.Color.default()),
-                            "icon": skin['displayIcon']
-                        }
-                        for level in skin['levels']:
-                            self.level_to_skin_map[level['uuid']] = skin['uuid']
-            
-            print(f"Successfully built caches for {len(self.skin_cache)} skins and {len(self.level_to_skin_map)} levels.")
-        except Exception as e:
-            print(f"Failed to build caches: {e}")
+            async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/weapons/skins?language=ja-JP") as r_skins_ja:
+                r_skins_ja.raise_for_status()
+                all_skins_ja_data = (await r_skins_ja.json())['data']
+            skin_cache, level_to_skin_map = build_catalog(tiers_data, all_skins_data, all_skins_ja_data)
+        except Exception:
+            log.exception("Failed to build caches")
+            return False
+
+        # 検索インデックスの構築は数十ミリ秒かかるため、イベントループの外で行う
+        skin_index = await asyncio.to_thread(SkinSearchIndex, skin_cache)
+        self.skin_cache = skin_cache
+        self.level_to_skin_map = level_to_skin_map
+        self.skin_index = skin_index
+        wishlist.set_catalog(level_to_skin_map)
+        log.info("Successfully built caches for %d skins and %d levels.", len(skin_cache), len(level_to_skin_map))
+        return True
 
     async def fetch_client_version(self):
-        print("Fetching latest client version from Valorant-API...")
+        log.info("Fetching latest client version from Valorant-API...")
         try:
-            async with self.bot.http_session.get("https://valorant-api.com/v1/version") as resp:
+            async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/version") as resp:
                 resp.raise_for_status()
                 data = await resp.json()
                 self.client_version = data['data']['riotClientVersion']
-                print(f"Client version fetched: {self.client_version}")
+                log.info("Client version fetched: %s", self.client_version)
         except Exception as e:
-            print(f"Failed to fetch client version: {e}")
+            log.error("Failed to fetch client version: %s", e)
 
     @account.command(name="link", description="Valorantアカウントを連携します。")
     async def link(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
 
-        state_token = str(uuid.uuid4())
-        expiry_time = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=10)
-
-        async with async_session() as session:
-            async with session.begin():
-                new_state = State(
-                    state_token=state_token,
-                    user_id=interaction.user.id,
-                    expiry=expiry_time
-                )
-                session.add(new_state)
+        state_token = await state_store.create(interaction.user.id)
 
         auth_url = f"https://{self.your_domain}/auth?state={state_token}&client_id={self.bot.user.id}"
 
@@ -238,45 +484,31 @@ class ValorantCommands(commands.Cog):
     async def unlink(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
 
-        async with async_session() as session:
-            result = await session.execute(
-                select(RiotAccount).where(RiotAccount.discord_user_id == interaction.user.id)
-            )
-            accounts = result.scalars().all()
+        accounts = await account_cache.get(interaction.user.id)
 
         if not accounts:
             await interaction.followup.send("連携されているアカウントはありません。", ephemeral=True)
             return
 
         if len(accounts) == 1:
-            account_to_delete = accounts[0]
-            async with async_session() as session:
-                async with session.begin():
-                    # 関連するスケジュールも削除
-                    await session.execute(delete(DailyStoreSchedule).where(DailyStoreSchedule.riot_account_id == account_to_delete.id))
-                    await session.delete(account_to_delete)
-            await interaction.followup.send(f"アカウント「{account_to_delete.account_name}」の連携を解除しました。", ephemeral=True)
+            # 関連するスケジュールは外部キーのカスケードで削除される
+            account_name = await delete_riot_account(interaction.user.id, accounts[0].id)
+            account_cache.invalidate(interaction.user.id)
+            await wishlist.reload_accounts(interaction.user.id)
+            if account_name is None:
+                await interaction.followup.send("エラーが発生しました。対象のアカウントが見つからないか、権限がありません。", ephemeral=True)
+                return
+            await interaction.followup.send(f"アカウント「{account_name}」の連携を解除しました。", ephemeral=True)
             return
         
         async def callback(i: discord.Interaction, account_id: int):
-            async with async_session() as session:
-                async with session.begin():
-                    result = await session.execute(
-                        select(RiotAccount).where(
-                            RiotAccount.id == account_id,
-                            RiotAccount.discord_user_id == i.user.id
-                        )
-                    )
-                    account = result.scalar_one_or_none()
-
-                    if account:
-                        account_name = account.account_name
-                        # 関連するスケジュールも削除
-                        await session.execute(delete(DailyStoreSchedule).where(DailyStoreSchedule.riot_account_id == account_id))
-                        await session.delete(account)
-                        await i.response.send_message(f"アカウント「{account_name}」の連携を解除しました。", ephemeral=True)
-                    else:
-                        await i.response.send_message("エラーが発生しました。対象のアカウントが見つからないか、権限がありません。", ephemeral=True)
+            account_name = await delete_riot_account(i.user.id, account_id)
+            account_cache.invalidate(i.user.id)
+            await wishlist.reload_accounts(i.user.id)
+            if account_name:
+                await i.response.send_message(f"アカウント「{account_name}」の連携を解除しました。", ephemeral=True)
+            else:
+                await i.response.send_message("エラーが発生しました。対象のアカウントが見つからないか、権限がありません。", ephemeral=True)
 
         view = AccountSelectView(accounts, callback, placeholder="連携を解除するアカウントを選択")
         await interaction.followup.send("連携を解除するアカウントを選択してください。", view=view, ephemeral=True)
@@ -314,19 +546,26 @@ class ValorantCommands(commands.Cog):
                 ).values(account_name=new_name)
                 
                 result = await session.execute(stmt)
+                updated = result.rowcount
 
-                if result.rowcount == 0:
-                    await interaction.followup.send(f"エラー: Riot ID「{riot_id}」のアカウントが見つからないか、あなたのアカウントではありません。", ephemeral=True)
-                else:
-                    await interaction.followup.send(f"Riot ID「{riot_id}」のアカウントのニックネームを「{new_name}」に変更しました。", ephemeral=True)
+        if updated == 0:
+            await interaction.followup.send(f"エラー: Riot ID「{riot_id}」のアカウントが見つからないか、あなたのアカウントではありません。", ephemeral=True)
+        else:
+            # コミット前に無効化すると、並行した読み込みが古い名前を再びキャッシュしてしまう
+            account_cache.invalidate(interaction.user.id)
+            await interaction.followup.send(f"Riot ID「{riot_id}」のアカウントのニックネームを「{new_name}」に変更しました。", ephemeral=True)
 
     async def _execute_valorant_command(self, interaction: discord.Interaction, command_logic):
         """Valorant関連コマンドの共通処理（アカウント選択など）"""
-        async with async_session() as session:
-            result = await session.execute(
-                select(RiotAccount).where(RiotAccount.discord_user_id == interaction.user.id)
-            )
-            accounts = result.scalars().all()
+        command_name = interaction.command.qualified_name if interaction.command else None
+        with trace("command", command=command_name, user_id=interaction.user.id):
+            await self._select_account_and_run(interaction, command_logic, command_name)
+
+    async def _select_account_and_run(self, interaction: discord.Interaction, command_logic, command_name: str | None):
+        """アカウントを選択させ、選択されたアカウントでコマンド本体を実行する"""
+        # アカウント選択はキャッシュから行い、DBからは選択後の1件だけを読み込む
+        with span("account_cache.get"):
+            accounts = await account_cache.get(interaction.user.id)
 
         if not accounts:
             embed = discord.Embed(title="アカウント未連携", description="`/account link` コマンドで先にアカウントを連携してください。", color=discord.Color.orange())
@@ -334,21 +573,198 @@ class ValorantCommands(commands.Cog):
             return
 
         if len(accounts) == 1:
-            await command_logic(interaction, accounts[0].id)
+            account = await AccountContext.load(accounts[0].id, interaction.user.id)
+            if not account:
+                account_cache.invalidate(interaction.user.id)
+                await interaction.followup.send("エラー: アカウントが見つかりませんでした。", ephemeral=True)
+                return
+            await self._run_command_logic(interaction, account, command_logic)
         else:
             async def callback(i: discord.Interaction, account_id: int):
                 # コールバックからのインタラクションは ephemeral である必要がある場合が多い
                 # is_followup を True にして、応答を適切に処理させる
-                await command_logic(i, account_id, is_followup=True)
+                # アカウント選択後の処理は別のリクエストとしてトレースする
+                with trace("command", command=command_name, user_id=i.user.id, selected=True):
+                    account = await AccountContext.load(account_id, i.user.id)
+                    if not account:
+                        account_cache.invalidate(i.user.id)
+                        await i.response.send_message("エラー: アカウントが見つかりませんでした。", ephemeral=True)
+                        return
+                    await self._run_command_logic(i, account, command_logic, command_name=command_name, is_followup=True)
 
             view = AccountSelectView(accounts, callback, placeholder="情報を表示するアカウントを選択")
             await interaction.followup.send("情報を表示するアカウントを選択してください。", view=view, ephemeral=True)
 
+    async def _run_command_logic(self, interaction: discord.Interaction, account: AccountContext, command_logic, command_name: str | None = None, **kwargs):
+        """アカウントのコンテキスト内でコマンド本体を実行し、所要時間を記録する"""
+        if command_name is None and interaction.command:
+            command_name = interaction.command.qualified_name
+        start = time.perf_counter()
+        try:
+            # 混雑時は応答期限までに終わらない見込みのコマンドを受け付けない
+            async with command_admission.admit(interaction_deadline(interaction)):
+                async with account:
+                    await command_logic(interaction, account, **kwargs)
+        except Overloaded as e:
+            await self._reply_busy(interaction, e, command_name)
+            return
+        elapsed = time.perf_counter() - start
+        COMMAND_SECONDS.observe(elapsed, command=command_name or "unknown")
+        log.info(
+            "Command completed",
+            extra={
+                "command": command_name,
+                "user_id": interaction.user.id,
+                "account_id": account.id,
+                "duration_ms": round(elapsed * 1000, 1),
+            },
+        )
+
+    async def _reply_busy(self, interaction: discord.Interaction, error: Overloaded, command_name: str | None):
+        """受け付けられなかったコマンドに混雑中である旨を返す"""
+        log.warning("Command rejected (%s)", error.reason, extra={"command": command_name, "user_id": interaction.user.id})
+        message = "現在リクエストが混み合っています。少し時間をおいてからもう一度お試しください。"
+        if interaction.response.is_done():
+            await interaction.followup.send(message, ephemeral=True)
+        else:
+            await interaction.response.send_message(message, ephemeral=True)
+
     @store.command(name="daily", description="日替わりオファーを表示します。")
     async def store_daily(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         await self._execute_valorant_command(interaction, self._daily_logic)
 
+    @store.command(name="all", description="連携しているすべてのアカウントの日替わりオファーをまとめて表示します。")
+    async def store_all(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        command_name = interaction.command.qualified_name if interaction.command else "store all"
+        with trace("command", command=command_name, user_id=interaction.user.id):
+            start = time.perf_counter()
+            try:
+                async with command_admission.admit(interaction_deadline(interaction)):
+                    accounts = await self._all_daily_logic(interaction)
+            except Overloaded as e:
+                await self._reply_busy(interaction, e, command_name)
+                return
+            elapsed = time.perf_counter() - start
+        COMMAND_SECONDS.observe(elapsed, command=command_name)
+        log.info(
+            "Command completed",
+            extra={"command": command_name, "user_id": interaction.user.id, "accounts": accounts, "duration_ms": round(elapsed * 1000, 1)},
+        )
+
+    def _find_skins(self, query: str, limit: int = 10) -> list[str]:
+        """名前（日本語・英語）またはUUIDからスキンを探し、UUIDの一覧を返す。完全一致があればそれだけを返す"""
+        if query in self.skin_cache:
+            return [query]
+        exact = self.skin_index.exact(query)
+        if exact:
+            return [exact]
+        return self.skin_index.search(query, limit)
+
+    def _skin_choices(self, skin_uuids) -> list[app_commands.Choice[str]]:
+        # 選択肢の名前は100文字まで
+        return [app_commands.Choice(name=self._skin_label(skin_uuid)[:100], value=skin_uuid) for skin_uuid in skin_uuids]
+
+    async def skin_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        return self._skin_choices(self.skin_index.search(current, limit=25))
+
+    async def wishlist_autocomplete(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """ウィッシュリストに登録済みのスキンだけを候補にする"""
+        registered = wishlist.skins_of(interaction.user.id)
+        if not current:
+            return self._skin_choices(sorted(registered, key=self._skin_label)[:25])
+        return self._skin_choices([
+            skin_uuid for skin_uuid in self.skin_index.search(current, limit=200) if skin_uuid in registered
+        ][:25])
+
+    @app_commands.command(name="skin", description="スキンを名前で検索して表示します。")
+    @app_commands.describe(name="スキン名（日本語または英語）")
+    @app_commands.autocomplete(name=skin_autocomplete)
+    async def skin(self, interaction: discord.Interaction, name: str):
+        if not self.catalog_ready.is_set():
+            await interaction.response.send_message("スキン情報を準備中です。しばらくしてからもう一度お試しください。", ephemeral=True)
+            return
+        candidates = self._find_skins(name)
+        if len(candidates) != 1:
+            message = f"「{name}」に一致するスキンが見つかりませんでした。" if not candidates else (
+                "複数のスキンが一致しました。候補から選択してください。\n" + "\n".join(f"・{self._skin_label(skin_uuid)}" for skin_uuid in candidates)
+            )
+            await interaction.response.send_message(message, ephemeral=True)
+            return
+
+        skin_uuid = candidates[0]
+        info = self.skin_cache[skin_uuid]
+        embed = discord.Embed(title=info['name_ja'], description=info['name_en'], color=info.get('color', discord.Color.default()))
+        embed.add_field(name="レアリティ", value=info.get('rarity_name', 'Select'))
+        if skin_uuid in wishlist.skins_of(interaction.user.id):
+            embed.set_footer(text="ウィッシュリストに登録済み")
+        if info.get('icon'):
+            embed.set_image(url=info['icon'])
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    def _skin_label(self, skin_uuid: str) -> str:
+        info = self.skin_cache.get(skin_uuid)
+        if not info:
+            return f"不明なスキン ({skin_uuid})"
+        return f"{info['name_ja']} / {info['name_en']}"
+
+    @wishlist_group.command(name="add", description="ウィッシュリストにスキンを追加します。")
+    @app_commands.describe(skin="スキン名（日本語または英語）")
+    @app_commands.autocomplete(skin=skin_autocomplete)
+    async def wishlist_add(self, interaction: discord.Interaction, skin: str):
+        await interaction.response.defer(ephemeral=True)
+        if not await self._wait_for_catalog():
+            await interaction.followup.send("スキン情報を準備中です。しばらくしてからもう一度お試しください。", ephemeral=True)
+            return
+        candidates = self._find_skins(skin)
+        if not candidates:
+            await interaction.followup.send(f"「{skin}」に一致するスキンが見つかりませんでした。", ephemeral=True)
+            return
+        if len(candidates) > 1:
+            names = "\n".join(f"・{self._skin_label(skin_uuid)}" for skin_uuid in candidates)
+            await interaction.followup.send(f"複数のスキンが一致しました。名前を正確に入力してください。\n{names}", ephemeral=True)
+            return
+
+        try:
+            added = await wishlist.add(interaction.user.id, candidates[0])
+        except ValueError as e:
+            await interaction.followup.send(str(e), ephemeral=True)
+            return
+        label = self._skin_label(candidates[0])
+        if added:
+            await interaction.followup.send(f"**{label}** をウィッシュリストに追加しました。ストアに並んだらDMでお知らせします。", ephemeral=True)
+        else:
+            await interaction.followup.send(f"**{label}** は既にウィッシュリストに登録されています。", ephemeral=True)
+
+    @wishlist_group.command(name="remove", description="ウィッシュリストからスキンを削除します。")
+    @app_commands.describe(skin="スキン名（日本語または英語）")
+    @app_commands.autocomplete(skin=wishlist_autocomplete)
+    async def wishlist_remove(self, interaction: discord.Interaction, skin: str):
+        await interaction.response.defer(ephemeral=True)
+        await wishlist.ensure_loaded()
+        registered = wishlist.skins_of(interaction.user.id)
+        candidates = [skin_uuid for skin_uuid in self._find_skins(skin, limit=len(self.skin_cache)) if skin_uuid in registered]
+        if skin in registered:
+            candidates = [skin]
+        if len(candidates) != 1:
+            await interaction.followup.send(f"ウィッシュリストに「{skin}」に一致するスキンが1件だけ見つかりませんでした。`/wishlist list` で確認してください。", ephemeral=True)
+            return
+        await wishlist.remove(interaction.user.id, candidates[0])
+        await interaction.followup.send(f"**{self._skin_label(candidates[0])}** をウィッシュリストから削除しました。", ephemeral=True)
+
+    @wishlist_group.command(name="list", description="ウィッシュリストを表示します。")
+    async def wishlist_list(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        await wishlist.ensure_loaded()
+        registered = wishlist.skins_of(interaction.user.id)
+        if not registered:
+            await interaction.followup.send("ウィッシュリストは空です。`/wishlist add` でスキンを追加できます。", ephemeral=True)
+            return
+        embed = discord.Embed(title="ウィッシュリスト", color=discord.Color.blurple())
+        embed.description = "\n".join(f"・{self._skin_label(skin_uuid)}" for skin_uuid in sorted(registered, key=self._skin_label))
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @store.command(name="bundle", description="現在のおすすめバンドルを表示します。")
     async def store_bundle(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
@@ -356,34 +772,19 @@ class ValorantCommands(commands.Cog):
 
     async def _update_or_create_schedule(self, user_id: int, guild_id: int, channel_id: int, account_id: int, schedule_time: datetime.time, time_str: str) -> str:
         """Helper to update or create a schedule. Returns a confirmation message."""
-        async with async_session() as session:
-            async with session.begin():
-                result = await session.execute(
-                    select(DailyStoreSchedule).where(
-                        DailyStoreSchedule.discord_user_id == user_id,
-                        DailyStoreSchedule.guild_id == guild_id,
-                        DailyStoreSchedule.channel_id == channel_id
-                    )
-                )
-                existing_schedule = result.scalar_one_or_none()
-
-                channel_mention = f"<#{channel_id}>"
+        # (ユーザー, ギルド, チャンネル) の一意制約に対する upsert で1往復にする
+        created = await upsert_schedule(
+            discord_user_id=user_id,
+            guild_id=guild_id,
+            channel_id=channel_id,
+            riot_account_id=account_id,
+            schedule_time=schedule_time
+        )
 
-                if existing_schedule:
-                    existing_schedule.schedule_time = schedule_time
-                    existing_schedule.riot_account_id = account_id
-                    message = f"{channel_mention} の自動投稿スケジュールを、毎日 **{time_str}** に更新しました。"
-                else:
-                    new_schedule = DailyStoreSchedule(
-                        discord_user_id=user_id,
-                        riot_account_id=account_id,
-                        guild_id=guild_id,
-                        channel_id=channel_id,
-                        schedule_time=schedule_time
-                    )
-                    session.add(new_schedule)
-                    message = f"{channel_mention} に、毎日日本時間 **{time_str}** にデイリーストアを自動投稿するよう設定しました。"
-            return message
+        channel_mention = f"<#{channel_id}>"
+        if not created:
+            return f"{channel_mention} の自動投稿スケジュールを、毎日 **{time_str}** に更新しました。"
+        return f"{channel_mention} に、毎日日本時間 **{time_str}** にデイリーストアを自動投稿するよう設定しました。"
 
     @schedule.command(name="add", description="このチャンネルにデイリーストアの自動投稿を予約します。")
     @app_commands.describe(time="投稿する時刻 (HH:MM形式, 24時間表記, 日本時間)")
@@ -409,9 +810,7 @@ class ValorantCommands(commands.Cog):
             )
             await i.followup.send(message, ephemeral=True)
 
-        async with async_session() as session:
-            result = await session.execute(select(RiotAccount).where(RiotAccount.discord_user_id == interaction.user.id))
-            accounts = result.scalars().all()
+        accounts = await account_cache.get(interaction.user.id)
 
         if not accounts:
             await interaction.followup.send("連携されているアカウントがありません。`/account link`で先に連携してください。", ephemeral=True)
@@ -518,7 +917,7 @@ class ValorantCommands(commands.Cog):
         await interaction.followup.send("削除するスケジュールを以下から選択してください。", view=view, ephemeral=True)
 
 
-    async def _bundle_logic(self, interaction: discord.Interaction, account_id: int, is_followup: bool = False):
+    async def _bundle_logic(self, interaction: discord.Interaction, account: AccountContext, is_followup: bool = False):
         """おすすめバンドル表示のコアロジック"""
         # is_followupがTrueなら、元のインタラクションは既に処理済みなので新しい応答を開始
         if is_followup:
@@ -530,7 +929,8 @@ class ValorantCommands(commands.Cog):
         await send("ストア情報を取得しています...", ephemeral=True)
 
         try:
-            store_data = await self._get_storefront_with_reauth(account_id)
+            with span("storefront", account_id=account.id):
+                store_data = await self._get_storefront_with_reauth(account)
         except Exception as e:
             embed = discord.Embed(title="認証エラー", description=f"アカウント情報の更新に失敗しました。\n`{e}`\n`/account link`コマンドで再連携してください。", color=discord.Color.red())
             await send(embed=embed, ephemeral=True)
@@ -541,7 +941,7 @@ class ValorantCommands(commands.Cog):
             bundle_price = list(bundle_data['TotalDiscountedCost'].values())[0]
             bundle_uuid = bundle_data['DataAssetID']
             
-            async with self.bot.http_session.get(f"https://valorant-api.com/v1/bundles/{bundle_uuid}?language=ja-JP") as r:
+            async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/bundles/{bundle_uuid}?language=ja-JP") as r:
                 if r.ok:
                     bundle_api_data = (await r.json())['data']
                     bundle_name = bundle_api_data['displayName']
@@ -559,11 +959,11 @@ class ValorantCommands(commands.Cog):
                 else:
                     await send("バンドル情報の取得に失敗しました。", ephemeral=True)
         except Exception as e:
-            print(f"Could not process featured bundle: {e}")
+            log.exception("Could not process featured bundle", extra={"account_id": account.id})
             await send("バンドル情報の処理中にエラーが発生しました。", ephemeral=True)
 
 
-    async def _daily_logic(self, interaction: discord.Interaction, account_id: int, is_followup: bool = False):
+    async def _daily_logic(self, interaction: discord.Interaction, account: AccountContext, is_followup: bool = False):
         """日替わりオファー表示のコアロジック（インタラクション起点）"""
         # is_followupはアカウント選択メニューからのコールバックを示す
         if is_followup:
@@ -573,18 +973,16 @@ class ValorantCommands(commands.Cog):
         # ephemeralなフォローアップメッセージを送信
         await interaction.followup.send("ストア情報を取得しています...", ephemeral=True)
 
-        async with async_session() as session:
-            riot_account = await session.get(RiotAccount, account_id)
-            if not riot_account:
-                await interaction.followup.send("エラー: アカウントが見つかりませんでした。", ephemeral=True)
-                return
-            riot_id = riot_account.riot_id
-        
-        mention = f"{interaction.user.mention} ({riot_id})"
+        # 画像はチャンネルに投稿するため、準備中の案内はここでephemeralに返す
+        if not await self._wait_for_catalog():
+            await interaction.followup.send("スキン情報を準備中です。しばらくしてからもう一度お試しください。", ephemeral=True)
+            return
+
+        mention = f"{interaction.user.mention} ({account.account.riot_id})"
 
         # 最終的なストア画像はパブリックに投稿する
         await self._send_daily_store_image(
-            riot_account_id=account_id,
+            account=account,
             channel=interaction.channel,
             mention=mention,
             send_func=None, # channel.send を使用させる
@@ -592,129 +990,257 @@ class ValorantCommands(commands.Cog):
             interaction=None # ephemeralなインタラクションを操作させない
         )
 
-    async def _send_daily_store_image(self, riot_account_id: int, channel: discord.TextChannel, mention: str, send_func=None, is_ephemeral: bool = False, interaction: discord.Interaction = None):
+    async def _all_daily_logic(self, interaction: discord.Interaction) -> int:
+        """
+        全アカウントのストアを並行して取得し、画像をまとめて投稿する。
+        再認証の失敗などはアカウントごとに扱い、他のアカウントの投稿は続ける。
+        処理したアカウント数を返す。
+        """
+        with span("account_cache.get"):
+            accounts = await account_cache.get(interaction.user.id)
+        if not accounts:
+            embed = discord.Embed(title="アカウント未連携", description="`/account link` コマンドで先にアカウントを連携してください。", color=discord.Color.orange())
+            await interaction.followup.send(embed=embed, ephemeral=True)
+            return 0
+        if not await self._wait_for_catalog():
+            await interaction.followup.send("スキン情報を準備中です。しばらくしてからもう一度お試しください。", ephemeral=True)
+            return 0
+
+        await interaction.followup.send(f"{len(accounts)}件のアカウントのストア情報を取得しています...", ephemeral=True)
+
+        semaphore = asyncio.Semaphore(ALL_ACCOUNTS_CONCURRENCY)
+
+        async def build(cached: CachedAccount) -> str | None:
+            async with semaphore:
+                with span("account", account_id=cached.id):
+                    account = await AccountContext.load(cached.id, interaction.user.id)
+                    if not account:
+                        raise LookupError("アカウントが見つかりませんでした。")
+                    # トークンの書き戻しはアカウントごとに行う
+                    async with account:
+                        with span("storefront", account_id=account.id):
+                            store_data = await self._get_storefront_with_reauth(account)
+                    return await self._build_daily_store_image(store_data)
+
+        results = await asyncio.gather(*(build(cached) for cached in accounts), return_exceptions=True)
+
+        images: list[tuple[CachedAccount, str]] = []
+        failed: list[CachedAccount] = []
+        for cached, result in zip(accounts, results):
+            if isinstance(result, BaseException):
+                log.warning("Failed to build store image: %r", result, extra={"account_id": cached.id})
+                failed.append(cached)
+            elif not result:
+                failed.append(cached)
+            else:
+                images.append((cached, result))
+
+        # 投稿権限が無いなどで投稿できなかったアカウント
+        unposted: list[CachedAccount] = []
+        try:
+            for i in range(0, len(images), MAX_ATTACHMENTS_PER_MESSAGE):
+                chunk = images[i:i + MAX_ATTACHMENTS_PER_MESSAGE]
+                names = "\n".join(f"{n}. {cached.account_name} ({cached.riot_id})" for n, (cached, _) in enumerate(chunk, start=i + 1))
+                files = [discord.File(path, filename=f"store_{n}.png") for n, (_, path) in enumerate(chunk, start=i + 1)]
+                try:
+                    with UPLOAD_SECONDS.time(target="channel"), span("upload", files=len(files)):
+                        await interaction.channel.send(content=f"{interaction.user.mention} のデイリーストア\n{names}", files=files)
+                except discord.HTTPException as e:
+                    log.warning("Failed to post store images: %s", e, extra={"user_id": interaction.user.id})
+                    unposted.extend(cached for cached, _ in chunk)
+        finally:
+            await self._remove_files([path for _, path in images])
+
+        if failed:
+            names = "\n".join(f"・{cached.account_name} ({cached.riot_id})" for cached in failed)
+            await interaction.followup.send(
+                f"次のアカウントのストア画像を作成できませんでした。認証エラーの場合は`/account link`コマンドで再連携してください。\n{names}",
+                ephemeral=True,
+            )
+        if unposted:
+            names = "\n".join(f"・{cached.account_name} ({cached.riot_id})" for cached in unposted)
+            await interaction.followup.send(
+                f"ストア情報の処理中にエラーが発生しました。このチャンネルに次のアカウントのストア画像を投稿できませんでした。\n{names}",
+                ephemeral=True,
+            )
+        if not failed and not unposted:
+            # 元の "取得中..." メッセージを削除
+            await interaction.delete_original_response()
+        return len(accounts)
+
+    async def _post_store_image(self, post, image_path: str, content: str, target: str):
+        """
+        ストア画像を投稿する。同じ内容の画像を既にアップロードしていれば、
+        そのURLを埋め込みで参照してアップロードを省く。
+        """
+        async with aiofiles.open(image_path, mode='rb') as f:
+            digest = content_hash(await f.read())
+
+        cached_url = upload_cache.get(digest)
+        # Discordは埋め込み画像のURLを投稿時に確認しないため、元のメッセージが削除されて
+        # 画像が消えていても投稿自体は成功してしまう。再利用する前にURLがまだ有効か確かめる
+        if cached_url and not await self._is_url_alive(cached_url):
+            log.info("Cached store image is no longer available. Uploading again.")
+            upload_cache.discard(digest)
+            cached_url = None
+        if cached_url:
+            embed = discord.Embed().set_image(url=cached_url)
+            try:
+                with UPLOAD_SECONDS.time(target=f"{target}_cached"), span("upload", cached=True):
+                    await post(content=content, embed=embed)
+                return
+            except discord.HTTPException as e:
+                # 埋め込みでの投稿自体が失敗した場合は通常のアップロードに戻す
+                log.warning("Failed to post cached store image: %s", e)
+                upload_cache.discard(digest)
+
+        with UPLOAD_SECONDS.time(target=target), span("upload", cached=False):
+            message = await post(content=content, file=discord.File(image_path))
+        if message and message.attachments:
+            upload_cache.put(digest, message.attachments[0].url)
+
+    async def _is_url_alive(self, url: str) -> bool:
+        """HEADリクエストでURLの画像がまだ取得できるか確かめる"""
+        try:
+            with span("upload_cache_check"):
+                async with self.bot.http_session.head(url, timeout=UPLOAD_CHECK_TIMEOUT) as r:
+                    return r.ok
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.debug("Cached image check failed: %r", e)
+            return False
+
+    async def _send_daily_store_image(self, account: AccountContext, channel: discord.TextChannel, mention: str, send_func=None, is_ephemeral: bool = False, interaction: discord.Interaction = None):
         """日替わりオファーの画像を作成して送信する共通関数"""
         send = send_func or channel.send
-        
+
+        # カタログが空のままだと全オファーが読み飛ばされる。準備完了の待機は呼び出し側で済ませておくこと
+        if not self.catalog_ready.is_set():
+            log.warning("Skin catalog not ready (state=%s)", self.catalog_state.value, extra={"account_id": account.id})
+            if is_ephemeral:
+                await send("スキン情報を準備中です。しばらくしてからもう一度お試しください。", ephemeral=True)
+            return
+
         try:
-            store_data = await self._get_storefront_with_reauth(riot_account_id)
+            with span("storefront", account_id=account.id):
+                store_data = await self._get_storefront_with_reauth(account)
         except Exception as e:
             embed = discord.Embed(title="認証エラー", description=f"アカウント情報の更新に失敗しました。\n`{e}`\n`/account link`コマンドで再連携してください。", color=discord.Color.red())
             await send(embed=embed, ephemeral=is_ephemeral)
             return
 
-        temp_image_paths = []
         final_image_path = None
+        try:
+            final_image_path = await self._build_daily_store_image(store_data)
+
+            if final_image_path:
+                # ephemeralな場合はfollowup.sendを使い、そうでない場合はchannel.sendを使う
+                post = functools.partial(send, ephemeral=True) if is_ephemeral else channel.send
+                await self._post_store_image(post, final_image_path, f"{mention} のデイリーストア", "interaction" if is_ephemeral else "channel")
+                # 元の "取得中..." メッセージを削除
+                if is_ephemeral and interaction:
+                    await interaction.delete_original_response()
+            else:
+                await send("画像の生成に失敗しました。", ephemeral=is_ephemeral)
+
+        except Exception as e:
+            log.exception("Store command failed during image processing", extra={"account_id": account.id})
+            await send("ストア情報の処理中にエラーが発生しました。", ephemeral=is_ephemeral)
+
+        finally:
+            if final_image_path:
+                await self._remove_files([final_image_path])
+
+    async def _build_daily_store_image(self, store_data: dict) -> str | None:
+        """
+        ストアフロントの日替わりオファーから画像を作成し、そのパスを返す。
+        作成した画像は呼び出し側で削除すること。
+        """
+        temp_image_paths = []
         try:
             if not os.path.exists("temp_images"): os.makedirs("temp_images")
 
             daily_offers = store_data['SkinsPanelLayout']['SingleItemStoreOffers']
+            resolved = resolve_offers(store_data, self.level_to_skin_map, self.skin_cache)
+            CACHE_REQUESTS.inc(len(resolved), cache="skin_levels", result="hit")
+            CACHE_REQUESTS.inc(len(daily_offers) - len(resolved), cache="skin_levels", result="miss")
             offers_for_image = []
 
-            for offer in daily_offers:
-                skin_level_uuid = offer['Rewards'][0]['ItemID']
-                parent_skin_uuid = self.level_to_skin_map.get(skin_level_uuid)
-                if not parent_skin_uuid: continue
-                
-                skin_info = self.skin_cache.get(parent_skin_uuid)
-                if not skin_info: continue
-
+            for skin_level_uuid, _, skin_info, skin_price in resolved:
                 image_url = skin_info.get('icon')
-                async with self.bot.http_session.get(f"https://valorant-api.com/v1/weapons/skinlevels/{skin_level_uuid}") as r_level:
-                    if r_level.ok:
-                        level_data = (await r_level.json())['data']
-                        if level_data.get('displayIcon'):
-                            image_url = level_data['displayIcon']
+                with span("skin_level_lookup"):
+                    async with self.bot.http_session.get(f"{endpoints.VALORANT_API}/v1/weapons/skinlevels/{skin_level_uuid}") as r_level:
+                        if r_level.ok:
+                            level_data = (await r_level.json())['data']
+                            if level_data.get('displayIcon'):
+                                image_url = level_data['displayIcon']
                 
                 if not image_url: continue
 
                 temp_path = f"temp_images/{uuid.uuid4()}.png"
-                async with self.bot.http_session.get(image_url) as r_img:
-                    if r_img.ok:
-                        async with aiofiles.open(temp_path, mode='wb') as f:
-                            await f.write(await r_img.read())
-                        temp_image_paths.append(temp_path)
-                        
-                        skin_price = list(offer['Cost'].values())[0]
-                        
-                        offers_for_image.append({
-                            "name_ja": skin_info['name_ja'], "name_en": skin_info['name_en'],
-                            "image_path": temp_path, "rarity_name": skin_info.get('rarity_name', 'Select'),
-                            "price": skin_price
-                        })
+                with span("image_download"):
+                    async with self.bot.http_session.get(image_url) as r_img:
+                        image_bytes = await r_img.read() if r_img.ok else None
+                if image_bytes:
+                    async with aiofiles.open(temp_path, mode='wb') as f:
+                        await f.write(image_bytes)
+                    temp_image_paths.append(temp_path)
+                    offers_for_image.append({
+                        "name_ja": skin_info['name_ja'], "name_en": skin_info['name_en'],
+                        "image_path": temp_path, "rarity_name": skin_info.get('rarity_name', 'Select'),
+                        "price": skin_price
+                    })
             
             vp_icon_path = "assets/vp_icon.png"
-            final_image_path = await asyncio.to_thread(create_daily_store_image, offers_for_image, vp_icon_path)
-
-            if final_image_path:
-                # ephemeralな場合はfollowup.sendを使い、そうでない場合はchannel.sendを使う
-                if is_ephemeral:
-                    await send(
-                        content=f"{mention} のデイリーストア",
-                        file=discord.File(final_image_path),
-                        ephemeral=True
-                    )
-                    # 元の "取得中..." メッセージを削除
-                    if interaction:
-                        await interaction.delete_original_response()
-                else:
-                    await channel.send(
-                        content=f"{mention} のデイリーストア",
-                        file=discord.File(final_image_path)
-                    )
-            else:
-                await send("画像の生成に失敗しました。", ephemeral=is_ephemeral)
-
-        except Exception as e:
-            print(f"Store command failed during image processing: {e}")
-            await send("ストア情報の処理中にエラーが発生しました。", ephemeral=is_ephemeral)
-        
+            # Pillowの読み込みは起動時ではなく初回の画像生成時に行う
+            from image_generator import create_daily_store_image
+            async with jobs.render.slot():
+                with span("render", offers=len(offers_for_image)):
+                    return await asyncio.to_thread(create_daily_store_image, offers_for_image, vp_icon_path)
         finally:
-            # 非同期ファイル操作でイベントループのブロッキングを回避
-            for path in temp_image_paths:
-                try:
-                    await aiofiles.os.remove(path)
-                except FileNotFoundError:
-                    pass
-            if final_image_path:
-                try:
-                    await aiofiles.os.remove(final_image_path)
-                except FileNotFoundError:
-                    pass
+            await self._remove_files(temp_image_paths)
 
-    async def _get_storefront_with_reauth(self, account_id: int):
-        """指定されたアカウントIDでストア情報を取得し、必要であれば再認証を行う"""
-        async with async_session() as session:
-            account = await session.get(RiotAccount, account_id)
-            if not account:
-                raise ValueError("指定されたアカウントが見つかりません。")
+    async def _remove_files(self, paths: list[str]):
+        # 非同期ファイル操作でイベントループのブロッキングを回避
+        for path in paths:
+            try:
+                await aiofiles.os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    async def _get_storefront_with_reauth(self, account: AccountContext):
+        """
+        指定されたアカウントでストア情報を取得し、必要であれば再認証を行う。
+        取得したオファーはウィッシュリストとの照合にも使う。
+        """
+        store_data = await self._fetch_storefront_with_reauth(account)
+        try:
+            await self._check_wishlist(account.account, store_data)
+        except Exception:
+            log.exception("Wishlist check failed", extra={"account_id": account.id})
+        return store_data
 
+    async def _fetch_storefront_with_reauth(self, account: AccountContext):
         try:
-            return await self._get_storefront(account)
+            return await self._get_storefront(account.account)
         except Exception as e:
-            print(f"Initial store fetch failed for account {account.id}: {e}. Re-authenticating...")
+            log.info("Initial store fetch failed (%s). Re-authenticating...", e, extra={"account_id": account.id})
             try:
-                decrypted_cookies = self.fernet.decrypt(account.encrypted_cookies.encode()).decode()
+                decrypted_cookies = self.fernet.decrypt(account.account.encrypted_cookies.encode()).decode()
                 api = RiotAPI(self.bot.http_session)
                 new_access_token, new_entitlement_token = await api.get_tokens_from_cookies(decrypted_cookies)
-                
-                async with async_session() as session:
-                    async with session.begin():
-                        # セッション内で再度アカウントオブジェクトを取得して更新する
-                        account_to_update = await session.get(RiotAccount, account_id)
-                        if account_to_update:
-                            account_to_update.auth_token = new_access_token
-                            account_to_update.entitlement_token = new_entitlement_token
-                            session.add(account_to_update)
-                            # 更新後のアカウント情報を次の処理で使えるようにする
-                            account = account_to_update
-
-                print(f"Re-authentication successful for account {account.id}. Retrying store fetch...")
-                return await self._get_storefront(account)
+
+                # 新しいトークンはコンテキストに保持し、コマンド終了時にまとめて書き戻す
+                account.update_tokens(new_access_token, new_entitlement_token)
+                REAUTH_TOTAL.inc(result="success")
+
+                log.info("Re-authentication successful. Retrying store fetch...", extra={"account_id": account.id})
+                return await self._get_storefront(account.account)
             except Exception as reauth_error:
-                print(f"Re-authentication failed for account {account.id}: {reauth_error}")
+                REAUTH_TOTAL.inc(result="failure")
+                log.warning("Re-authentication failed: %s", reauth_error, extra={"account_id": account.id})
                 raise Exception("アカウント情報の更新に失敗しました。") from reauth_error
 
+    @traced("riot.storefront")
     async def _get_storefront(self, account: RiotAccount):
         """ユーザーのトークンを使ってストアフロントAPIを叩くヘルパー関数"""
         if not self.client_version:
@@ -729,17 +1255,17 @@ class ValorantCommands(commands.Cog):
             'X-Riot-ClientPlatform': CLIENT_PLATFORM
         }
         
-        url = f"https://pd.{account.shard}.a.pvp.net/store/v3/storefront/{account.puuid}"
+        url = f"{endpoints.pd_base(account.shard)}/store/v3/storefront/{account.puuid}"
         
         async with self.bot.http_session.post(url, headers=headers, json={}) as r:
             if r.status == 400:
                 error_body = await r.json()
                 if error_body.get("errorCode") == "BAD_CLAIMS":
                      raise Exception("Riot API returned BAD_CLAIMS. Re-authentication required.")
-                print(f"Riot API returned 400 Bad Request with body: {error_body}")
+                log.warning("Riot API returned 400 Bad Request with body: %s", error_body, extra={"account_id": account.id})
             
             r.raise_for_status()
             return await r.json()
 
-async def setup(bot: commands.Bot, your_domain: str, fernet: Fernet):
-    await bot.add_cog(ValorantCommands(bot, your_domain, fernet))
\ No newline at end of file
+async def setup(bot: commands.Bot, your_domain: str, fernet: Fernet, leases: LeaseManager | None = None):
+    await bot.add_cog(ValorantCommands(bot, your_domain, fernet, leases))
\ No newline at end of file
@@ -1,247 +1,318 @@
 # cogs/webhook_listener.py (新規作成)
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import json
 import hmac
 import hashlib
 import base64
+import binascii
 import datetime
+import logging
 import time
 from cryptography.fernet import Fernet
-from sqlalchemy.future import select
-from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete
-
-from database.database import async_session
-from database.models import State, RiotAccount
+from database.account_cache import account_cache
+from database.wishlist import wishlist
+from database.upserts import upsert_riot_account
+from database.state_store import state_store
 from api.riot_api import RiotAPI
+from core.link_queue import LinkQueue, LinkQueueFull, retry_transient
+from core.metrics import LINK_QUEUE_DEPTH
+
+log = logging.getLogger(__name__)
+
+# 連携ペイロードとして受け付ける最大サイズ (bytes)
+MAX_PAYLOAD_BYTES = 64 * 1024
+# 署名を格納するEmbedフィールド名と、旧方式の分割ペイロードのフィールド名の接頭辞
+SIGNATURE_FIELD = "hmac_signature"
+LEGACY_PART_PREFIX = "data_part_"
+# HTTPで直接受け取る場合の署名ヘッダー（Embedの hmac_signature と同じBase64のHMAC-SHA256）
+SIGNATURE_HEADER = "X-Signature"
 
 class WebhookListenerCog(commands.Cog):
-    def __init__(self, bot: commands.Bot, fernet: Fernet, hmac_secret: str, channel_id: int):
+    def __init__(
+        self,
+        bot: commands.Bot,
+        fernet: Fernet,
+        hmac_secret: str,
+        channel_id: int,
+        webhook_ids: set[int] | None = None,
+        link_workers: int = 4,
+        link_queue_size: int = 100,
+        http_host: str = "0.0.0.0",
+        http_port: int | None = None,
+    ):
         self.bot = bot
         self.fernet = fernet
-        self.hmac_secret = hmac_secret
+        self.hmac_key = hmac_secret.encode()
         self.listen_channel_id = channel_id
-        print(f"Listening for webhooks in channel ID: {self.listen_channel_id}")
+        # 指定された場合、このWebhook以外からの投稿は無視する
+        self.allowed_webhook_ids = frozenset(webhook_ids or ())
+        # 連携処理（Riot認証・DB保存・DM）はキューを介してワーカーで実行する
+        self.link_queue = LinkQueue(self.process_link_payload, workers=link_workers, maxsize=link_queue_size)
+        LINK_QUEUE_DEPTH.set_function(lambda: len(self.link_queue))
+        # ポートが指定された場合は、Discordを経由せずHTTPでもペイロードを受け付ける
+        self.http_server = None
+        if http_port:
+            from core.http_server import EmbeddedHTTPServer
+            self.http_server = EmbeddedHTTPServer(http_host, http_port, client_max_size=MAX_PAYLOAD_BYTES)
+            self.http_server.add_route("POST", "/link", self.handle_link_request)
+        log.info("Listening for webhooks in channel ID: %s", self.listen_channel_id)
+        self.state_purge_task.start()
+
+    async def cog_load(self):
+        self.link_queue.start()
+        if self.http_server:
+            await self.http_server.start()
+
+    async def cog_unload(self):
+        self.state_purge_task.cancel()
+        if self.http_server:
+            await self.http_server.stop()
+        await self.link_queue.stop()
+
+    @tasks.loop(minutes=5)
+    async def state_purge_task(self):
+        """放棄された連携リクエストの期限切れstateトークンを定期的に削除する"""
+        try:
+            purged = await state_store.purge_expired()
+            if purged:
+                log.info("Purged %d expired state tokens.", purged)
+        except Exception as e:
+            log.warning("Failed to purge expired state tokens: %s", e)
+
+    def _is_candidate(self, message: discord.Message) -> bool:
+        """
+        I/Oやログ出力の前に、連携ペイロードではないメッセージを安価に除外する。
+        真正性は後段のHMAC検証で担保するため、ここでは形だけを見る。
+        """
+        if message.webhook_id is None:
+            # Webhook以外の投稿は、連携用チャンネルのものだけを対象にする
+            if message.channel.id != self.listen_channel_id:
+                return False
+        elif self.allowed_webhook_ids and message.webhook_id not in self.allowed_webhook_ids:
+            return False
+        if not message.embeds:
+            return False
+        # 署名フィールドを持つEmbedだけが連携ペイロード
+        return any(field.name == SIGNATURE_FIELD for field in message.embeds[0].fields)
+
+    async def _extract_signed_payload(self, message: discord.Message) -> tuple[bytes, str] | None:
+        """メッセージから (ペイロードの生バイト列, 署名) を取り出す"""
+        signature = None
+        legacy_parts = []
+        for field in message.embeds[0].fields:
+            if field.name == SIGNATURE_FIELD:
+                signature = (field.value or "").strip('`')
+            elif field.name.startswith(LEGACY_PART_PREFIX):
+                legacy_parts.append((field.value or "").strip('`'))
+
+        payload = None
+        # 1) 添付ファイル（payload.json）を最優先で取得
+        for att in message.attachments:
+            name = (att.filename or "").lower()
+            ctype = (att.content_type or "").lower()
+            if name.endswith(".json") or "application/json" in ctype:
+                if att.size > MAX_PAYLOAD_BYTES:
+                    log.warning("Payload attachment too large: %d bytes", att.size, extra={"message_id": message.id})
+                    return None
+                payload = await att.read()
+                break
+
+        # 2) 互換: 旧方式（data_part_* フィールド分割）から復元
+        if payload is None and legacy_parts:
+            payload = "".join(legacy_parts).encode()
+
+        if not payload or not signature or len(payload) > MAX_PAYLOAD_BYTES:
+            log.debug("Missing payload or signature. payload_present=%s, sig_present=%s", bool(payload), bool(signature))
+            return None
+        return payload, signature
+
+    def verify_signature(self, payload: bytes, signature: str) -> bool:
+        """ペイロードの生バイト列に対してHMAC-SHA256署名（Base64）を検証する"""
+        try:
+            provided = base64.b64decode(signature, validate=True)
+        except (binascii.Error, ValueError):
+            return False
+        expected = hmac.digest(self.hmac_key, payload, hashlib.sha256)
+        return hmac.compare_digest(expected, provided)
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
-        # --- ここからデバッグコード ---
-        print("-" * 40)
-        print(f"[DEBUG] on_message fired in channel: {message.channel.id} (Author: {message.author})")
-
-        # 1. チャンネルIDが一致するかチェック
-        channel_id_match = message.channel.id == self.listen_channel_id
-        print(f"[DEBUG] Configured Channel ID: {self.listen_channel_id}")
-        print(f"[DEBUG] Condition check: Channel ID match? -> {channel_id_match}")
-        # 2. Webhookからの投稿かチェック
-        is_webhook = message.webhook_id is not None
-        print(f"[DEBUG] Condition check: Is it a webhook? -> {is_webhook}")
-        # --- ここまでデバッグコード ---
-        # 元のif文
-        # チャンネルIDは参考情報として扱い、HMAC検証で真正性を担保する
-        # Webhookでなくても、HMACが正しいものは処理する（真正性はHMACで担保）
-        if not is_webhook:
-            print("[DEBUG] Not a webhook sender. Proceeding only if HMAC is valid.")
-
-        if not channel_id_match:
-            print("[DEBUG] Channel ID mismatch. Will attempt HMAC verification fallback.")
-        else:
-            print("[DEBUG] Channel ID match. Proceeding with processing.")
-
-        print("[DEBUG] Starting to process incoming message...")
+        # 無関係なメッセージはここで即座に捨てる（ログも出さない）
+        if not self._is_candidate(message):
+            return
 
         try:
-            # --- 受信データ取得ロジックを強化（添付ファイル優先 + 旧Embed方式も互換） ---
-            payload_str = None
-            hmac_signature = None
-
-            # 1) 添付ファイル（payload.json）を最優先で取得
-            if message.attachments:
-                print(f"[DEBUG] Found {len(message.attachments)} attachments")
-                for att in message.attachments:
-                    name = (att.filename or "").lower()
-                    ctype = (att.content_type or "").lower()
-                    print(f"[DEBUG] Checking attachment: {name}, content_type: {ctype}")
-                    if name.endswith(".json") or "application/json" in ctype:
-                        content_bytes = await att.read()
-                        payload_str = content_bytes.decode("utf-8", errors="replace")
-                        print(f"[DEBUG] Loaded payload from attachment: {len(payload_str)} chars")
-                        break
-
-            # 2) 署名はEmbedの hmac_signature から取得（ファイル方式/旧方式 共通）
-            if message.embeds:
-                print(f"[DEBUG] Found {len(message.embeds)} embeds")
-                try:
-                    emb = message.embeds[0]
-                    for field in emb.fields:
-                        if field.name == "hmac_signature":
-                            hmac_signature = (field.value or "").strip('`')
-                            print(f"[DEBUG] Found HMAC signature: {hmac_signature[:10]}...")
-                except Exception as e:
-                    print(f"[DEBUG] Error reading embed fields: {e}")
-
-            # 3) 互換: 旧方式（data_part_* フィールド分割）から復元
-            if payload_str is None and message.embeds:
-                try:
-                    emb = message.embeds[0]
-                    parts = []
-                    for field in emb.fields:
-                        if field.name.startswith("data_part_"):
-                            parts.append((field.value or "").strip('`'))
-                    if parts:
-                        payload_str = "".join(parts)
-                        print(f"[DEBUG] Loaded payload from old embed format: {len(payload_str)} chars")
-                except Exception as e:
-                    print(f"[DEBUG] Error reading old embed format: {e}")
-
-            if not payload_str or not hmac_signature:
-                print(f"[DEBUG] Missing payload or signature. payload_present={bool(payload_str)}, sig_present={bool(hmac_signature)}")
+            signed = await self._extract_signed_payload(message)
+            if signed is None:
                 return
+            payload, signature = signed
 
-            # --- 署名検証 ---
-            digest = hmac.new(self.hmac_secret.encode(), payload_str.encode(), hashlib.sha256).digest()
-            expected_signature = base64.b64encode(digest).decode()
-
-            if not hmac.compare_digest(expected_signature, hmac_signature):
-                print(f"[DEBUG] Invalid HMAC signature received in channel {message.channel.id}")
+            if not self.verify_signature(payload, signature):
+                log.warning("Invalid HMAC signature received", extra={"channel_id": message.channel.id})
                 return
 
-            print("[DEBUG] HMAC signature verified successfully")
-
-            # --- データ処理 ---
-            data = json.loads(payload_str)
-            state_token = data.get('state_token')
-            cookies_str = data.get('cookies_str')
-            access_token_from_payload = data.get('access_token')
-            flow = data.get('flow')
-            print(f"[DEBUG] Parsed payload data: state_token={state_token[:10] if state_token else None}..., has_cookies={bool(cookies_str)}, has_access_token={bool(access_token_from_payload)}, flow={flow}")
-
-            # (ここから下の処理は、元のwebhook_handler.pyとほぼ同じ)
-            async with async_session() as session:
-                async with session.begin():
-                    result = await session.execute(select(State).where(State.state_token == state_token))
-                    state_obj = result.scalar_one_or_none()
-
-                    if not state_obj or state_obj.expiry < datetime.datetime.now(datetime.timezone.utc):
-                        print(f"[DEBUG] State token invalid or expired: exists={bool(state_obj)}, expired={state_obj.expiry < datetime.datetime.now(datetime.timezone.utc) if state_obj else 'N/A'}")
-                        if state_obj: await session.execute(sqlalchemy_delete(State).where(State.state_token == state_token))
-                        return
-
-                    user_id = state_obj.user_id
-                    print(f"[DEBUG] Found valid state for user {user_id}")
-                    await session.execute(sqlalchemy_delete(State).where(State.state_token == state_token))
-
-                try:
-                    api = RiotAPI(self.bot.http_session)
-                    print("[DEBUG] Starting Riot API authentication...")
-
-                    if cookies_str:
-                        # 従来フロー: Cookieからトークンを取得
-                        print("[DEBUG] Using cookies flow")
-                        access_token, entitlement_token = await api.get_tokens_from_cookies(cookies_str)
-                    elif access_token_from_payload:
-                        # 新規ログイン直後のフロー: access_tokenを優先利用
-                        print("[DEBUG] Using access_token flow")
-                        access_token = access_token_from_payload
-                        entitlement_token = await api.get_entitlements_from_access_token(access_token)
-                    else:
-                        print("[DEBUG] Neither cookies nor access token present in payload.")
-                        return
-
-                    print("[DEBUG] Got tokens, fetching user info...")
-                    puuid, riot_id = await api.get_user_info(access_token)
-                    print(f"[DEBUG] Got user info: puuid={puuid[:10]}..., riot_id={riot_id}")
-                except Exception as e:
-                    print(f"[DEBUG] Riot API authentication failed for user {user_id}: {e}")
-                    try:
-                        user = await self.bot.fetch_user(user_id)
-                        await user.send("Valorantアカウントの認証に失敗しました。時間をおいて`/link`からやり直してください。")
-                    except discord.Forbidden:
-                        print(f"[DEBUG] Failed to send failure DM to user {user_id} (DM blocked).")
-                    except Exception as dm_error:
-                        print(f"[DEBUG] An unexpected error occurred while sending failure DM to user {user_id}: {dm_error}")
-                    return
-
-                if cookies_str:
-                    encrypted_cookies = self.fernet.encrypt(cookies_str.encode()).decode()
-                else:
-                    # Cookieが未取得の場合でもDB制約を満たすためのプレースホルダを保存（将来再連携を促す）
-                    placeholder = f"ACCESS_TOKEN_ONLY::{user_id}::{int(time.time())}"
-                    encrypted_cookies = self.fernet.encrypt(placeholder.encode()).decode()
-
-                async with session.begin():
-                    # 同じPUUIDを持つアカウントが既に連携されているか確認
-                    result = await session.execute(
-                        select(RiotAccount).where(
-                            RiotAccount.discord_user_id == user_id,
-                            RiotAccount.puuid == puuid
-                        )
-                    )
-                    existing_account = result.scalar_one_or_none()
-                    print(f"[DEBUG] Existing account check: {bool(existing_account)}")
-
-                    if existing_account:
-                        # 存在する場合、情報を更新
-                        stmt = (
-                            sqlalchemy_update(RiotAccount)
-                            .where(RiotAccount.id == existing_account.id)
-                            .values(
-                                encrypted_cookies=encrypted_cookies,
-                                auth_token=access_token,
-                                entitlement_token=entitlement_token,
-                                riot_id=riot_id # Riot IDも更新
-                            )
-                        )
-                        await session.execute(stmt)
-                        account_name = existing_account.account_name
-                        print(f"[DEBUG] Updated existing account: {account_name}")
-                    else:
-                        # 存在しない場合、新規作成
-                        # account_nameの重複をチェック
-                        result = await session.execute(
-                            select(RiotAccount).where(
-                                RiotAccount.discord_user_id == user_id,
-                                RiotAccount.account_name == riot_id
-                            )
-                        )
-                        if result.scalar_one_or_none():
-                            # もしRiot IDが既に別名として使われていたら、末尾にランダムな数字を追加
-                            account_name = f"{riot_id}_{int(time.time()) % 1000}"
-                        else:
-                            account_name = riot_id
-
-                        new_account = RiotAccount(
-                            discord_user_id=user_id,
-                            account_name=account_name,
-                            riot_id=riot_id,
-                            encrypted_cookies=encrypted_cookies,
-                            auth_token=access_token,
-                            entitlement_token=entitlement_token,
-                            puuid=puuid
-                        )
-                        session.add(new_account)
-                        print(f"[DEBUG] Created new account: {account_name}")
+            data = json.loads(payload)
+            try:
+                self.submit_link_payload(data)
+            except LinkQueueFull:
+                # Webhook経由では送信側に再送を頼めないため、ユーザーにやり直しを案内する
+                await self._notify_link_busy(data)
+        except Exception:
+            log.exception("An error occurred in on_message webhook processing")
 
+    async def _notify_link_busy(self, data: dict):
+        """キューが満杯で受け付けられなかった連携について、stateトークンを無効にしてユーザーにDMで知らせる"""
+        user_id = await state_store.consume(data.get('state_token'))
+        if user_id is None:
+            return
+        try:
+            user = await self.bot.fetch_user(user_id)
+            await user.send("現在アカウント連携が混み合っているため、連携を完了できませんでした。少し時間をおいて`/account link`からやり直してください。")
+        except discord.Forbidden:
+            log.info("Failed to send busy DM (DM blocked).", extra={"user_id": user_id})
+        except Exception as dm_error:
+            log.warning("An unexpected error occurred while sending busy DM: %s", dm_error, extra={"user_id": user_id})
+
+    async def handle_link_request(self, request):
+        """POST /link: 本文はペイロードのJSON、X-Signatureヘッダーにその署名"""
+        # aiohttp.web はHTTP受信を有効にした場合だけ読み込む
+        from aiohttp import web
+        signature = request.headers.get(SIGNATURE_HEADER)
+        if not signature:
+            return web.json_response({"error": "missing signature"}, status=401)
+        # 上限を超える本文はaiohttpが413で拒否する
+        payload = await request.read()
+        if not self.verify_signature(payload, signature):
+            log.warning("Invalid HMAC signature received", extra={"remote": request.remote})
+            return web.json_response({"error": "invalid signature"}, status=401)
+
+        try:
+            accepted = self.submit_link_payload(json.loads(payload))
+        except LinkQueueFull:
+            return web.json_response({"error": "busy"}, status=503, headers={"Retry-After": "5"})
+        except ValueError:
+            return web.json_response({"error": "invalid payload"}, status=400)
+        return web.json_response({"status": "accepted" if accepted else "duplicate"}, status=202)
+
+    def submit_link_payload(self, data: dict) -> bool:
+        """
+        署名検証済みのペイロードを連携キューに積む。重複している場合はFalseを返す。
+        キューが満杯の場合は LinkQueueFull を送出する（ユーザーは /link からやり直せる）。
+        """
+        if not isinstance(data, dict):
+            raise ValueError("link payload must be a JSON object")
+        try:
+            accepted = self.link_queue.submit(data)
+        except LinkQueueFull:
+            log.warning("Link queue is full (%d waiting). Dropping payload.", len(self.link_queue))
+            raise
+        if not accepted:
+            log.debug("Duplicate link payload for a state token already in progress. Ignoring.")
+        return accepted
+
+    async def process_link_payload(self, data: dict):
+        """署名検証済みの連携ペイロードを処理する（State検証 → Riot認証 → 保存 → DM通知）"""
+        state_token = data.get('state_token')
+        cookies_str = data.get('cookies_str')
+        access_token_from_payload = data.get('access_token')
+        flow = data.get('flow')
+        log.debug(
+            "Parsed payload data: state_token=%s..., has_cookies=%s, has_access_token=%s, flow=%s",
+            state_token[:10] if isinstance(state_token, str) else None, bool(cookies_str), bool(access_token_from_payload), flow,
+        )
+
+        # stateトークンの検証と削除を1回の操作で行う
+        user_id = await state_store.consume(state_token)
+        if user_id is None:
+            log.info("State token invalid or expired.")
+            return
+        log.debug("Found valid state", extra={"user_id": user_id})
+
+        # (ここから下の処理は、元のwebhook_handler.pyとほぼ同じ)
+        try:
+            api = RiotAPI(self.bot.http_session)
+            start = time.perf_counter()
+
+            if cookies_str:
+                # 従来フロー: Cookieからトークンを取得
+                access_token, entitlement_token = await retry_transient(lambda: api.get_tokens_from_cookies(cookies_str))
+            elif access_token_from_payload:
+                # 新規ログイン直後のフロー: access_tokenを優先利用
+                access_token = access_token_from_payload
+                entitlement_token = await retry_transient(lambda: api.get_entitlements_from_access_token(access_token))
+            else:
+                log.warning("Neither cookies nor access token present in payload.", extra={"user_id": user_id})
+                return
+
+            puuid, riot_id = await retry_transient(lambda: api.get_user_info(access_token))
+            log.debug(
+                "Riot authentication completed (puuid=%s...)", puuid[:10],
+                extra={"user_id": user_id, "flow": "cookies" if cookies_str else "access_token", "duration_ms": round((time.perf_counter() - start) * 1000, 1)},
+            )
+        except Exception as e:
+            log.warning("Riot API authentication failed: %s", e, extra={"user_id": user_id})
             try:
                 user = await self.bot.fetch_user(user_id)
-                embed = discord.Embed(
-                    title="✅ アカウント連携 成功",
-                    description=f"Valorantアカウント **{riot_id}** の連携が正常に完了しました！\n`/store`コマンドでデイリーストアを確認できます。",
-                    color=discord.Color.green(),
-                    timestamp=datetime.datetime.now(datetime.timezone.utc)
-                )
-                await user.send(embed=embed)
-                print(f"[DEBUG] Successfully sent success DM to user {user_id} with Riot ID {riot_id}")
+                await user.send("Valorantアカウントの認証に失敗しました。時間をおいて`/link`からやり直してください。")
             except discord.Forbidden:
-                print(f"[DEBUG] Failed to send success DM to user {user_id} (DM blocked).")
+                log.info("Failed to send failure DM (DM blocked).", extra={"user_id": user_id})
             except Exception as dm_error:
-                print(f"[DEBUG] An unexpected error occurred while sending success DM to user {user_id}: {dm_error}")
+                log.warning("An unexpected error occurred while sending failure DM: %s", dm_error, extra={"user_id": user_id})
+            return
 
+        if cookies_str:
+            encrypted_cookies = self.fernet.encrypt(cookies_str.encode()).decode()
+        else:
+            # Cookieが未取得の場合でもDB制約を満たすためのプレースホルダを保存（将来再連携を促す）
+            placeholder = f"ACCESS_TOKEN_ONLY::{user_id}::{int(time.time())}"
+            encrypted_cookies = self.fernet.encrypt(placeholder.encode()).decode()
+
+        # PUUIDをキーに1文で作成または更新する
+        account_name = await upsert_riot_account(
+            discord_user_id=user_id,
+            puuid=puuid,
+            riot_id=riot_id,
+            encrypted_cookies=encrypted_cookies,
+            auth_token=access_token,
+            entitlement_token=entitlement_token,
+        )
+        if account_name is None:
+            log.warning("PUUID %s... is already linked to another Discord user. Skipping link.", puuid[:10], extra={"user_id": user_id})
+            return
+        log.info("Account linked", extra={"user_id": user_id, "account_name": account_name})
+
+        # 連携アカウント一覧が変わったのでキャッシュを無効化
+        account_cache.invalidate(user_id)
+        await wishlist.reload_accounts(user_id)
+
+        try:
+            user = await self.bot.fetch_user(user_id)
+            embed = discord.Embed(
+                title="✅ アカウント連携 成功",
+                description=f"Valorantアカウント **{riot_id}** の連携が正常に完了しました！\n`/store`コマンドでデイリーストアを確認できます。",
+                color=discord.Color.green(),
+                timestamp=datetime.datetime.now(datetime.timezone.utc)
+            )
+            await user.send(embed=embed)
+            log.debug("Sent success DM", extra={"user_id": user_id})
+        except discord.Forbidden:
+            log.info("Failed to send success DM (DM blocked).", extra={"user_id": user_id})
+        except Exception as dm_error:
+            log.warning("An unexpected error occurred while sending success DM: %s", dm_error, extra={"user_id": user_id})
 
-        except Exception as e:
-            print(f"[DEBUG] An error occurred in on_message webhook processing: {e}")
-            import traceback
-            traceback.print_exc()
 
-async def setup(bot: commands.Bot, fernet: Fernet, hmac_secret: str, channel_id: int):
-    await bot.add_cog(WebhookListenerCog(bot, fernet, hmac_secret, channel_id))
\ No newline at end of file
+async def setup(
+    bot: commands.Bot,
+    fernet: Fernet,
+    hmac_secret: str,
+    channel_id: int,
+    webhook_ids: set[int] | None = None,
+    link_workers: int = 4,
+    link_queue_size: int = 100,
+    http_host: str = "0.0.0.0",
+    http_port: int | None = None,
+):
+    await bot.add_cog(WebhookListenerCog(
+        bot, fernet, hmac_secret, channel_id, webhook_ids, link_workers, link_queue_size, http_host, http_port
+    ))
@@ -0,0 +1,141 @@
+# core/admission.py
+"""
+コマンド処理の受け付け制御。
+同時に処理するコマンドの数を制限し、あふれた分は期限付きで順番待ちさせる。
+インタラクションは作成から15分で応答できなくなるため、待ち時間の期限はそれに合わせて決め、
+期限までに終わらない見込みのリクエストは待たせずにすぐ断る（Overloaded）。
+"""
+import asyncio
+import collections
+import time
+from contextlib import asynccontextmanager
+
+import discord
+
+from core.metrics import ADMISSION_TOTAL, ADMISSION_QUEUE_DEPTH
+
+# インタラクションに応答できる期間 (秒)
+INTERACTION_LIFETIME = 15 * 60
+# 期限から差し引く、応答の送信などに必要な余裕 (秒)
+DEADLINE_MARGIN = 30.0
+# 処理時間の見積もりの初期値 (秒) と、移動平均の重み
+INITIAL_SERVICE_TIME = 3.0
+SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """混雑のためリクエストを受け付けられない"""
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def interaction_deadline(interaction: discord.Interaction) -> float:
+    """インタラクションに応答できなくなる時刻（time.monotonic() 基準）"""
+    age = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    return time.monotonic() + INTERACTION_LIFETIME - max(0.0, age)
+
+
+class AdmissionController:
+    """
+    同時実行数 max_active、待ち行列の長さ max_queue の受け付け窓口。
+    待ち時間は max_wait 秒と、呼び出し側が指定した期限のうち早い方まで。
+    """
+    def __init__(self, name: str, max_active: int = 8, max_queue: int = 50, max_wait: float = 120.0):
+        self.name = name
+        self.max_active = max(1, max_active)
+        self.max_queue = max(0, max_queue)
+        self.max_wait = max_wait
+        self.active = 0
+        # 直近の処理時間の移動平均 (秒)
+        self.service_time = INITIAL_SERVICE_TIME
+        self._waiters: collections.deque[asyncio.Future] = collections.deque()
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: self.waiting, pool=name)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for future in self._waiters if not future.done())
+
+    def estimated_wait(self) -> float:
+        """今から並んだ場合に処理を始められるまでの見積もり (秒)"""
+        if self.active < self.max_active and not self.waiting:
+            return 0.0
+        return (self.waiting // self.max_active + 1) * self.service_time
+
+    @asynccontextmanager
+    async def admit(self, deadline: float | None = None):
+        """
+        処理枠を確保して with ブロックを実行する。deadline は time.monotonic() 基準の応答期限。
+        期限までに処理を終えられない見込みの場合は Overloaded を送出する。
+        """
+        await self._acquire(deadline)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            self.service_time += SERVICE_TIME_WEIGHT * (elapsed - self.service_time)
+            self._release()
+
+    async def _acquire(self, deadline: float | None):
+        now = time.monotonic()
+        # 処理を始めるのに間に合う最終時刻
+        latest_start = now + self.max_wait
+        if deadline is not None:
+            latest_start = min(latest_start, deadline - DEADLINE_MARGIN - self.service_time)
+
+        if self.active < self.max_active and not self.waiting:
+            if latest_start < now:
+                self._reject("deadline")
+            self.active += 1
+            ADMISSION_TOTAL.inc(pool=self.name, result="admitted")
+            return
+        if self.waiting >= self.max_queue:
+            self._reject("queue_full")
+        if now + self.estimated_wait() > latest_start:
+            self._reject("deadline")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await asyncio.wait_for(future, timeout=latest_start - now)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self._release()
+            self._reject("timeout")
+        except asyncio.CancelledError:
+            # 枠を受け取った直後に取り消された場合は次のリクエストに回す
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        ADMISSION_TOTAL.inc(pool=self.name, result="admitted")
+
+    def _reject(self, reason: str):
+        ADMISSION_TOTAL.inc(pool=self.name, result=reason)
+        raise Overloaded(reason)
+
+    def _release(self):
+        # 待っているリクエストがあれば、枠を解放せずにそのまま引き渡す
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def configure(self, max_active: int | None = None, max_queue: int | None = None, max_wait: float | None = None):
+        """起動時に上限を設定する"""
+        if max_active:
+            self.max_active = max(1, max_active)
+        if max_queue is not None:
+            self.max_queue = max(0, max_queue)
+        if max_wait:
+            self.max_wait = max_wait
+
+
+# /store コマンドなど、Riot APIへの問い合わせと画像生成を伴うコマンド
+command_admission = AdmissionController("commands")
+
+
+def configure_admission(max_active: int | None = None, max_queue: int | None = None, max_wait: float | None = None):
+    command_admission.configure(max_active, max_queue, max_wait)
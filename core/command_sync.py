@@ -0,0 +1,59 @@
+# core/command_sync.py
+import hashlib
+import json
+import logging
+import os
+from discord import app_commands
+
+log = logging.getLogger(__name__)
+
+# 前回同期したコマンドツリーのハッシュを保存するファイル
+FINGERPRINT_FILE = ".command_tree.sha256"
+
+
+def tree_fingerprint(tree: app_commands.CommandTree, application_id: int | None) -> str:
+    """Discordへ送るのと同じ形式のコマンド定義から、ツリー全体のハッシュを作る"""
+    payload = {
+        "application_id": application_id,
+        "commands": sorted(
+            (command.to_dict(tree) for command in tree.get_commands()),
+            key=lambda command: (command.get("type", 1), command["name"]),
+        ),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _read_fingerprint(path: str) -> str | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+async def sync_command_tree(
+    tree: app_commands.CommandTree,
+    application_id: int | None,
+    mode: str = "auto",
+    path: str = FINGERPRINT_FILE,
+) -> bool:
+    """
+    コマンドツリーを同期し、同期した場合はTrueを返す。
+    mode: auto = 前回の同期から変わった場合のみ / always = 毎回 / never = 同期しない
+    """
+    if mode == "never":
+        return False
+    fingerprint = tree_fingerprint(tree, application_id)
+    if mode != "always" and _read_fingerprint(path) == fingerprint:
+        log.info("Command tree unchanged (%s), skipping sync.", fingerprint[:12])
+        return False
+
+    await tree.sync()
+    # 同期に成功した場合だけ保存する（失敗時は次回の起動で再試行される）
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(fingerprint + "\n")
+    os.replace(tmp_path, path)
+    log.info("Command tree synced (%s).", fingerprint[:12])
+    return True
@@ -0,0 +1,136 @@
+# core/diagnostics.py
+"""
+実行中のBotを止めずに調べるための診断機能（プロファイル・メモリ・タスク一覧）。
+結果はテキストで返し、管理者コマンドから添付ファイルとして送る。
+"""
+import asyncio
+import cProfile
+import io
+import linecache
+import marshal
+import pstats
+import time
+import tracemalloc
+import weakref
+
+# タスクの作成時刻（task factory で記録する）
+_task_created: "weakref.WeakKeyDictionary[asyncio.Task, float]" = weakref.WeakKeyDictionary()
+
+
+def install_task_tracker(loop: asyncio.AbstractEventLoop):
+    """以降に作られるタスクの作成時刻を記録するtask factoryを設定する"""
+    previous = loop.get_task_factory()
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        _task_created[task] = time.monotonic()
+        return task
+
+    loop.set_task_factory(factory)
+
+
+def _task_label(task: asyncio.Task) -> str:
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or type(coro).__name__
+
+
+def task_report(limit: int = 20) -> str:
+    """実行中のasyncioタスクの種類ごとの件数と、長く動いているタスクの一覧"""
+    now = time.monotonic()
+    tasks = [task for task in asyncio.all_tasks() if not task.done()]
+    counts: dict[str, int] = {}
+    for task in tasks:
+        label = _task_label(task)
+        counts[label] = counts.get(label, 0) + 1
+
+    lines = [f"tasks: {len(tasks)}", "", "== count by coroutine =="]
+    for label, count in sorted(counts.items(), key=lambda item: -item[1]):
+        lines.append(f"{count:>6}  {label}")
+
+    aged = sorted(
+        ((now - _task_created[task], task) for task in tasks if task in _task_created),
+        key=lambda item: -item[0],
+    )
+    lines += ["", f"== longest running (top {limit}, tasks created after startup) =="]
+    for age, task in aged[:limit]:
+        lines.append(f"{age:>10.1f}s  {task.get_name()}  {_task_label(task)}")
+        for frame in task.get_stack(limit=3):
+            lines.append(f"              at {frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}")
+    return "\n".join(lines) + "\n"
+
+
+class Profiler:
+    """イベントループのスレッドで一定時間だけcProfileを有効にする（同時に1つまで）"""
+    def __init__(self):
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def run(self, seconds: float, sort: str = "cumulative", limit: int = 60) -> tuple[str, bytes]:
+        """(統計のテキスト, pstats形式の生データ) を返す"""
+        async with self._lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+        out = io.StringIO()
+        stats = pstats.Stats(profile, stream=out)
+        raw = marshal.dumps(stats.stats)  # pstats.Stats.dump_stats と同じ形式
+        stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue(), raw
+
+
+class MemoryTracker:
+    """tracemallocのスナップショットを取り、基準との差分を出す"""
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self.baseline: tracemalloc.Snapshot | None = None
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.baseline = None
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+
+    def _take(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, linecache.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+    def snapshot(self, limit: int = 30) -> str:
+        """現在のスナップショットを基準として保存し、確保量の多い箇所を返す"""
+        snapshot = self._take()
+        self.baseline = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced: current={current / 1024 ** 2:.1f}MiB peak={peak / 1024 ** 2:.1f}MiB", ""]
+        for stat in snapshot.statistics("lineno")[:limit]:
+            lines.append(str(stat))
+        return "\n".join(lines) + "\n"
+
+    def diff(self, limit: int = 30) -> str:
+        """基準のスナップショットから増えた箇所を、呼び出し元のスタック付きで返す"""
+        if self.baseline is None:
+            raise RuntimeError("baseline snapshot has not been taken")
+        snapshot = self._take()
+        lines = []
+        for stat in snapshot.compare_to(self.baseline, "traceback")[:limit]:
+            lines.append(f"{stat.size_diff / 1024:+.1f}KiB ({stat.count_diff:+d} blocks), now {stat.size / 1024:.1f}KiB")
+            lines.extend(f"    {line}" for line in stat.traceback.format(limit=self.frames))
+        self.baseline = snapshot
+        return "\n".join(lines) + "\n"
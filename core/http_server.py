@@ -0,0 +1,39 @@
+# core/http_server.py
+import logging
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+
+class EmbeddedHTTPServer:
+    """
+    Botと同じイベントループ上で動く小さなaiohttpサーバー。
+    ルートは start() の前に add_route() で登録する。
+    """
+    def __init__(self, host: str, port: int, client_max_size: int = 1024 ** 2):
+        self.host = host
+        self.port = port
+        self.app = web.Application(client_max_size=client_max_size)
+        self._runner: web.AppRunner | None = None
+
+    def add_route(self, method: str, path: str, handler):
+        self.app.router.add_route(method, path, handler)
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self):
+        if self._runner:
+            return
+        runner = web.AppRunner(self.app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self._runner = runner
+        log.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,140 @@
+# core/jobs.py
+"""
+優先度付きの実行枠。外部HTTPリクエストや画像生成のような共有資源の同時実行数を制限し、
+空きを待つジョブは優先度の高いもの（対話的なコマンド）から順に実行する。
+
+優先度はコンテキスト変数で引き継ぐため、処理の起点で priority() を一度設定すれば
+その内側（await / gather / to_thread の先も含む）の実行枠の取得すべてに反映される。
+低い優先度のジョブが待たされ続けないよう、待ち時間に応じて順位を繰り上げる（エージング）。
+"""
+import asyncio
+import contextvars
+import enum
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import aiohttp
+
+from core.metrics import JOB_WAIT_SECONDS, JOB_QUEUE_DEPTH
+
+
+class Priority(enum.IntEnum):
+    INTERACTIVE = 0  # ユーザーのコマンド
+    SCHEDULED = 1    # 自動投稿スケジュール
+    BACKGROUND = 2   # ウィッシュリスト照合などの先読み・バッチ処理
+
+
+# 優先度ごとの繰り下げ幅 (秒)。待ち時間がこれを超えたジョブは、後から来た上位のジョブより先に実行される
+AGING_SECONDS = {
+    Priority.INTERACTIVE: 0.0,
+    Priority.SCHEDULED: 10.0,
+    Priority.BACKGROUND: 60.0,
+}
+
+_current: contextvars.ContextVar[Priority] = contextvars.ContextVar("job_priority", default=Priority.INTERACTIVE)
+
+
+def current_priority() -> Priority:
+    return _current.get()
+
+
+@contextmanager
+def priority(value: Priority):
+    """with ブロックの内側で取得する実行枠の優先度を設定する"""
+    token = _current.set(value)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class JobPool:
+    """
+    同時実行数が capacity の実行枠。空きが無いときは
+    (待ち始めた時刻 + 優先度の繰り下げ幅) の小さい順に枠を割り当てる。
+    """
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = max(1, capacity)
+        self.active = 0
+        self._waiters: list[tuple[float, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        JOB_QUEUE_DEPTH.set_function(lambda: self.waiting, pool=name)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority | None = None):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, priority: Priority | None = None):
+        priority = current_priority() if priority is None else priority
+        start = time.monotonic()
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            JOB_WAIT_SECONDS.observe(0.0, pool=self.name, priority=priority.name.lower())
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (start + AGING_SECONDS[priority], next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 枠を受け取った直後に取り消された場合は次のジョブに回す
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        JOB_WAIT_SECONDS.observe(time.monotonic() - start, pool=self.name, priority=priority.name.lower())
+
+    def release(self):
+        # 待っているジョブがあれば、枠を解放せずにそのまま引き渡す
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def configure(self, capacity: int):
+        """起動時に同時実行数を設定する"""
+        self.capacity = max(1, capacity)
+
+
+# 外部HTTPリクエスト（Riot API / Valorant-API）。レスポンスヘッダーを受け取るまで枠を占有する
+http = JobPool("http", 16)
+# 画像生成（スレッドで実行するPillowの描画）
+render = JobPool("render", 2)
+
+
+def configure_jobs(http_concurrency: int | None = None, render_concurrency: int | None = None):
+    if http_concurrency:
+        http.configure(http_concurrency)
+    if render_concurrency:
+        render.configure(render_concurrency)
+
+
+def http_job_trace_config() -> aiohttp.TraceConfig:
+    """
+    ClientSession に渡して、すべての外部リクエストを http の実行枠で制限する。
+    メトリクスの計測に待ち時間が含まれないよう、trace_configs の先頭に置くこと。
+    """
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        await http.acquire()
+
+    async def on_request_done(session, context, params):
+        http.release()
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_done)
+    trace_config.on_request_exception.append(on_request_done)
+    return trace_config
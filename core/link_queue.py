@@ -0,0 +1,112 @@
+# core/link_queue.py
+import asyncio
+import logging
+import random
+import aiohttp
+
+log = logging.getLogger(__name__)
+
+# 一時的な失敗とみなすHTTPステータス
+TRANSIENT_STATUSES = frozenset({429, 500, 502, 503, 504})
+# 一時的な失敗の再試行回数と待ち時間 (秒)
+RETRY_ATTEMPTS = 4
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 15.0
+
+
+class LinkQueueFull(Exception):
+    """連携キューが満杯で受け付けられない"""
+
+
+def is_transient(error: Exception) -> bool:
+    """再試行すれば成功する可能性のあるエラーかどうか"""
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in TRANSIENT_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError))
+
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    # 429などでRetry-Afterが返された場合はそれに従う
+    headers = getattr(error, "headers", None)
+    if headers and headers.get("Retry-After"):
+        try:
+            return min(RETRY_MAX_DELAY, float(headers["Retry-After"]))
+        except ValueError:
+            pass
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)
+    return delay * random.uniform(0.5, 1.0)
+
+
+async def retry_transient(fn, attempts: int = RETRY_ATTEMPTS):
+    """fn() を実行し、一時的な失敗の場合は指数バックオフで再試行する"""
+    for attempt in range(attempts):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == attempts - 1 or not is_transient(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            log.info("Transient Riot API error (%r), retrying in %.1fs (%d/%d)", e, delay, attempt + 1, attempts - 1)
+            await asyncio.sleep(delay)
+
+
+class LinkQueue:
+    """
+    署名検証済みの連携ペイロードを上限付きのキューに積み、決まった数のワーカーで処理する。
+    同じstateトークンのペイロードが処理待ち・処理中の間は重複して受け付けない。
+    """
+    def __init__(self, handler, workers: int = 4, maxsize: int = 100):
+        self.handler = handler
+        self.worker_count = max(1, workers)
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=maxsize)
+        self._pending: set[str] = set()
+        self._workers: list[asyncio.Task] = []
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"link-worker-{n}")
+            for n in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, data: dict) -> bool:
+        """
+        ペイロードをキューに積む。同じstateトークンが処理待ちの場合はFalseを返す。
+        キューが満杯の場合は待たずに LinkQueueFull を送出する。
+        """
+        state_token = data.get("state_token")
+        if isinstance(state_token, str):
+            if state_token in self._pending:
+                return False
+        else:
+            state_token = None
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            raise LinkQueueFull(f"link queue is full ({self._queue.maxsize})") from None
+        if state_token:
+            self._pending.add(state_token)
+        return True
+
+    async def _worker(self):
+        while True:
+            data = await self._queue.get()
+            try:
+                await self.handler(data)
+            except Exception:
+                log.exception("Link payload processing failed")
+            finally:
+                state_token = data.get("state_token")
+                if isinstance(state_token, str):
+                    self._pending.discard(state_token)
+                self._queue.task_done()
@@ -0,0 +1,130 @@
+# core/log.py
+"""
+ログ出力の設定。
+各モジュールは logging.getLogger(__name__) で取得したロガーに書き込み、
+ユーザーIDなどの付加情報は extra={"user_id": ...} で渡す。
+イベントループ上ではキューに積むだけで、書き出しは別スレッドのリスナーが行う。
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+
+# LogRecordが標準で持つ属性（これ以外は extra で渡された付加情報として出力する）
+_STANDARD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+_listener: logging.handlers.QueueListener | None = None
+_base_level = logging.INFO
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {key: value for key, value in record.__dict__.items() if key not in _STANDARD_ATTRS and not key.startswith("_")}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """通常のログ行の末尾に extra の付加情報を key=value で付ける"""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1レコードのJSONで出力する（ログ収集基盤向け）"""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _LoopSafeQueueHandler(logging.handlers.QueueHandler):
+    """
+    メッセージの組み立てだけを行ってキューに積む。
+    例外のトレースバック整形や書き出しはリスナースレッドで行う。
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _parse_level(level: str | int) -> int | None:
+    """レベル名（大文字小文字は問わない）または数値をレベルに変換する。不明な場合は None"""
+    if isinstance(level, int):
+        return level
+    level = level.strip()
+    if level.isdigit():
+        return int(level)
+    value = logging.getLevelName(level.upper())
+    return value if isinstance(value, int) else None
+
+
+def setup_logging(level: str | int = "INFO", fmt: str = "text", stream=None) -> logging.handlers.QueueListener:
+    """ルートロガーをキュー経由の出力に切り替え、リスナースレッドを開始する"""
+    global _listener, _base_level
+    if _listener:
+        shutdown_logging()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == "json" else KeyValueFormatter())
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_LoopSafeQueueHandler(log_queue))
+
+    _base_level = _parse_level(level)
+    root.setLevel(logging.INFO if _base_level is None else _base_level)
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    if _base_level is None:
+        # 設定の誤りで起動できなくならないよう、INFOで続行する
+        logging.getLogger(__name__).warning("Unknown log level %r. Falling back to INFO.", level)
+        _base_level = logging.INFO
+    return _listener
+
+
+def shutdown_logging():
+    """キューに残っているログを書き出してリスナーを止める"""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def set_level(level: str | int, logger: str | None = None):
+    """実行中にログレベルを変更する（logger省略時はルート）"""
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logging.getLogger(logger).setLevel(level)
+
+
+def set_debug(enabled: bool):
+    """DEBUG出力を実行中に切り替える。無効化すると起動時のレベルに戻す"""
+    set_level(logging.DEBUG if enabled else _base_level)
+
+
+def debug_enabled() -> bool:
+    return logging.getLogger().isEnabledFor(logging.DEBUG)
+
+
+def toggle_debug() -> bool:
+    """DEBUG出力を反転させ、切り替え後の状態を返す（SIGUSR1から呼ばれる）"""
+    enabled = not debug_enabled()
+    set_debug(enabled)
+    logging.getLogger(__name__).warning("Debug logging %s", "enabled" if enabled else "disabled")
+    return enabled
@@ -0,0 +1,112 @@
+# core/loop_monitor.py
+"""
+イベントループの遅延監視。
+ループ上のプローブが一定間隔でスリープし、予定より遅れて再開した分を遅延として記録する。
+別スレッドのウォッチドッグはプローブの応答が途絶えた時点でループのスレッドのスタックを採取し、
+どの処理がループを塞いでいるかをログに出す。
+"""
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from core.metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+log = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.25, threshold: float = 0.25, window: int = 2400, summary_interval: float = 60.0):
+        self.interval = interval
+        # この秒数以上ループが応答しなければ停止とみなしてスタックを採取する
+        self.threshold = threshold
+        self.summary_interval = summary_interval
+        self._samples: collections.deque[float] = collections.deque(maxlen=window)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat = time.monotonic()
+        self._probe: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if self._probe:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._probe = asyncio.create_task(self._run_probe(), name="loop-monitor-probe")
+        self._watchdog = threading.Thread(target=self._run_watchdog, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._probe:
+            self._probe.cancel()
+            await asyncio.gather(self._probe, return_exceptions=True)
+            self._probe = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+
+    def percentiles(self) -> dict:
+        """直近のウィンドウでの遅延 (ms) のパーセンタイル"""
+        ordered = sorted(self._samples)
+        if not ordered:
+            return {"count": 0}
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+        return {"count": len(ordered), "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99), "max_ms": round(ordered[-1] * 1000, 2)}
+
+    async def _run_probe(self):
+        loop = asyncio.get_running_loop()
+        next_summary = loop.time() + self.summary_interval
+        while True:
+            start = loop.time()
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._heartbeat = time.monotonic()
+            self._samples.append(lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                log.warning("Event loop lagged by %.0fms", lag * 1000, extra={"lag_ms": round(lag * 1000, 1)})
+            if loop.time() >= next_summary:
+                next_summary = loop.time() + self.summary_interval
+                log.debug("Event loop lag", extra=self.percentiles())
+
+    def _run_watchdog(self):
+        stalled_since = None
+        while not self._stop.wait(self.threshold / 2):
+            silent = time.monotonic() - self._heartbeat
+            # プローブの再開予定時刻を過ぎても応答がない＝ループが何かに塞がれている
+            if silent < self.interval + self.threshold:
+                stalled_since = None
+                continue
+            if stalled_since == self._heartbeat:
+                continue  # 同じ停止は1回だけ採取する
+            stalled_since = self._heartbeat
+            LOOP_STALLS.inc()
+            self._log_stall(silent)
+
+    def _log_stall(self, silent: float):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=20)) if frame else "(no frame)"
+        task_name = None
+        try:
+            task = asyncio.current_task(self._loop)
+            if task:
+                coro = task.get_coro()
+                task_name = f"{task.get_name()} ({getattr(coro, '__qualname__', type(coro).__name__)})"
+        except RuntimeError:
+            pass
+        log.warning(
+            "Event loop blocked for %.0fms+ in task %s\n%s", (silent - self.interval) * 1000, task_name, stack,
+            extra={"blocked_ms": round((silent - self.interval) * 1000, 1)},
+        )
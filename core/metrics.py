@@ -0,0 +1,269 @@
+# core/metrics.py
+"""
+Prometheus形式のメトリクス。外部ライブラリは使わず、必要な種類だけを実装している。
+メトリクスはこのモジュールで定義し、各所から import して記録する。
+"""
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import aiohttp
+
+# 秒単位のヒストグラムの既定バケット
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """現在値を表すゲージ。set_function() で出力時に値を取得することもできる"""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._functions: dict[tuple, callable] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        self._functions[self._key(labels)] = fn
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, fn in self._functions.items():
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    """累積バケットのヒストグラム"""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # ラベルごとに [各バケットの件数..., 合計, 件数]
+        self._series: dict[tuple, list[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """with ブロックの所要時間を記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, list(series)) for key, series in self._series.items())
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, series):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+COMMAND_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_command_duration_seconds", "Duration of account commands", ("command",)))
+HTTP_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_http_request_duration_seconds", "Outbound HTTP request latency", ("service", "endpoint")))
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "spikebot_http_requests_total", "Outbound HTTP requests by response status", ("service", "endpoint", "status")))
+REAUTH_TOTAL = REGISTRY.register(Counter(
+    "spikebot_reauth_total", "Re-authentications triggered by a failed storefront fetch", ("result",)))
+RENDER_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_render_duration_seconds", "Daily store image rendering time"))
+UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_upload_duration_seconds", "Discord upload time of the store image", ("target",)))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "spikebot_cache_requests_total", "Cache lookups by result", ("cache", "result")))
+SCHEDULE_LAG_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_schedule_lag_seconds", "Delay between the scheduled minute and the posted store",
+    buckets=(1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 45.0, 60.0, 120.0, 300.0)))
+LINK_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "spikebot_link_queue_depth", "Link payloads waiting for a worker"))
+JOB_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_job_wait_seconds", "Time spent waiting for a shared job slot", ("pool", "priority")))
+JOB_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "spikebot_job_queue_depth", "Jobs waiting for a shared job slot", ("pool",)))
+ADMISSION_TOTAL = REGISTRY.register(Counter(
+    "spikebot_admission_total", "Command admission decisions", ("pool", "result")))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "spikebot_admission_queue_depth", "Commands waiting to be admitted", ("pool",)))
+LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    "spikebot_event_loop_lag_seconds", "Scheduling delay of the event loop probe",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)))
+LOOP_STALLS = REGISTRY.register(Counter(
+    "spikebot_event_loop_stalls_total", "Times the event loop was blocked past the lag threshold"))
+
+
+# --- 外部HTTPリクエストの計測 ---
+
+_ID_SEGMENT = re.compile(r"^(?:[0-9a-fA-F-]{32,36}|\d+)$")
+
+
+def endpoint_labels(url) -> tuple[str, str]:
+    """
+    URLを (サービス名, エンドポイント) に正規化する。IDやUUIDは :id に置き換える。
+    Riot API / Valorant-API 以外（Discordの添付ファイルなど）はURLごとに系列が増えないよう、
+    まとめて ("other", "other") にする。
+    """
+    parts = urlsplit(str(url))
+    host = parts.hostname or ""
+    if host.endswith(".a.pvp.net"):
+        service = "riot_pd"
+    elif host.endswith("riotgames.com"):
+        service = "riot_" + host.split(".")[0]
+    elif host.endswith("valorant-api.com"):
+        service = "valorant_api_media" if host.startswith("media.") else "valorant_api"
+    else:
+        return "other", "other"
+    path = "/".join(":id" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/"))
+    if service == "valorant_api_media":
+        # 画像はパスごとに別ファイルなので、最初の階層だけを残す
+        path = "/" + (path.strip("/").split("/")[0] if path.strip("/") else "")
+    return service, path or "/"
+
+
+def http_trace_config() -> aiohttp.TraceConfig:
+    """ClientSession に渡して、すべての外部リクエストのレイテンシとステータスを記録する"""
+    trace_config = aiohttp.TraceConfig()
+
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        service, endpoint = endpoint_labels(params.url)
+        HTTP_SECONDS.observe(time.perf_counter() - context.start, service=service, endpoint=endpoint)
+        HTTP_REQUESTS.inc(service=service, endpoint=endpoint, status=str(params.response.status))
+
+    async def on_request_exception(session, context, params):
+        service, endpoint = endpoint_labels(params.url)
+        HTTP_SECONDS.observe(time.perf_counter() - context.start, service=service, endpoint=endpoint)
+        HTTP_REQUESTS.inc(service=service, endpoint=endpoint, status="error")
+
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
+    return trace_config
+
+
+async def handle_metrics(request):
+    """GET /metrics"""
+    from aiohttp import web
+    return web.Response(text=REGISTRY.render(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
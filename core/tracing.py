@@ -0,0 +1,169 @@
+# core/tracing.py
+"""
+リクエスト単位の軽量なスパントレース。
+trace() でルートスパンを開始し、その内側（awaitやgatherで分岐した先も含む）で
+span() を使うと子スパンとして記録される。ルートの外での span() は何もしない。
+ルートの所要時間がしきい値を超えた場合はスパンツリー全体をログに出し、
+出力先が設定されていれば全トレースを1行1件のJSONでファイルに書き出す。
+"""
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+
+# しきい値 (ms)。これより遅いリクエストはスパンツリーをログに出す
+_slow_threshold_ms = 5000.0
+_export_logger: logging.Logger | None = None
+_export_listener: logging.handlers.QueueListener | None = None
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "end", "children", "error")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: float | None = None
+        self.children: list[Span] = []
+        self.error: str | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1000
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        origin = self.start if origin is None else origin
+        entry = {
+            "name": self.name,
+            "offset_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration_ms, 3),
+        }
+        if self.attrs:
+            entry["attrs"] = self.attrs
+        if self.error:
+            entry["error"] = self.error
+        if self.children:
+            entry["children"] = [child.to_dict(origin) for child in self.children]
+        return entry
+
+    def render(self, depth: int = 0, origin: float | None = None) -> list[str]:
+        """インデント付きのテキストでツリーを表す"""
+        origin = self.start if origin is None else origin
+        attrs = "".join(f" {key}={value}" for key, value in self.attrs.items())
+        error = f" error={self.error}" if self.error else ""
+        lines = [f"{'  ' * depth}{self.name} +{(self.start - origin) * 1000:.1f}ms {self.duration_ms:.1f}ms{attrs}{error}"]
+        for child in self.children:
+            lines.extend(child.render(depth + 1, origin))
+        return lines
+
+
+def configure_tracing(slow_threshold_ms: float = 5000.0, export_path: str | None = None):
+    """しきい値と書き出し先を設定する。ファイルへの書き込みは別スレッドで行う"""
+    global _slow_threshold_ms, _export_logger, _export_listener
+    _slow_threshold_ms = slow_threshold_ms
+    shutdown_tracing()
+    if export_path:
+        export_queue: queue.SimpleQueue = queue.SimpleQueue()
+        file_handler = logging.FileHandler(export_path, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        _export_listener = logging.handlers.QueueListener(export_queue, file_handler)
+        _export_listener.start()
+        _export_logger = logging.getLogger("spikebot.trace_export")
+        _export_logger.propagate = False
+        _export_logger.setLevel(logging.INFO)
+        _export_logger.handlers = [logging.handlers.QueueHandler(export_queue)]
+
+
+def shutdown_tracing():
+    global _export_logger, _export_listener
+    if _export_listener:
+        _export_listener.stop()
+        for handler in _export_listener.handlers:
+            handler.close()
+        _export_listener = None
+    if _export_logger:
+        _export_logger.handlers = []
+        _export_logger = None
+
+
+def current_span() -> Span | None:
+    return _current.get()
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """ルートスパンを開始する。内側で既にトレース中の場合は子スパンとして扱う"""
+    if _current.get() is not None:
+        with span(name, **attrs) as child:
+            yield child
+        return
+
+    root = Span(name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = type(e).__name__
+        raise
+    finally:
+        root.end = time.perf_counter()
+        _current.reset(token)
+        _finish(root)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """現在のトレースに子スパンを追加する（トレース外では何もしない）"""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, attrs)
+    parent.children.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = type(e).__name__
+        raise
+    finally:
+        child.end = time.perf_counter()
+        _current.reset(token)
+
+
+def traced(name: str):
+    """非同期関数の呼び出し全体を子スパンとして記録するデコレーター"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _finish(root: Span):
+    duration_ms = root.duration_ms
+    if duration_ms >= _slow_threshold_ms:
+        log.warning(
+            "Slow request: %s took %.1fms\n%s", root.name, duration_ms, "\n".join(root.render()),
+            extra={"duration_ms": round(duration_ms, 1), **root.attrs},
+        )
+    if _export_logger:
+        entry = {"trace_id": uuid.uuid4().hex, "ts": round(time.time() - duration_ms / 1000, 3), **root.to_dict()}
+        _export_logger.info(json.dumps(entry, ensure_ascii=False, default=str))
@@ -0,0 +1,85 @@
+# core/upload_cache.py
+"""
+アップロード済み画像のURLキャッシュ。
+同じ内容の画像（画像データのSHA-256が同じ）を再びアップロードせず、
+最初にアップロードしたときのDiscord CDNのURLを埋め込みで参照する。
+ストアは毎日 0:00 UTC に切り替わるため、エントリはその時刻か
+URLの有効期限（`ex` パラメータ）のどちらか早い方で失効させる。
+"""
+import datetime
+import hashlib
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+
+from core.metrics import CACHE_REQUESTS
+
+# 有効期限の直前に参照すると表示時には失効していることがあるため、余裕を持たせる
+EXPIRY_MARGIN = 600.0
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _next_reset(now: datetime.datetime) -> datetime.datetime:
+    """次のストア更新時刻 (0:00 UTC)"""
+    return (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def url_expiry(url: str) -> float | None:
+    """署名付き添付URLの `ex`（16進数のUNIX時刻）を返す。無ければ None"""
+    values = parse_qs(urlsplit(url).query).get("ex")
+    if not values:
+        return None
+    try:
+        return float(int(values[0], 16))
+    except ValueError:
+        return None
+
+
+class UploadCache:
+    """画像のハッシュ → アップロード先のURL。サイズ上限を超えた場合は古いものから破棄する"""
+    def __init__(self, maxsize: int = 5000):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, digest: str) -> str | None:
+        entry = self._entries.get(digest)
+        if entry and entry[0] > time.time():
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="uploads", result="hit")
+            return entry[1]
+        if entry:
+            del self._entries[digest]
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache="uploads", result="miss")
+        return None
+
+    def put(self, digest: str, url: str):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        expires = _next_reset(now).timestamp()
+        signed_expiry = url_expiry(url)
+        if signed_expiry is not None:
+            expires = min(expires, signed_expiry)
+        expires -= EXPIRY_MARGIN
+        if expires <= now.timestamp():
+            return
+        self._entries[digest] = (expires, url)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def discard(self, digest: str):
+        self._entries.pop(digest, None)
+
+    def clear(self):
+        self._entries.clear()
+
+
+upload_cache = UploadCache()
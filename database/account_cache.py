@@ -0,0 +1,77 @@
+# database/account_cache.py
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+from sqlalchemy.future import select
+
+from core.metrics import CACHE_REQUESTS
+from .database import async_session
+from .models import RiotAccount
+
+
+class CachedAccount(NamedTuple):
+    """アカウント選択に必要な情報だけを持つ軽量なアカウント情報（トークンは含まない）"""
+    id: int
+    account_name: str
+    riot_id: str
+    puuid: str
+    shard: str
+
+
+class AccountCache:
+    """
+    Discordユーザーごとの連携アカウント一覧をメモリに保持するキャッシュ。
+    サイズ上限を超えた場合は最も古く使われたユーザーから破棄する。
+    連携・解除・名前変更の際は invalidate() で該当ユーザーを無効化すること。
+    別インスタンスでの変更に備えて、エントリはTTLで失効させる。
+    """
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[int, tuple[float, tuple[CachedAccount, ...]]] = OrderedDict()
+        # 読み込み中に無効化が起きた場合、古い結果を保存しないための世代番号
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, discord_user_id: int) -> tuple[CachedAccount, ...]:
+        """ユーザーの連携アカウント一覧を返す（キャッシュになければDBから読み込む）"""
+        entry = self._entries.get(discord_user_id)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(discord_user_id)
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache="accounts", result="hit")
+            return entry[1]
+
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache="accounts", result="miss")
+        generation = self._generation
+        async with async_session() as session:
+            result = await session.execute(
+                select(
+                    RiotAccount.id, RiotAccount.account_name, RiotAccount.riot_id,
+                    RiotAccount.puuid, RiotAccount.shard
+                )
+                .where(RiotAccount.discord_user_id == discord_user_id)
+                .order_by(RiotAccount.id)
+            )
+            accounts = tuple(CachedAccount(*row) for row in result.all())
+
+        if generation == self._generation:
+            self._entries[discord_user_id] = (time.monotonic() + self.ttl, accounts)
+            self._entries.move_to_end(discord_user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return accounts
+
+    def invalidate(self, discord_user_id: int):
+        """指定したユーザーのエントリを破棄する"""
+        self._generation += 1
+        self._entries.pop(discord_user_id, None)
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+
+
+account_cache = AccountCache()
@@ -0,0 +1,64 @@
+# database/account_context.py
+from sqlalchemy import update as sqlalchemy_update
+
+from core.tracing import span
+from .database import async_session
+from .models import RiotAccount
+
+
+class AccountContext:
+    """
+    1回のコマンド処理の間だけ使用するRiotAccountを保持する。
+    アカウントの読み込みは1回だけ行い、再認証で更新されたトークンは
+    処理の最後にまとめて1回だけ書き戻す。
+    """
+    def __init__(self, account: RiotAccount):
+        self.account = account
+        self._pending: dict[str, str] = {}
+
+    @classmethod
+    async def load(cls, account_id: int, discord_user_id: int | None = None) -> "AccountContext | None":
+        """IDでアカウントを読み込む。discord_user_idを指定した場合は所有者も確認する"""
+        with span("db.load_account"):
+            async with async_session() as session:
+                account = await session.get(RiotAccount, account_id)
+        if not account:
+            return None
+        if discord_user_id is not None and account.discord_user_id != discord_user_id:
+            return None
+        return cls(account)
+
+    @property
+    def id(self) -> int:
+        return self.account.id
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._pending)
+
+    def update_tokens(self, auth_token: str, entitlement_token: str):
+        """再認証で得たトークンをメモリ上に反映し、書き戻し対象にする"""
+        self.account.auth_token = auth_token
+        self.account.entitlement_token = entitlement_token
+        self._pending.update(auth_token=auth_token, entitlement_token=entitlement_token)
+
+    async def commit(self):
+        """変更されたトークンがあればDBへ書き戻す"""
+        if not self._pending:
+            return
+        with span("db.commit_tokens"):
+            async with async_session() as session:
+                async with session.begin():
+                    await session.execute(
+                        sqlalchemy_update(RiotAccount)
+                        .where(RiotAccount.id == self.account.id)
+                        .values(**self._pending)
+                    )
+        self._pending.clear()
+
+    async def __aenter__(self) -> "AccountContext":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 処理が途中で失敗しても、取得済みの新しいトークンは保存しておく
+        await self.commit()
@@ -1,15 +1,169 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+import logging
+
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine
 from .models import Base
 
+log = logging.getLogger(__name__)
+
 # データベースファイル名
 DB_FILE = "users.db"
+DEFAULT_DATABASE_URL = f"sqlite+aiosqlite:///{DB_FILE}"
+
+# SQLiteの性能設定（接続ごとに適用する）
+SQLITE_PRAGMAS = {
+    # 読み取りと書き込みを並行できるようにする
+    "journal_mode": "WAL",
+    # WALではNORMALでもクラッシュ時の整合性は保たれる
+    "synchronous": "NORMAL",
+    # ロック競合時に即エラーにせず待機する (ms)
+    "busy_timeout": 15000,
+    # ページキャッシュ 64MiB (負の値はKiB単位)
+    "cache_size": -65536,
+    # 256MiB までメモリマップで読み込む
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+    # ON DELETE CASCADE を有効にする（SQLiteは既定で外部キー制約を無視する）
+    "foreign_keys": "ON",
+}
+
+# コネクションプール設定（WALでは読み取りを複数接続で並行できる）
+SQLITE_POOL_OPTIONS = {
+    "pool_size": 8,
+    "max_overflow": 4,
+    "pool_timeout": 30,
+}
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+def create_sqlite_engine(path: str, tuned: bool = True) -> AsyncEngine:
+    """SQLiteの非同期エンジンを作成する。tuned=Trueの場合はPRAGMAとプール設定を適用する"""
+    if not tuned:
+        return create_async_engine(f"sqlite+aiosqlite:///{path}", echo=False)
+    sqlite_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", echo=False, **SQLITE_POOL_OPTIONS)
+    event.listen(sqlite_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return sqlite_engine
+
+
+def create_postgres_engine(
+    url: str,
+    pool_size: int = 10,
+    max_overflow: int = 10,
+    statement_cache_size: int = 256,
+) -> AsyncEngine:
+    """
+    PostgreSQL (asyncpg) の非同期エンジンを作成する。
+    statement_cache_size はasyncpgのプリペアドステートメントキャッシュの大きさ
+    (pgbouncerのトランザクションモード経由の場合は0にする)。
+    """
+    pg_url = make_url(url)
+    if pg_url.drivername in ("postgresql", "postgres"):
+        pg_url = pg_url.set(drivername="postgresql+asyncpg")
+    # SQLAlchemy側のプリペアドステートメントキャッシュ（URLのクエリで指定する）
+    pg_url = pg_url.update_query_dict({"prepared_statement_cache_size": str(statement_cache_size)})
+    return create_async_engine(
+        pg_url,
+        echo=False,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=30,
+        # 長時間放置された接続はサーバー/ロードバランサ側で切られるため再作成する
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        connect_args={"statement_cache_size": statement_cache_size},
+    )
+
+
+def create_engine_from_url(url: str | None = None, **pool_options) -> AsyncEngine:
+    """
+    接続URLからバックエンドに応じたエンジンを作成する（未指定ならローカルのSQLite）。
+    SQLiteの場合、プール設定は SQLITE_POOL_OPTIONS を使用する。
+    """
+    url = url or DEFAULT_DATABASE_URL
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        return create_sqlite_engine(make_url(url).database)
+    if backend == "postgresql":
+        return create_postgres_engine(url, **pool_options)
+    raise ValueError(f"Unsupported database backend: {backend}")
 
-# 非同期エンジンを作成
-engine = create_async_engine(f"sqlite+aiosqlite:///{DB_FILE}", echo=False)
+
+# 非同期エンジンを作成（configure_engine() で差し替え可能）
+engine = create_sqlite_engine(DB_FILE)
 
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
+
+def configure_engine(url: str | None = None, **pool_options) -> AsyncEngine:
+    """使用するデータベースを切り替え、async_session の接続先を更新する"""
+    global engine
+    engine = create_engine_from_url(url, **pool_options)
+    async_session.configure(bind=engine)
+    return engine
+
+
+async def dispose_engine():
+    """コネクションプールを閉じる（シャットダウン時）"""
+    await engine.dispose()
+
+
+def dialect_insert(model):
+    """接続先のバックエンドに応じた、ON CONFLICT (upsert) に対応したinsert()を返す"""
+    if engine.dialect.name == "postgresql":
+        # PostgreSQLを使わない構成では読み込まない
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+
+def _upgrade_schema(sync_conn):
+    """既存のデータベースを新しいユニーク制約に合わせる"""
+    inspector = inspect(sync_conn)
+    if "daily_store_schedules" in inspector.get_table_names():
+        index_names = {index["name"] for index in inspector.get_indexes("daily_store_schedules")}
+        if "uq_daily_store_schedules_user_guild_channel" not in index_names:
+            # ユニークインデックス作成前に、(ユーザー, ギルド, チャンネル) の重複を最新の1件だけ残して削除する
+            duplicates = sync_conn.execute(text(
+                "SELECT id, discord_user_id, guild_id, channel_id, schedule_time FROM daily_store_schedules "
+                "WHERE id NOT IN (SELECT MAX(id) FROM daily_store_schedules GROUP BY discord_user_id, guild_id, channel_id)"
+            )).all()
+            if duplicates:
+                # ユーザーのスケジュールが消えるため、どれを消したか運用者が追えるように残す
+                log.warning(
+                    "Removing %d duplicate daily store schedules before adding the unique index: %s",
+                    len(duplicates),
+                    ", ".join(
+                        f"id={row.id} (user={row.discord_user_id}, guild={row.guild_id}, channel={row.channel_id}, time={row.schedule_time})"
+                        for row in duplicates
+                    ),
+                )
+                sync_conn.execute(
+                    text("DELETE FROM daily_store_schedules WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)),
+                    {"ids": [row.id for row in duplicates]},
+                )
+
+
+def _create_missing_indexes(sync_conn):
+    """既存のテーブルに後から追加されたインデックスを作成する"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db():
     """データベースのテーブルを初期化（存在しない場合のみ作成）"""
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_upgrade_schema)
+        await conn.run_sync(_create_missing_indexes)
+        if conn.dialect.name == "sqlite":
+            # クエリプランナーの統計情報を更新する
+            await conn.exec_driver_sql("PRAGMA optimize")
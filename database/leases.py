@@ -0,0 +1,198 @@
+# database/leases.py
+import datetime
+import math
+import os
+import socket
+import uuid
+from sqlalchemy import select, update, delete, or_
+from sqlalchemy.exc import IntegrityError
+
+from .database import async_session
+from .models import SchedulerLease, SchedulerInstance
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+# 引き継ぎや更新失敗で実行されなかった分を、何分前までさかのぼって実行するか
+MAX_CATCHUP_MINUTES = 10
+
+
+def default_instance_id() -> str:
+    """ホスト名・PID・乱数からインスタンスIDを生成する"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class LeaseManager:
+    """
+    スケジュールをパーティションに分割し、DB上のリースで所有権を管理する。
+    複数のボットインスタンスが同じDBを共有していても、各パーティションは
+    常に1インスタンスだけが実行する。
+    """
+    def __init__(self, partition_count: int = 1, instance_id: str | None = None, ttl_seconds: int = 150):
+        self.partition_count = max(1, partition_count)
+        self.instance_id = instance_id or default_instance_id()
+        # ループ間隔(1分)より十分長くし、1回の更新失敗でリースを失わないようにする
+        self.ttl = datetime.timedelta(seconds=ttl_seconds)
+        self.owned: frozenset[int] = frozenset()
+        # 取り分を超えて保持しているパーティション（今回の分を実行してから譲る）
+        self.surplus: frozenset[int] = frozenset()
+
+    def partition_of(self, guild_id: int) -> int:
+        """ギルドIDからパーティション番号を求める"""
+        return guild_id % self.partition_count
+
+    def owns(self, guild_id: int) -> bool:
+        return self.partition_of(guild_id) in self.owned
+
+    async def _ensure_rows(self, existing: set[int]):
+        """まだ存在しないパーティションの行を作成する（他インスタンスとの競合は無視）"""
+        missing = [p for p in range(self.partition_count) if p not in existing]
+        if not missing:
+            return
+        try:
+            async with async_session() as session:
+                async with session.begin():
+                    session.add_all(SchedulerLease(partition=p, owner=None, expires_at=EPOCH) for p in missing)
+        except IntegrityError:
+            # 他のインスタンスが先に作成した
+            pass
+
+    async def _heartbeat(self, now: datetime.datetime) -> int:
+        """自インスタンスの生存を記録し、生存中のインスタンス数を返す"""
+        async with async_session() as session:
+            async with session.begin():
+                result = await session.execute(
+                    update(SchedulerInstance)
+                    .where(SchedulerInstance.instance_id == self.instance_id)
+                    .values(heartbeat_at=now)
+                )
+                if result.rowcount == 0:
+                    session.add(SchedulerInstance(instance_id=self.instance_id, heartbeat_at=now))
+
+        async with async_session() as session:
+            result = await session.execute(
+                select(SchedulerInstance.instance_id).where(SchedulerInstance.heartbeat_at > now - self.ttl)
+            )
+            live = set(result.scalars().all())
+        live.add(self.instance_id)
+        return len(live)
+
+    async def renew(self) -> frozenset[int]:
+        """
+        保持中のリースを延長し、公平な取り分まで空きパーティションを取得する。
+        取り分を超えた分もこの時点では手放さず、claim_tick() の後に hand_over() で譲る。
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        expires_at = now + self.ttl
+
+        # 生存しているインスタンス数から公平な取り分を計算する
+        fair_share = math.ceil(self.partition_count / await self._heartbeat(now))
+
+        async with async_session() as session:
+            leases = (await session.execute(select(SchedulerLease))).scalars().all()
+        await self._ensure_rows({lease.partition for lease in leases})
+
+        mine = sorted(lease.partition for lease in leases if lease.owner == self.instance_id and lease.partition < self.partition_count)
+
+        async with async_session() as session:
+            async with session.begin():
+                owned = set()
+                if mine:
+                    result = await session.execute(
+                        update(SchedulerLease)
+                        .where(SchedulerLease.partition.in_(mine), SchedulerLease.owner == self.instance_id)
+                        .values(expires_at=expires_at)
+                        .returning(SchedulerLease.partition)
+                    )
+                    owned.update(result.scalars().all())
+
+                free = [p for p in range(self.partition_count) if p not in owned]
+                for partition in free:
+                    if len(owned) >= fair_share:
+                        break
+                    # 未所有または期限切れの場合のみ取得できる（条件付きUPDATEで排他）
+                    result = await session.execute(
+                        update(SchedulerLease)
+                        .where(
+                            SchedulerLease.partition == partition,
+                            or_(SchedulerLease.owner.is_(None), SchedulerLease.expires_at < now)
+                        )
+                        .values(owner=self.instance_id, expires_at=expires_at)
+                        .returning(SchedulerLease.partition)
+                    )
+                    owned.update(result.scalars().all())
+
+        self.owned = frozenset(owned)
+        self.surplus = frozenset(sorted(owned)[fair_share:])
+        return self.owned
+
+    async def hand_over(self):
+        """取り分を超えたリースを即時に期限切れにして他インスタンスへ譲る"""
+        if not self.surplus:
+            return
+        now = datetime.datetime.now(datetime.timezone.utc)
+        async with async_session() as session:
+            async with session.begin():
+                await session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.partition.in_(self.surplus), SchedulerLease.owner == self.instance_id)
+                    .values(expires_at=now)
+                )
+        self.owned -= self.surplus
+        self.surplus = frozenset()
+
+    async def claim_tick(self, fire_at: datetime.datetime) -> dict[int, list[datetime.datetime]]:
+        """
+        指定した分までのスケジュール実行権を、所有中の各パーティションについて確保する。
+        前回実行した分 (last_fired_at) から fire_at までの未実行の分を、パーティションごとに返す。
+        リースの引き継ぎが同じ分に起きても二重投稿にならないよう、実行済みの分を記録する。
+        """
+        if not self.owned:
+            return {}
+        now = datetime.datetime.now(datetime.timezone.utc)
+        earliest = fire_at - datetime.timedelta(minutes=MAX_CATCHUP_MINUTES)
+        async with async_session() as session:
+            async with session.begin():
+                # last_fired_at を書き換えるのはリースの所有者だけなので、更新前の値を先に読んでおく
+                result = await session.execute(
+                    select(SchedulerLease.partition, SchedulerLease.last_fired_at)
+                    .where(SchedulerLease.partition.in_(self.owned), SchedulerLease.owner == self.instance_id)
+                )
+                last_fired = dict(result.all())
+                result = await session.execute(
+                    update(SchedulerLease)
+                    .where(
+                        SchedulerLease.partition.in_(self.owned),
+                        SchedulerLease.owner == self.instance_id,
+                        SchedulerLease.expires_at > now,
+                        or_(SchedulerLease.last_fired_at.is_(None), SchedulerLease.last_fired_at < fire_at)
+                    )
+                    .values(last_fired_at=fire_at)
+                    .returning(SchedulerLease.partition)
+                )
+                claimed = sorted(result.scalars().all())
+
+        minutes = {}
+        for partition in claimed:
+            previous = last_fired.get(partition)
+            # 初めて実行するパーティションは今回の分だけ
+            start = fire_at if previous is None else max(previous + datetime.timedelta(minutes=1), earliest)
+            minutes[partition] = [
+                start + datetime.timedelta(minutes=i)
+                for i in range(int((fire_at - start).total_seconds() // 60) + 1)
+            ]
+        return minutes
+
+    async def release(self):
+        """保持中の全リースを解放する（シャットダウン時）"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        async with async_session() as session:
+            async with session.begin():
+                await session.execute(
+                    delete(SchedulerInstance).where(SchedulerInstance.instance_id == self.instance_id)
+                )
+                await session.execute(
+                    update(SchedulerLease)
+                    .where(SchedulerLease.owner == self.instance_id)
+                    .values(owner=None, expires_at=now)
+                )
+        self.owned = frozenset()
+        self.surplus = frozenset()
@@ -1,6 +1,6 @@
 # database/models.py
 import datetime
-from sqlalchemy import BigInteger, String, Text, TIMESTAMP, ForeignKey, UniqueConstraint
+from sqlalchemy import BigInteger, String, Text, TIMESTAMP, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.types import TypeDecorator, DateTime
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.sql import func
@@ -47,12 +47,36 @@ class RiotAccount(Base):
     __table_args__ = (
         # discord_user_id と account_name の組み合わせはユニークでなければならない
         UniqueConstraint('discord_user_id', 'account_name', name='_discord_user_account_name_uc'),
+        # 連携時の (ユーザー, PUUID) による検索用
+        Index('ix_riot_accounts_user_puuid', 'discord_user_id', 'puuid'),
     )
 
     def __repr__(self) -> str:
         return f"<RiotAccount(id={self.id}, discord_user_id={self.discord_user_id}, name='{self.account_name}')>"
 
 
+class WishlistEntry(Base):
+    __tablename__ = "wishlist_entries"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    discord_user_id: Mapped[int] = mapped_column(BigInteger)
+    # 親スキンのUUID（日替わりオファーのスキンレベルUUIDからカタログで引く）
+    skin_uuid: Mapped[str] = mapped_column(String(36))
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        TZDateTime, server_default=func.now()
+    )
+
+    __table_args__ = (
+        # 同じスキンを二重に登録しない（ユーザーごとの一覧の検索にも使用する）
+        UniqueConstraint('discord_user_id', 'skin_uuid', name='_wishlist_user_skin_uc'),
+        # スキンから登録ユーザーを引く転置インデックス
+        Index('ix_wishlist_entries_skin', 'skin_uuid'),
+    )
+
+    def __repr__(self) -> str:
+        return f"<WishlistEntry(user_id={self.discord_user_id}, skin_uuid='{self.skin_uuid}')>"
+
+
 class State(Base):
     __tablename__ = "states"
 
@@ -60,6 +84,11 @@ class State(Base):
     user_id: Mapped[int] = mapped_column(BigInteger)
     expiry: Mapped[datetime.datetime] = mapped_column(TZDateTime)
 
+    __table_args__ = (
+        # 期限切れトークンの定期削除用
+        Index('ix_states_expiry', 'expiry'),
+    )
+
     def __repr__(self) -> str:
         return f"<State(user_id={self.user_id}, expiry={self.expiry})>"
 
@@ -77,7 +106,38 @@ class DailyStoreSchedule(Base):
     __table_args__ = (
         # 同じアカウント、同じギルド、同じチャンネルに複数のスケジュールは設定できない
         UniqueConstraint('riot_account_id', 'guild_id', 'channel_id', name='_schedule_uc'),
+        # 毎分の実行対象検索用 (時刻で絞り込み、アカウントと結合)
+        Index('ix_daily_store_schedules_time_account', 'schedule_time', 'riot_account_id'),
+        # ユーザーごとにチャンネル1つにつき1スケジュール（upsertの競合対象）
+        # /schedule list・remove の (ユーザー, ギルド) による検索にも使用する
+        Index('uq_daily_store_schedules_user_guild_channel', 'discord_user_id', 'guild_id', 'channel_id', unique=True),
     )
 
     def __repr__(self) -> str:
-        return f"<DailyStoreSchedule(id={self.id}, user_id={self.discord_user_id}, channel_id={self.channel_id}, time={self.schedule_time})>"
\ No newline at end of file
+        return f"<DailyStoreSchedule(id={self.id}, user_id={self.discord_user_id}, channel_id={self.channel_id}, time={self.schedule_time})>"
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    # スケジュールのパーティション番号 (guild_id % パーティション数)
+    partition: Mapped[int] = mapped_column(primary_key=True, autoincrement=False)
+    # リースを保持しているボットインスタンスのID (未所有ならNone)
+    owner: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    expires_at: Mapped[datetime.datetime] = mapped_column(TZDateTime)
+    # 最後にスケジュールを実行した分 (同じ分の二重投稿を防ぐ)
+    last_fired_at: Mapped[datetime.datetime | None] = mapped_column(TZDateTime, nullable=True)
+
+    def __repr__(self) -> str:
+        return f"<SchedulerLease(partition={self.partition}, owner='{self.owner}', expires_at={self.expires_at})>"
+
+
+class SchedulerInstance(Base):
+    __tablename__ = "scheduler_instances"
+
+    # 稼働中のボットインスタンス（リースの公平な分配に使用する）
+    instance_id: Mapped[str] = mapped_column(String(100), primary_key=True)
+    heartbeat_at: Mapped[datetime.datetime] = mapped_column(TZDateTime)
+
+    def __repr__(self) -> str:
+        return f"<SchedulerInstance(instance_id='{self.instance_id}', heartbeat_at={self.heartbeat_at})>"
\ No newline at end of file
@@ -0,0 +1,111 @@
+# database/state_store.py
+import datetime
+import heapq
+import uuid
+from sqlalchemy import delete, select
+
+from .database import async_session
+from .models import State
+
+# 連携用stateトークンの有効期限
+STATE_TTL = datetime.timedelta(minutes=10)
+# 期限切れトークンを一度に削除する件数
+PURGE_BATCH_SIZE = 500
+
+
+def _is_valid_token(state_token) -> bool:
+    """uuid4形式の文字列かどうか（DBに問い合わせる前の安価なチェック）"""
+    if not isinstance(state_token, str) or len(state_token) != 36:
+        return False
+    try:
+        uuid.UUID(state_token)
+    except ValueError:
+        return False
+    return True
+
+
+class StateStore:
+    """
+    /account link で発行するstateトークンを管理する。
+    発行したトークンはメモリ上のTTLインデックスに保持しつつ、再起動や
+    別インスタンスでの受信に備えてDBにも書き込む。検証と削除は1文で行う。
+    """
+    def __init__(self, ttl: datetime.timedelta = STATE_TTL):
+        self.ttl = ttl
+        self._tokens: dict[str, tuple[int, datetime.datetime]] = {}
+        # (有効期限, トークン) のヒープ。期限切れの破棄に使う
+        self._expiry_heap: list[tuple[datetime.datetime, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+    async def create(self, user_id: int) -> str:
+        """新しいstateトークンを発行する"""
+        state_token = str(uuid.uuid4())
+        expiry = datetime.datetime.now(datetime.timezone.utc) + self.ttl
+
+        async with async_session() as session:
+            async with session.begin():
+                session.add(State(state_token=state_token, user_id=user_id, expiry=expiry))
+
+        self._tokens[state_token] = (user_id, expiry)
+        heapq.heappush(self._expiry_heap, (expiry, state_token))
+        return state_token
+
+    async def consume(self, state_token) -> int | None:
+        """
+        トークンを検証して削除し、有効ならユーザーIDを返す。
+        削除とユーザーIDの取得は DELETE ... RETURNING の1文で行うため、
+        同じトークンが複数回届いても成功するのは1回だけ。
+        """
+        if not _is_valid_token(state_token):
+            return None
+        known = self._tokens.pop(state_token, None)
+        if known and known[1] < datetime.datetime.now(datetime.timezone.utc):
+            # 期限切れが分かっている場合はDBに問い合わせない（行は定期削除で消える）
+            return None
+
+        async with async_session() as session:
+            async with session.begin():
+                result = await session.execute(
+                    delete(State)
+                    .where(State.state_token == state_token)
+                    .returning(State.user_id, State.expiry)
+                )
+                row = result.one_or_none()
+
+        if row is None:
+            return None
+        user_id, expiry = row
+        if expiry < datetime.datetime.now(datetime.timezone.utc):
+            return None
+        return user_id
+
+    def _evict_expired(self, now: datetime.datetime):
+        while self._expiry_heap and self._expiry_heap[0][0] < now:
+            _, state_token = heapq.heappop(self._expiry_heap)
+            self._tokens.pop(state_token, None)
+
+    async def purge_expired(self, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        """期限切れのトークンをメモリとDBから削除し、DBから削除した件数を返す"""
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._evict_expired(now)
+
+        total = 0
+        while True:
+            # 大量に溜まっていてもロックを長時間保持しないよう、小分けにして削除する
+            async with async_session() as session:
+                async with session.begin():
+                    expired = (
+                        select(State.state_token)
+                        .where(State.expiry < now)
+                        .limit(batch_size)
+                        .scalar_subquery()
+                    )
+                    result = await session.execute(delete(State).where(State.state_token.in_(expired)))
+            total += result.rowcount
+            if result.rowcount < batch_size:
+                return total
+
+
+state_store = StateStore()
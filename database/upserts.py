@@ -0,0 +1,118 @@
+# database/upserts.py
+import datetime
+import random
+from sqlalchemy import select, delete, literal_column, Boolean
+from sqlalchemy.exc import IntegrityError
+
+from .database import async_session, dialect_insert
+from .models import RiotAccount, DailyStoreSchedule
+
+# アカウント名の重複時に別名を試す回数
+ACCOUNT_NAME_ATTEMPTS = 3
+
+
+async def upsert_riot_account(
+    discord_user_id: int,
+    puuid: str,
+    riot_id: str,
+    encrypted_cookies: str,
+    auth_token: str,
+    entitlement_token: str,
+) -> str | None:
+    """
+    PUUIDをキーにアカウントを1文で作成または更新し、アカウント名を返す。
+    そのPUUIDが別のDiscordユーザーに連携済みの場合はNoneを返す。
+    """
+    account_name = riot_id
+    for attempt in range(ACCOUNT_NAME_ATTEMPTS):
+        stmt = dialect_insert(RiotAccount).values(
+            discord_user_id=discord_user_id,
+            account_name=account_name,
+            riot_id=riot_id,
+            encrypted_cookies=encrypted_cookies,
+            auth_token=auth_token,
+            entitlement_token=entitlement_token,
+            puuid=puuid,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[RiotAccount.puuid],
+            set_={
+                "encrypted_cookies": stmt.excluded.encrypted_cookies,
+                "auth_token": stmt.excluded.auth_token,
+                "entitlement_token": stmt.excluded.entitlement_token,
+                "riot_id": stmt.excluded.riot_id,  # Riot IDも更新
+            },
+            # 他のユーザーに連携済みのPUUIDは上書きしない
+            where=RiotAccount.discord_user_id == stmt.excluded.discord_user_id,
+        ).returning(RiotAccount.account_name)
+
+        try:
+            async with async_session() as session:
+                async with session.begin():
+                    result = await session.execute(stmt)
+                    return result.scalar_one_or_none()
+        except IntegrityError:
+            # 新規作成でアカウント名が既に使われていた場合は、末尾に数字を付けて再試行する
+            if attempt == ACCOUNT_NAME_ATTEMPTS - 1:
+                raise
+            account_name = f"{riot_id}_{random.randrange(1000)}"
+    return None
+
+
+async def delete_riot_account(discord_user_id: int, account_id: int) -> str | None:
+    """
+    ユーザーが所有するアカウントを削除し、削除したアカウント名を返す。
+    関連するスケジュールは外部キーの ON DELETE CASCADE で削除される。
+    """
+    async with async_session() as session:
+        async with session.begin():
+            result = await session.execute(
+                delete(RiotAccount)
+                .where(RiotAccount.id == account_id, RiotAccount.discord_user_id == discord_user_id)
+                .returning(RiotAccount.account_name)
+            )
+            return result.scalar_one_or_none()
+
+
+async def upsert_schedule(
+    discord_user_id: int,
+    guild_id: int,
+    channel_id: int,
+    riot_account_id: int,
+    schedule_time: datetime.time,
+) -> bool:
+    """
+    (ユーザー, ギルド, チャンネル) ごとのスケジュールを1文で作成または更新する。
+    新しく作成した場合はTrue、既存のスケジュールを更新した場合はFalseを返す。
+    """
+    stmt = dialect_insert(DailyStoreSchedule).values(
+        discord_user_id=discord_user_id,
+        riot_account_id=riot_account_id,
+        guild_id=guild_id,
+        channel_id=channel_id,
+        schedule_time=schedule_time,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStoreSchedule.discord_user_id, DailyStoreSchedule.guild_id, DailyStoreSchedule.channel_id],
+        set_={
+            "riot_account_id": stmt.excluded.riot_account_id,
+            "schedule_time": stmt.excluded.schedule_time,
+        },
+    )
+    async with async_session() as session:
+        async with session.begin():
+            if session.get_bind().dialect.name == "postgresql":
+                # 挿入された行は xmax が0、更新された行は更新したトランザクションのIDになる
+                result = await session.execute(stmt.returning(literal_column("xmax = 0", Boolean)))
+                return result.scalar_one()
+            # SQLiteでは同じトランザクション内で既存の行の有無を確認する
+            existing = await session.execute(
+                select(DailyStoreSchedule.id).where(
+                    DailyStoreSchedule.discord_user_id == discord_user_id,
+                    DailyStoreSchedule.guild_id == guild_id,
+                    DailyStoreSchedule.channel_id == channel_id,
+                )
+            )
+            existing_id = existing.scalar_one_or_none()
+            await session.execute(stmt)
+            return existing_id is None
@@ -0,0 +1,157 @@
+# database/wishlist.py
+from sqlalchemy import delete, select
+
+from .database import async_session, dialect_insert
+from .models import RiotAccount, WishlistEntry
+
+# 1ユーザーが登録できるスキンの上限
+MAX_WISHLIST_SIZE = 25
+
+
+class WishlistIndex:
+    """
+    ウィッシュリストの転置インデックス（スキンレベルUUID → 登録しているユーザーのアカウント）。
+    ストアのオファーはスキンレベルUUIDで返るため、照合はオファーの件数だけで済み、登録件数には依存しない。
+    DBが正で、メモリ上のインデックスは load() で作り直せる。
+    別インスタンスでの変更を反映するため、スキャンの前に load() すること。
+    """
+    def __init__(self):
+        # スキンレベルUUID → {アカウントID: ユーザーID}
+        self._by_level: dict[str, dict[int, int]] = {}
+        # ユーザーID → 登録しているスキンUUID
+        self._by_user: dict[int, set[str]] = {}
+        # ユーザーID → 連携しているアカウントID
+        self._accounts: dict[int, set[int]] = {}
+        # スキンUUID → スキンレベルUUID（カタログから作る）
+        self._levels: dict[str, list[str]] = {}
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return sum(len(skins) for skins in self._by_user.values())
+
+    @property
+    def ready(self) -> bool:
+        """DBとカタログの両方を読み込み、照合できる状態か"""
+        return self.loaded and bool(self._levels)
+
+    @property
+    def watchers(self) -> frozenset[int]:
+        """1件以上登録しているユーザー"""
+        return frozenset(self._by_user)
+
+    def _index(self, discord_user_id: int, skin_uuid: str):
+        self._by_user.setdefault(discord_user_id, set()).add(skin_uuid)
+        for level_uuid in self._levels.get(skin_uuid, ()):
+            for account_id in self._accounts.get(discord_user_id, ()):
+                self._by_level.setdefault(level_uuid, {})[account_id] = discord_user_id
+
+    def _unindex(self, discord_user_id: int, skin_uuid: str):
+        skins = self._by_user.get(discord_user_id)
+        if skins is not None:
+            skins.discard(skin_uuid)
+            if not skins:
+                del self._by_user[discord_user_id]
+        for level_uuid in self._levels.get(skin_uuid, ()):
+            accounts = self._by_level.get(level_uuid)
+            if accounts is None:
+                continue
+            for account_id in self._accounts.get(discord_user_id, ()):
+                accounts.pop(account_id, None)
+            if not accounts:
+                del self._by_level[level_uuid]
+
+    def _rebuild(self):
+        self._by_level.clear()
+        for discord_user_id, skins in self._by_user.items():
+            for skin_uuid in skins:
+                self._index(discord_user_id, skin_uuid)
+
+    def set_catalog(self, level_to_skin_map: dict[str, str]):
+        """カタログ（スキンレベルUUID → スキンUUID）を設定し、インデックスを作り直す"""
+        levels: dict[str, list[str]] = {}
+        for level_uuid, skin_uuid in level_to_skin_map.items():
+            levels.setdefault(skin_uuid, []).append(level_uuid)
+        self._levels = levels
+        self._rebuild()
+
+    async def load(self):
+        """DBの内容でインデックスを作り直す"""
+        async with async_session() as session:
+            result = await session.execute(select(WishlistEntry.discord_user_id, WishlistEntry.skin_uuid))
+            entries = result.all()
+            result = await session.execute(
+                select(RiotAccount.discord_user_id, RiotAccount.id)
+                .where(RiotAccount.discord_user_id.in_(select(WishlistEntry.discord_user_id)))
+            )
+            accounts = result.all()
+        self._by_user.clear()
+        self._accounts.clear()
+        for discord_user_id, account_id in accounts:
+            self._accounts.setdefault(discord_user_id, set()).add(account_id)
+        for discord_user_id, skin_uuid in entries:
+            self._by_user.setdefault(discord_user_id, set()).add(skin_uuid)
+        self._rebuild()
+        self.loaded = True
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            await self.load()
+
+    async def reload_accounts(self, discord_user_id: int):
+        """アカウントの連携・解除の後に、そのユーザーのアカウントを読み直す"""
+        skins = self.skins_of(discord_user_id)
+        if not skins:
+            # 次に登録したときに読み込む
+            self._accounts.pop(discord_user_id, None)
+            return
+        if not self.loaded:
+            return
+        async with async_session() as session:
+            result = await session.execute(select(RiotAccount.id).where(RiotAccount.discord_user_id == discord_user_id))
+            account_ids = set(result.scalars().all())
+        for skin_uuid in skins:
+            self._unindex(discord_user_id, skin_uuid)
+        self._accounts[discord_user_id] = account_ids
+        for skin_uuid in skins:
+            self._index(discord_user_id, skin_uuid)
+
+    def skins_of(self, discord_user_id: int) -> frozenset[str]:
+        return frozenset(self._by_user.get(discord_user_id, ()))
+
+    def matches(self, account_id: int, level_uuids) -> list[str]:
+        """オファーのスキンレベルのうち、アカウントの持ち主が登録しているものを返す"""
+        return [level_uuid for level_uuid in level_uuids if account_id in self._by_level.get(level_uuid, ())]
+
+    async def add(self, discord_user_id: int, skin_uuid: str) -> bool:
+        """登録する。既に登録済みならFalse。上限を超える場合はValueError"""
+        await self.ensure_loaded()
+        skins = self._by_user.get(discord_user_id, set())
+        if skin_uuid in skins:
+            return False
+        if len(skins) >= MAX_WISHLIST_SIZE:
+            raise ValueError(f"ウィッシュリストに登録できるのは{MAX_WISHLIST_SIZE}件までです。")
+
+        stmt = dialect_insert(WishlistEntry).values(discord_user_id=discord_user_id, skin_uuid=skin_uuid)
+        stmt = stmt.on_conflict_do_nothing(index_elements=[WishlistEntry.discord_user_id, WishlistEntry.skin_uuid])
+        async with async_session() as session:
+            async with session.begin():
+                await session.execute(stmt)
+                if discord_user_id not in self._accounts:
+                    result = await session.execute(select(RiotAccount.id).where(RiotAccount.discord_user_id == discord_user_id))
+                    self._accounts[discord_user_id] = set(result.scalars().all())
+        self._index(discord_user_id, skin_uuid)
+        return True
+
+    async def remove(self, discord_user_id: int, skin_uuid: str) -> bool:
+        """登録を解除する。登録されていなかった場合はFalse"""
+        async with async_session() as session:
+            async with session.begin():
+                result = await session.execute(
+                    delete(WishlistEntry)
+                    .where(WishlistEntry.discord_user_id == discord_user_id, WishlistEntry.skin_uuid == skin_uuid)
+                )
+        self._unindex(discord_user_id, skin_uuid)
+        return result.rowcount > 0
+
+
+wishlist = WishlistIndex()
@@ -1,8 +1,13 @@
 # image_generator.py
 import os
 import uuid
+import logging
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 
+from core.metrics import RENDER_SECONDS
+
+log = logging.getLogger(__name__)
+
 # --- 設定 ---
 CARD_SIZE = (550, 300)  # 生成するカード1枚のサイズ
 FONT_PATH = "assets/fonts/BebasNeue-Regular.ttf"
@@ -25,6 +30,11 @@ RARITY_BACKGROUNDS = {
 }
 
 def create_daily_store_image(offers_data: list, vp_icon_path: str) -> str:
+    with RENDER_SECONDS.time():
+        return _create_daily_store_image(offers_data, vp_icon_path)
+
+
+def _create_daily_store_image(offers_data: list, vp_icon_path: str) -> str:
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
@@ -126,7 +136,7 @@ def create_daily_store_image(offers_data: list, vp_icon_path: str) -> str:
             card_paths.append(card_path)
 
         except Exception as e:
-            print(f"カード画像の生成に失敗: {e}")
+            log.warning("カード画像の生成に失敗: %s", e)
             continue
 
     if not card_paths:
@@ -153,6 +163,6 @@ def create_daily_store_image(offers_data: list, vp_icon_path: str) -> str:
         try:
             os.remove(path)
         except OSError as e:
-            print(f"一時ファイルの削除に失敗: {e}")
+            log.warning("一時ファイルの削除に失敗: %s", e)
 
     return final_image_path
\ No newline at end of file
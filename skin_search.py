@@ -0,0 +1,67 @@
+# skin_search.py
+"""
+スキン名の前方一致検索。
+日本語名・英語名を正規化（NFKC・大文字小文字・カタカナ/ひらがなの同一視）し、
+各単語から始まる部分をソート済みの配列に並べて二分探索する。
+オートコンプリートの応答期限に間に合うよう、検索はカタログ全体を走査しない。
+"""
+import bisect
+import unicodedata
+
+# カタカナ → ひらがな（ァ..ヶ を ぁ..ゖ に）
+_KATA_TO_HIRA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+# 単語の区切りとして扱う記号
+_SEPARATORS = str.maketrans({"・": " ", "-": " ", "_": " ", "/": " "})
+
+
+def normalize(text: str) -> str:
+    """全角/半角・大文字/小文字・カタカナ/ひらがなの違いを吸収する"""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = text.translate(_KATA_TO_HIRA).translate(_SEPARATORS)
+    return " ".join(text.split())
+
+
+class SkinSearchIndex:
+    def __init__(self, skin_cache: dict[str, dict]):
+        entries = []
+        # 正規化した完全な名前 → スキンUUID（完全一致の判定用）
+        self._exact: dict[str, str] = {}
+        for skin_uuid, info in skin_cache.items():
+            for name in {info.get("name_ja", ""), info.get("name_en", "")}:
+                key = normalize(name)
+                if not key:
+                    continue
+                self._exact.setdefault(key, skin_uuid)
+                words = key.split(" ")
+                # "prime vandal" は "prime vandal" と "vandal" の両方で引けるようにする
+                for i in range(len(words)):
+                    entries.append((" ".join(words[i:]), i, skin_uuid))
+        entries.sort()
+        self._keys = [key for key, _, _ in entries]
+        self._uuids = [skin_uuid for _, _, skin_uuid in entries]
+
+    def __len__(self) -> int:
+        return len(self._exact)
+
+    def exact(self, query: str) -> str | None:
+        return self._exact.get(normalize(query))
+
+    def search(self, query: str, limit: int = 25) -> list[str]:
+        """前方一致するスキンのUUIDを最大limit件返す"""
+        needle = normalize(query)
+        if not needle:
+            return []
+        results: list[str] = []
+        seen = set()
+        i = bisect.bisect_left(self._keys, needle)
+        # 同じスキンが複数のキーで一致することがあるため、走査する件数にも上限を設ける
+        end = min(len(self._keys), i + limit * 8)
+        while i < end and self._keys[i].startswith(needle):
+            skin_uuid = self._uuids[i]
+            if skin_uuid not in seen:
+                seen.add(skin_uuid)
+                results.append(skin_uuid)
+                if len(results) >= limit:
+                    break
+            i += 1
+        return results
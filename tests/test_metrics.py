@@ -0,0 +1,20 @@
+from core.metrics import endpoint_labels
+
+
+def test_riot_endpoints_replace_ids():
+    url = "https://pd.ap.a.pvp.net/store/v3/storefront/0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0"
+    assert endpoint_labels(url) == ("riot_pd", "/store/v3/storefront/:id")
+
+
+def test_valorant_api_media_keeps_first_segment():
+    url = "https://media.valorant-api.com/weaponskinlevels/0f1e2d3c-4b5a-6978-8796-a5b4c3d2e1f0/displayicon.png"
+    assert endpoint_labels(url) == ("valorant_api_media", "/weaponskinlevels")
+
+
+def test_cdn_attachment_is_a_single_series():
+    urls = [
+        "https://cdn.discordapp.com/attachments/1234567890/9876543210/store.png?ex=66a1b2c3&is=66a06143&hm=abcdef",
+        "https://cdn.discordapp.com/attachments/1234567890/9876543211/store_a1b2c3.png?ex=66a1b2c3",
+        "https://media.discordapp.net/attachments/1111111111/2222222222/daily-store.png",
+    ]
+    assert {endpoint_labels(url) for url in urls} == {("other", "other")}
@@ -0,0 +1,336 @@
+# tools/load_test.py
+"""
+モックサーバー（tools/mock_riot_server.py）を相手に ValorantCommands を動かす負荷試験。
+一時的なSQLiteに合成アカウントとスケジュールを作り、次の2つを計測する。
+- interactive: 合成インタラクションで /store daily を並行実行したときのレイテンシ
+- schedule: 同じ分に集中した大量のスケジュールを daily_store_task で処理したときのスループット
+- mixed (--mixed): スケジュールの処理中に /store daily を実行したときのレイテンシ（優先度付き実行枠の効果の確認）
+
+Discordには接続せず、チャンネルへの投稿は記録するだけにする。
+
+    python -m tools.load_test --accounts 2000 --schedules 2000 --commands 500 --concurrency 50
+    python -m tools.load_test --latency-ms 150 --error-rate 0.02 --rate-limit-rate 0.01 --expired-ratio 0.3 --json out.json
+    python -m tools.load_test --mixed --http-concurrency 4 --render-concurrency 1
+    python -m tools.load_test --latency-ms 500 --commands 300 --concurrency 100 --max-active 8 --max-queue 20 --max-wait 10
+
+日本語フォントなど描画に必要なアセットが無い環境では --skip-render で画像生成を省略できる。
+"""
+import argparse
+import asyncio
+import collections
+import datetime
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import aiohttp
+import discord
+from cryptography.fernet import Fernet
+from discord.ext import commands
+from sqlalchemy import update
+
+from api.endpoints import configure_endpoints
+from benchmarks.common import summarize, print_table, write_json
+from core import jobs
+from core.admission import configure_admission
+from core.metrics import http_trace_config
+from database.database import configure_engine, init_db, dispose_engine, async_session
+from database.models import RiotAccount, DailyStoreSchedule
+from tools.mock_riot_server import MockRiotServer, MockConfig, IMAGE_PATH
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+SEED_BATCH = 1000
+
+
+# 添付ファイルのURL（モックサーバーの画像を指し、再利用前の確認に応答させる）
+ATTACHMENT_BASE = "http://127.0.0.1:8089"
+
+
+class FakeAttachment:
+    def __init__(self, n: int):
+        expires = int(time.time()) + 86400
+        self.url = f"{ATTACHMENT_BASE}/media/attachments/0/{n}/store.png?ex={expires:x}&is=0&hm=0"
+
+
+class FakeMessage:
+    def __init__(self, n: int, has_file: bool):
+        self.attachments = [FakeAttachment(n)] if has_file else []
+
+
+class FakeChannel:
+    """送信内容を記録するだけのチャンネル"""
+    def __init__(self):
+        self.sent: list[tuple[float, str]] = []
+        self._ids = itertools.count()
+
+    async def send(self, content=None, *, file=None, files=None, embed=None, **kwargs):
+        kind = "file" if file or files else "embed" if embed else "text"
+        self.sent.append((time.perf_counter(), kind if kind != "text" else f"text:{content}"))
+        return FakeMessage(next(self._ids), kind == "file")
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages: list[str] = []
+
+    async def send(self, content=None, **kwargs):
+        self.messages.append(content or ("embed" if "embed" in kwargs else ""))
+
+
+class FakeResponse:
+    def __init__(self):
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+
+
+class FakeInteraction:
+    """_execute_valorant_command から使われる属性だけを持つインタラクション"""
+    command = None
+
+    def __init__(self, user_id: int, channel: FakeChannel):
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.created_at = discord.utils.utcnow()
+        self.followup = FakeFollowup()
+        self.response = FakeResponse()
+
+    async def delete_original_response(self):
+        pass
+
+
+def _skip_render():
+    """画像生成を、固定の画像をコピーするだけの処理に置き換える"""
+    import image_generator
+
+    def create_daily_store_image(offers_data, vp_icon_path):
+        os.makedirs(image_generator.OUTPUT_DIR, exist_ok=True)
+        path = os.path.join(image_generator.OUTPUT_DIR, f"{uuid.uuid4()}.png")
+        shutil.copyfile(IMAGE_PATH, path)
+        return path
+
+    image_generator.create_daily_store_image = create_daily_store_image
+
+
+async def seed(fernet: Fernet, accounts: int, schedules: int, expired_ratio: float) -> list[int]:
+    """合成アカウント（1ユーザー1アカウント）とスケジュールを作り、ユーザーIDの一覧を返す"""
+    user_ids = []
+    now_ms = int(time.time() * 1000)
+    rng = random.Random(0)
+    for start in range(0, accounts, SEED_BATCH):
+        rows = []
+        for i in range(start, min(accounts, start + SEED_BATCH)):
+            puuid = str(uuid.uuid4())
+            user_id = 10 ** 17 + i
+            user_ids.append(user_id)
+            # 一部のアカウントは期限切れのトークンにして再認証を発生させる
+            issued = 0 if rng.random() < expired_ratio else now_ms
+            rows.append(RiotAccount(
+                discord_user_id=user_id,
+                account_name=f"load{i}",
+                riot_id=f"Load{i}#TEST",
+                encrypted_cookies=fernet.encrypt(f"ssid={puuid}".encode()).decode(),
+                auth_token=f"mock.{puuid}.{issued}",
+                entitlement_token=f"ent.{puuid}",
+                puuid=puuid,
+            ))
+        async with async_session() as session:
+            async with session.begin():
+                session.add_all(rows)
+
+    for start in range(0, schedules, SEED_BATCH):
+        async with async_session() as session:
+            async with session.begin():
+                session.add_all(
+                    DailyStoreSchedule(
+                        discord_user_id=user_ids[i % accounts],
+                        riot_account_id=i % accounts + 1,
+                        guild_id=i,
+                        channel_id=i,
+                        schedule_time=datetime.time(0, 0),
+                    )
+                    for i in range(start, min(schedules, start + SEED_BATCH))
+                )
+    return user_ids
+
+
+async def run_interactive(cog, user_ids: list[int], count: int, concurrency: int) -> dict:
+    channel = FakeChannel()
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    outcomes = collections.Counter()
+
+    async def one(i: int):
+        interaction = FakeInteraction(user_ids[i % len(user_ids)], channel)
+        await interaction.response.defer(ephemeral=True)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await cog._execute_valorant_command(interaction, cog._daily_logic)
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+            samples.append(time.perf_counter() - start)
+        # 進行中の案内（"...取得しています..."）以外の応答は、エラーや混雑による拒否として数える
+        for message in interaction.followup.messages:
+            if not message.endswith("..."):
+                outcomes[f"followup:{message}"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    elapsed = time.perf_counter() - start
+    posted = collections.Counter(kind for _, kind in channel.sent)
+    return {
+        "latency": {**summarize(samples), "throughput_per_s": round(count / elapsed, 2)},
+        "outcomes": dict(outcomes),
+        "posted": dict(posted),
+    }
+
+
+async def run_schedule_wave(cog, bot, schedules: int) -> dict:
+    channel = FakeChannel()
+    bot.get_channel = lambda channel_id: channel
+    bot.get_user = lambda user_id: FakeUser(user_id)
+
+    # 実行する分に全スケジュールを合わせる
+    fire_at = datetime.datetime.now(JST).replace(second=0, microsecond=0)
+    async with async_session() as session:
+        async with session.begin():
+            await session.execute(update(DailyStoreSchedule).values(schedule_time=fire_at.time()))
+
+    start = time.perf_counter()
+    await cog.daily_store_task()
+    elapsed = time.perf_counter() - start
+    completions = [at - start for at, _ in channel.sent]
+    posted = collections.Counter(kind for _, kind in channel.sent)
+    return {
+        "completion": {**summarize(completions), "throughput_per_s": round(len(channel.sent) / elapsed, 2) if elapsed else 0},
+        "wave_seconds": round(elapsed, 3),
+        "schedules": schedules,
+        "posted": dict(posted),
+    }
+
+
+async def run_mixed(cog, bot, user_ids: list[int], schedules: int, count: int, concurrency: int) -> dict:
+    """スケジュールの処理を始めてから、並行して /store daily を実行する"""
+    wave = asyncio.create_task(run_schedule_wave(cog, bot, schedules))
+    await asyncio.sleep(0.5)
+    interactive = await run_interactive(cog, user_ids, count, concurrency)
+    return {"interactive": interactive, "schedule": await wave}
+
+
+async def run(args) -> dict:
+    config = MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, token_ttl=args.token_ttl, skins=args.skins,
+    )
+    server = MockRiotServer(config, "127.0.0.1", args.port)
+    await server.start()
+    global ATTACHMENT_BASE
+    ATTACHMENT_BASE = server.base_url
+    configure_endpoints(server.base_url, server.base_url, server.base_url, server.base_url)
+
+    tmp = tempfile.mkdtemp(prefix="spikebot-load-")
+    configure_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'load.db')}")
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.default())
+    jobs.configure_jobs(args.http_concurrency, args.render_concurrency)
+    configure_admission(args.max_active, args.max_queue, args.max_wait)
+    bot.http_session = aiohttp.ClientSession(trace_configs=[jobs.http_job_trace_config(), http_trace_config()])
+    try:
+        await init_db()
+        fernet = Fernet(Fernet.generate_key())
+        user_ids = await seed(fernet, args.accounts, args.schedules, args.expired_ratio)
+
+        from cogs.valorant_commands import setup as setup_valorant_commands
+        await setup_valorant_commands(bot, "example.com", fernet)
+        cog = bot.get_cog("ValorantCommands")
+        cog.daily_store_task.cancel()
+        cog.wishlist_scan_task.cancel()
+
+        start = time.perf_counter()
+        await cog._build_catalog()
+        results = {"catalog_build_seconds": round(time.perf_counter() - start, 3)}
+
+        if args.commands:
+            results["interactive"] = await run_interactive(cog, user_ids, args.commands, args.concurrency)
+        if args.schedules:
+            results["schedule"] = await run_schedule_wave(cog, bot, args.schedules)
+        if args.mixed and args.commands and args.schedules:
+            results["mixed"] = await run_mixed(cog, bot, user_ids, args.schedules, args.commands, args.concurrency)
+        results["mock_requests"] = dict(server.requests)
+        return results
+    finally:
+        await bot.http_session.close()
+        await dispose_engine()
+        await server.stop()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="モックサーバーを使ったValorantCommandsの負荷試験")
+    parser.add_argument("--accounts", type=int, default=500)
+    parser.add_argument("--schedules", type=int, default=500)
+    parser.add_argument("--commands", type=int, default=200, help="実行する /store daily の回数")
+    parser.add_argument("--concurrency", type=int, default=20, help="同時に実行する /store daily の数")
+    parser.add_argument("--expired-ratio", type=float, default=0.1, help="再認証が必要なアカウントの割合")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    parser.add_argument("--skins", type=int, default=600)
+    parser.add_argument("--mixed", action="store_true", help="スケジュールの処理中の /store daily のレイテンシも計測する")
+    parser.add_argument("--http-concurrency", type=int, help="外部HTTPリクエストの同時実行数")
+    parser.add_argument("--render-concurrency", type=int, help="画像生成の同時実行数")
+    parser.add_argument("--max-active", type=int, help="同時に処理するコマンドの数")
+    parser.add_argument("--max-queue", type=int, help="順番待ちできるコマンドの数")
+    parser.add_argument("--max-wait", type=float, help="コマンドの順番待ちの上限 (秒)")
+    parser.add_argument("--skip-render", action="store_true", help="画像生成を省略する")
+    parser.add_argument("--json", help="結果をJSONで書き出すパス")
+    args = parser.parse_args()
+
+    if args.skip_render:
+        _skip_render()
+    results = asyncio.run(run(args))
+
+    print(f"catalog build: {results['catalog_build_seconds']}s")
+    if "interactive" in results:
+        print_table("interactive /store daily", {"latency": results["interactive"]["latency"]})
+        print(f"  outcomes: {results['interactive']['outcomes']}")
+        print(f"  posted:   {results['interactive']['posted']}")
+    if "schedule" in results:
+        schedule = results["schedule"]
+        print_table(f"schedule wave ({schedule['schedules']} schedules, {schedule['wave_seconds']}s)", {"completion": schedule["completion"]})
+        print(f"  posted:   {schedule['posted']}")
+    if "mixed" in results:
+        mixed = results["mixed"]
+        print_table("interactive /store daily during schedule wave", {"latency": mixed["interactive"]["latency"]})
+        print(f"  outcomes: {mixed['interactive']['outcomes']}")
+        print(f"  schedule wave: {mixed['schedule']['wave_seconds']}s")
+    print_table("mock requests", results["mock_requests"])
+    if args.json:
+        write_json(args.json, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
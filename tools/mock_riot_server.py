@@ -0,0 +1,275 @@
+# tools/mock_riot_server.py
+"""
+負荷試験用に、BotがアクセスするRiotとValorant-APIのエンドポイントを1つのローカルサーバーで再現する。
+- auth.riotgames.com: POST /api/v1/authorization, GET /userinfo
+- entitlements.auth.riotgames.com: POST /api/token/v1
+- pd.{shard}.a.pvp.net: POST /store/v3/storefront/{puuid}
+- valorant-api.com: /v1/version, /v1/contenttiers, /v1/weapons/skins, /v1/weapons/skinlevels/{uuid},
+  /v1/bundles/{uuid} と画像 (/media/...)
+
+Cookie は "ssid=<puuid>" の形式で受け付ける。発行したアクセストークンは --token-ttl 秒で失効し、
+失効後のストア取得は本物と同じく 400 BAD_CLAIMS を返す（Botは再認証する）。
+
+    python -m tools.mock_riot_server --port 8089 --latency-ms 80 --error-rate 0.01 --rate-limit-rate 0.01
+
+Botをこのサーバーに向ける場合は、次の環境変数を設定して起動する:
+
+    RIOT_AUTH_BASE=http://127.0.0.1:8089 RIOT_ENTITLEMENTS_BASE=http://127.0.0.1:8089
+    RIOT_PD_BASE=http://127.0.0.1:8089 VALORANT_API_BASE=http://127.0.0.1:8089
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+
+from aiohttp import web
+
+from core.http_server import EmbeddedHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# スキン画像として返すファイル
+IMAGE_PATH = os.path.join(ROOT, "assets", "vp_icon.png")
+RARITIES = (("Select", "5a629df4"), ("Deluxe", "009b83f1"), ("Premium", "d1b8e9ff"), ("Exclusive", "f5955bff"), ("Ultra", "fad663ff"))
+WEAPONS = ("Vandal", "Phantom", "Operator", "Sheriff", "Spectre", "Classic", "Ghost", "Guardian", "Melee")
+_NAMESPACE = uuid.UUID("6f2d9b39-7a4c-4d2e-9a55-4a0b6c1c9e21")
+
+
+def _uuid(*parts) -> str:
+    return str(uuid.uuid5(_NAMESPACE, "/".join(map(str, parts))))
+
+
+def build_synthetic_catalog(count: int, base_url: str) -> dict:
+    """決定的な合成カタログ（レアリティ・スキン・レベル）を作る"""
+    tiers = [
+        {"uuid": _uuid("tier", name), "devName": name, "highlightColor": color}
+        for name, color in RARITIES
+    ]
+    skins = []
+    for i in range(count):
+        weapon = WEAPONS[i % len(WEAPONS)]
+        skin_uuid = _uuid("skin", i)
+        skins.append({
+            "uuid": skin_uuid,
+            "displayName": f"Mock {i:04d} {weapon}",
+            "displayName_ja": f"モック {i:04d} {weapon}",
+            "contentTierUuid": tiers[i % len(tiers)]["uuid"],
+            "displayIcon": f"{base_url}/media/weaponskins/{skin_uuid}/displayicon.png",
+            "levels": [
+                {"uuid": _uuid("level", i, level), "displayIcon": f"{base_url}/media/weaponskinlevels/{_uuid('level', i, level)}/displayicon.png"}
+                for level in range(4)
+            ],
+        })
+    return {"tiers": tiers, "skins": skins, "levels": {level["uuid"]: level for skin in skins for level in skin["levels"]}}
+
+
+def skins_payload(catalog: dict, japanese: bool = False) -> list[dict]:
+    """/v1/weapons/skins の data 部分"""
+    return [
+        {
+            "uuid": skin["uuid"],
+            "displayName": skin["displayName_ja"] if japanese else skin["displayName"],
+            "contentTierUuid": skin["contentTierUuid"],
+            "displayIcon": skin["displayIcon"],
+            "levels": skin["levels"],
+        }
+        for skin in catalog["skins"]
+    ]
+
+
+def storefront_payload(catalog: dict, puuid: str, day: str) -> dict:
+    """PUUIDと日付から決まる4件の日替わりオファー（同じ日は同じ内容）"""
+    rng = random.Random(hashlib.sha256(f"{puuid}/{day}".encode()).digest())
+    offers = []
+    for skin in rng.sample(catalog["skins"], 4):
+        offers.append({
+            "OfferID": skin["levels"][0]["uuid"],
+            "Cost": {"85ad13f7-3d1b-5128-9eb2-7cd8ee0b5741": rng.choice((875, 1275, 1775, 2175))},
+            "Rewards": [{"ItemTypeID": "e7c63390-eda7-46e0-bb7a-a6abdacd2433", "ItemID": skin["levels"][0]["uuid"], "Quantity": 1}],
+        })
+    return {
+        "FeaturedBundle": {"Bundle": {"DataAssetID": _uuid("bundle", day), "TotalDiscountedCost": {"85ad13f7-3d1b-5128-9eb2-7cd8ee0b5741": 5350}}},
+        "SkinsPanelLayout": {"SingleItemStoreOffers": offers, "SingleItemOffersRemainingDurationInSeconds": 3600},
+    }
+
+
+@dataclass
+class MockConfig:
+    # 応答までの遅延（平均と揺らぎ, ms）
+    latency_ms: float = 50.0
+    jitter_ms: float = 20.0
+    # 500 を返す割合と、429 を返す割合（Retry-After 付き）
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: int = 1
+    # アクセストークンの有効期限 (秒)
+    token_ttl: float = 3600.0
+    skins: int = 600
+    client_version: str = "release-09.00-shipping-mock"
+
+
+class MockRiotServer:
+    def __init__(self, config: MockConfig, host: str = "127.0.0.1", port: int = 8089):
+        self.config = config
+        self.base_url = f"http://{host}:{port}"
+        self.server = EmbeddedHTTPServer(host, port)
+        self.requests: dict[str, int] = {}
+        self._catalog = build_synthetic_catalog(config.skins, self.base_url)
+        with open(IMAGE_PATH, "rb") as f:
+            self._image = f.read()
+
+        routes = (
+            ("POST", "/api/v1/authorization", self.authorization),
+            ("GET", "/userinfo", self.userinfo),
+            ("POST", "/api/token/v1", self.entitlements),
+            ("POST", "/store/v3/storefront/{puuid}", self.storefront),
+            ("GET", "/v1/version", self.version),
+            ("GET", "/v1/contenttiers", self.contenttiers),
+            ("GET", "/v1/weapons/skins", self.skins),
+            ("GET", "/v1/weapons/skinlevels/{uuid}", self.skinlevel),
+            ("GET", "/v1/bundles/{uuid}", self.bundle),
+            ("GET", "/media/{name:.+}", self.media),
+            # アップロード済み画像のURLの確認 (HEAD) もモックの画像で受ける
+            ("HEAD", "/media/{name:.+}", self.media),
+        )
+        for method, path, handler in routes:
+            self.server.add_route(method, path, self._wrap(path, handler))
+
+    async def start(self):
+        await self.server.start()
+
+    async def stop(self):
+        await self.server.stop()
+
+    def _wrap(self, path: str, handler):
+        async def wrapped(request: web.Request) -> web.StreamResponse:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            config = self.config
+            delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+            if delay:
+                await asyncio.sleep(delay)
+            roll = random.random()
+            if roll < config.rate_limit_rate:
+                return web.json_response({"error": "rate_limited"}, status=429, headers={"Retry-After": str(config.retry_after)})
+            if roll < config.rate_limit_rate + config.error_rate:
+                return web.json_response({"error": "internal"}, status=500)
+            return await handler(request)
+        return wrapped
+
+    # --- Riot 認証 ---
+
+    def _issue_token(self, puuid: str) -> str:
+        return f"mock.{puuid}.{int(time.time() * 1000)}"
+
+    def _token_puuid(self, request: web.Request) -> str | None:
+        """有効なアクセストークンならPUUIDを返す"""
+        auth = request.headers.get("Authorization", "")
+        if not auth.startswith("Bearer mock."):
+            return None
+        try:
+            puuid, issued_ms = auth[len("Bearer mock."):].rsplit(".", 1)
+            issued_at = int(issued_ms) / 1000
+        except ValueError:
+            return None
+        if time.time() - issued_at > self.config.token_ttl:
+            return None
+        return puuid
+
+    async def authorization(self, request: web.Request) -> web.Response:
+        cookies = dict(
+            part.strip().split("=", 1) for part in request.headers.get("Cookie", "").split(";") if "=" in part
+        )
+        puuid = cookies.get("ssid")
+        if not puuid:
+            return web.json_response({"type": "auth", "error": "auth_failure"}, status=400)
+        uri = f"https://playvalorant.com/opt_in#access_token={self._issue_token(puuid)}&scope=account+openid&token_type=Bearer&expires_in=3600"
+        return web.json_response({"type": "response", "response": {"parameters": {"uri": uri}}})
+
+    async def entitlements(self, request: web.Request) -> web.Response:
+        puuid = self._token_puuid(request)
+        if not puuid:
+            return web.json_response({"errorCode": "CREDENTIALS_INVALID"}, status=401)
+        return web.json_response({"entitlements_token": f"ent.{puuid}"})
+
+    async def userinfo(self, request: web.Request) -> web.Response:
+        puuid = self._token_puuid(request)
+        if not puuid:
+            return web.json_response({"error": "invalid_token"}, status=401)
+        return web.json_response({"sub": puuid, "acct": {"game_name": f"Mock{puuid[:6]}", "tag_line": "MOCK"}})
+
+    async def storefront(self, request: web.Request) -> web.Response:
+        puuid = request.match_info["puuid"]
+        if self._token_puuid(request) != puuid:
+            return web.json_response({"httpStatus": 400, "errorCode": "BAD_CLAIMS", "message": "Failure validating/decoding RSO Access Token"}, status=400)
+
+        day = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+        return web.json_response(storefront_payload(self._catalog, puuid, day))
+
+    # --- Valorant-API ---
+
+    async def version(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": 200, "data": {"riotClientVersion": self.config.client_version}})
+
+    async def contenttiers(self, request: web.Request) -> web.Response:
+        return web.json_response({"status": 200, "data": self._catalog["tiers"]})
+
+    async def skins(self, request: web.Request) -> web.Response:
+        japanese = request.query.get("language") == "ja-JP"
+        return web.json_response({"status": 200, "data": skins_payload(self._catalog, japanese)})
+
+    async def skinlevel(self, request: web.Request) -> web.Response:
+        level = self._catalog["levels"].get(request.match_info["uuid"])
+        if not level:
+            return web.json_response({"status": 404, "error": "not found"}, status=404)
+        return web.json_response({"status": 200, "data": level})
+
+    async def bundle(self, request: web.Request) -> web.Response:
+        bundle_uuid = request.match_info["uuid"]
+        return web.json_response({"status": 200, "data": {
+            "uuid": bundle_uuid,
+            "displayName": "モックバンドル",
+            "displayIcon": f"{self.base_url}/media/bundles/{bundle_uuid}/displayicon.png",
+        }})
+
+    async def media(self, request: web.Request) -> web.Response:
+        return web.Response(body=self._image, content_type="image/png")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RiotとValorant-APIのモックサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=float, default=3600.0, help="アクセストークンの有効期限 (秒)")
+    parser.add_argument("--skins", type=int, default=600)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, token_ttl=args.token_ttl, skins=args.skins,
+    )
+
+    async def serve():
+        server = MockRiotServer(config, args.host, args.port)
+        await server.start()
+        print(f"Mock server listening on {server.base_url}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
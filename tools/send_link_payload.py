@@ -0,0 +1,64 @@
+# tools/send_link_payload.py
+"""
+連携ペイロードにHMAC署名を付けて、Botの POST /link に直接送信する（ローカル確認用）。
+
+    python -m tools.send_link_payload --url http://127.0.0.1:8081/link --state-token <token> --access-token <token>
+    python -m tools.send_link_payload --file payload.json
+
+署名鍵は --secret か環境変数 HMAC_SECRET から読み込む。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import aiohttp
+from dotenv import load_dotenv
+
+
+def sign(secret: str, payload: bytes) -> str:
+    """Botが検証するのと同じ形式（Base64のHMAC-SHA256）の署名を作る"""
+    return base64.b64encode(hmac.digest(secret.encode(), payload, hashlib.sha256)).decode()
+
+
+async def send(url: str, secret: str, payload: bytes) -> tuple[int, str]:
+    headers = {"Content-Type": "application/json", "X-Signature": sign(secret, payload)}
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, data=payload, headers=headers) as r:
+            return r.status, await r.text()
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="署名付き連携ペイロードをHTTPで送信する")
+    parser.add_argument("--url", default="http://127.0.0.1:8081/link")
+    parser.add_argument("--secret", default=os.getenv("HMAC_SECRET"))
+    parser.add_argument("--file", help="送信するペイロードのJSONファイル（指定時は以下の個別指定を無視）")
+    parser.add_argument("--state-token")
+    parser.add_argument("--access-token")
+    parser.add_argument("--cookies", help="Cookie文字列（従来フロー）")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("--secret か環境変数 HMAC_SECRET が必要です")
+    if args.file:
+        with open(args.file, "rb") as f:
+            payload = f.read()
+    else:
+        data = {"state_token": args.state_token, "flow": "http"}
+        if args.cookies:
+            data["cookies_str"] = args.cookies
+        if args.access_token:
+            data["access_token"] = args.access_token
+        payload = json.dumps(data).encode()
+
+    status, body = asyncio.run(send(args.url, args.secret, payload))
+    print(status, body)
+    sys.exit(0 if status < 400 else 1)
+
+
+if __name__ == "__main__":
+    main()